@@ -0,0 +1,47 @@
+"""
+Dependencies shared by the route handlers.
+"""
+import re
+
+from fastapi import Header, HTTPException, status
+
+from app.graph_export import Neo4jGraphStore
+from app.metrics import Metrics
+from app.workspaces import DEFAULT_WORKSPACE, WorkspaceManager
+
+# Loaded models, one workspace per session or model ID
+workspaces = WorkspaceManager.from_env()
+
+# Graph database models are exported to, when NEO4J_URI is configured
+graph_store = Neo4jGraphStore.from_env()
+
+# Request and stage timings served by /metrics, when BIM_METRICS is set
+metrics = Metrics.from_env()
+
+# Workspace IDs are also used as spill file names
+WORKSPACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+async def get_workspace(
+    x_workspace_id: str = Header(DEFAULT_WORKSPACE, description="Session or model ID selecting the workspace"),
+):
+    """
+    Resolve the workspace addressed by the X-Workspace-Id header.
+
+    Async, so the workspace manager is only touched from the event loop.
+    """
+    if not WORKSPACE_ID_PATTERN.match(x_workspace_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid workspace ID.")
+    return await workspaces.get(x_workspace_id)
+
+
+def get_graph_store():
+    """
+    Return the configured Neo4j store, or fail when there is none.
+    """
+    if graph_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No graph database configured. Set NEO4J_URI to enable it.",
+        )
+    return graph_store
@@ -0,0 +1,90 @@
+"""
+Hover descriptions served as a separate layer over the structural graph.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _text(value):
+    return "" if pd.isna(value) else str(value)
+
+
+def _column_text(series, rows):
+    """
+    Return the values of series at rows as strings, missing values as "".
+    """
+    values = series.to_numpy(dtype=object)[rows]
+    return ["" if pd.isna(value) else str(value) for value in values.tolist()]
+
+
+class DescriptionIndex:
+    """
+    Maps node keys to hover text without storing the text itself.
+
+    Attribute nodes are laid out in row order and every object node directly
+    precedes the attribute of the row it was first seen on, so the source row
+    of any non-cluster node is the number of attribute nodes before it. Hover
+    text is then read from the DataFrame columns on demand.
+    """
+
+    def __init__(self, df, nodes):
+        self._df = df
+        self._nodes = nodes
+        categories = np.array([node["category"] for node in nodes.node_data_array()], dtype=object)
+        is_attribute = categories == "attribute"
+        self._categories = categories
+        self._rows = np.cumsum(is_attribute) - is_attribute
+
+    def _hover(self, position):
+        category = self._categories[position]
+        if category == "system":
+            return _text(self._nodes.node_data_array()[position]["label"])
+        row = self._rows[position]
+        if category == "object":
+            return _text(self._df["object_name_alt"].iat[row])
+        alt = _text(self._df["attribute_name_alt"].iat[row])
+        definition = _text(self._df["attribute_definition"].iat[row])
+        return f"{alt}\n{definition}"
+
+    def source_rows(self):
+        """
+        Return the DataFrame row each node was built from, aligned with the
+        nodeDataArray; cluster nodes span rows and get -1.
+        """
+        return np.where(self._categories == "system", -1, self._rows)
+
+    def lookup(self, keys):
+        """
+        Return {key: hover text} for the given keys; unknown keys are skipped.
+        """
+        descriptions = {}
+        for key in keys:
+            position = self._nodes.position(key)
+            if position is not None:
+                descriptions[key] = self._hover(position)
+        return descriptions
+
+    def hover_labels(self):
+        """
+        Return the hover text of every node, aligned with the nodeDataArray.
+        """
+        labels = np.empty(len(self._categories), dtype=object)
+        for category in ("system", "object", "attribute"):
+            positions = np.flatnonzero(self._categories == category)
+            if not len(positions):
+                continue
+            if category == "system":
+                nodes = self._nodes.node_data_array()
+                labels[positions] = [_text(nodes[position]["label"]) for position in positions.tolist()]
+            elif category == "object":
+                labels[positions] = _column_text(self._df["object_name_alt"], self._rows[positions])
+            else:
+                rows = self._rows[positions]
+                labels[positions] = [
+                    f"{alt}\n{definition}"
+                    for alt, definition in zip(
+                        _column_text(self._df["attribute_name_alt"], rows),
+                        _column_text(self._df["attribute_definition"], rows),
+                    )
+                ]
+        return labels.tolist()
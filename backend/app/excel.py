@@ -0,0 +1,437 @@
+"""
+Streaming ingestion of Excel workbooks into the same DataFrame as a CSV upload.
+
+Two layouts are accepted:
+
+- a flat sheet whose header row holds the required columns, like the CSV
+- the Visual Paradigm ER export of ai_template.xlsx: every row of the Column
+  sheet becomes an attribute of its parent entity (the object), and entities
+  are grouped under the entity they reference through the Foreign Key sheet
+  (the cluster)
+
+Sheets are read row by row, with python-calamine when it is installed and
+otherwise by parsing the .xlsx XML incrementally, so the workbook object
+model is never built and rows are compacted chunk by chunk. Both readers
+return dates as datetime, times of day as time and durations as timedelta.
+"""
+import datetime
+import functools
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from itertools import islice
+from posixpath import join, normpath
+
+import pandas as pd
+
+from app.ingest import CHUNK_ROWS, REQUIRED_COLUMNS, MissingColumnsError, collect_chunks, missing_columns
+
+try:
+    import python_calamine
+except ImportError:  # pragma: no cover - depends on the environment
+    python_calamine = None
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Sheets of the ER layout; the Foreign Key sheet is optional
+ENTITY_SHEET = "Entity"
+COLUMN_SHEET = "Column"
+FOREIGN_KEY_SHEET = "Foreign Key"
+
+# Column sheet headers kept as extra attribute columns
+ER_EXTRA_COLUMNS = {
+    "Type": "data_type",
+    "Length": "length",
+    "Nullable": "nullable",
+    "PrimaryKey": "primary_key",
+}
+
+_CELL_COLUMN = re.compile(r"[A-Z]+")
+
+# Built-in number formats showing dates or times, and those showing durations
+DATE_FORMAT_IDS = frozenset(range(14, 23)) | {45, 46, 47}
+DURATION_FORMAT_IDS = frozenset({46})
+
+# Parts of a custom number format that are not date or time codes: quoted
+# text, escaped and padding characters, and colours or conditions
+_FORMAT_LITERAL = re.compile(r'"[^"]*"|\\.|[_*].')
+_FORMAT_ELAPSED = re.compile(r"\[(?:h+|m+|s+)\]", re.I)
+_FORMAT_BRACKET = re.compile(r"\[[^\]]*\]")
+_DATE_CODE = re.compile(r"[dmyhs]", re.I)
+
+# Day 0 of the 1900 and 1904 date systems; the 1900 system counts the
+# nonexistent 29 February 1900, so earlier serials are a day off
+EPOCH_1900 = datetime.datetime(1899, 12, 30)
+EPOCH_1904 = datetime.datetime(1904, 1, 1)
+LEAP_BUG_SERIAL = 60
+
+
+class ExcelFormatError(ValueError):
+    """
+    Raised when an uploaded workbook cannot be read.
+    """
+
+
+def _column_index(ref):
+    """
+    Return the 0-based column of a cell reference such as "AB12".
+    """
+    index = 0
+    for letter in _CELL_COLUMN.match(ref).group():
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "E" not in text.upper() else value
+
+
+def _clean(value):
+    """
+    Normalize a cell value: blanks become None, integral numbers int and
+    dates datetime.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if type(value) is datetime.date:
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def _local_name(tag):
+    return tag.rpartition("}")[2]
+
+
+def _format_kind(code):
+    """
+    Return "date" or "duration" for a custom number format showing one, or
+    None. Only the first section, used for positive numbers, is considered.
+    """
+    code = _FORMAT_LITERAL.sub("", code).split(";", 1)[0]
+    elapsed = _FORMAT_ELAPSED.search(code) is not None
+    code = _FORMAT_BRACKET.sub("", code)
+    if code.lower() == "general" or not (elapsed or _DATE_CODE.search(code)):
+        return None
+    return "duration" if elapsed else "date"
+
+
+def _serial_value(serial, kind, epoch):
+    """
+    Convert a date serial to a datetime, to a time when it has no date
+    part, or to a timedelta for a duration format.
+    """
+    if kind == "duration":
+        return datetime.timedelta(days=serial)
+    if serial < 1:
+        return (datetime.datetime.min + datetime.timedelta(days=serial)).time()
+    if epoch is EPOCH_1900 and serial < LEAP_BUG_SERIAL:
+        serial += 1
+    return epoch + datetime.timedelta(days=serial)
+
+
+class XlsxWorkbook:
+    """
+    Reads the rows of .xlsx sheets directly from the zipped XML.
+    """
+
+    def __init__(self, stream):
+        try:
+            self._zip = zipfile.ZipFile(stream)
+            self._read_workbook()
+            self._formats = self._cell_formats()
+        except (zipfile.BadZipFile, KeyError, ValueError, ET.ParseError) as e:
+            raise ExcelFormatError(f"Not a valid .xlsx workbook: {e}")
+        self._shared_strings = None
+
+    @property
+    def sheet_names(self):
+        return list(self._sheets)
+
+    def _read_workbook(self):
+        """
+        Find the paths of the sheets, by name, and of the styles part, and
+        the date system of the workbook.
+        """
+        targets = {}
+        self._styles = None
+        rels = ET.fromstring(self._zip.read("xl/_rels/workbook.xml.rels"))
+        for rel in rels.iter(f"{PACKAGE_REL_NS}Relationship"):
+            target = rel.get("Target")
+            path = target.lstrip("/") if target.startswith("/") else normpath(join("xl", target))
+            targets[rel.get("Id")] = path
+            if rel.get("Type", "").endswith("/styles"):
+                self._styles = path
+
+        workbook = ET.fromstring(self._zip.read("xl/workbook.xml"))
+        self._sheets = {
+            sheet.get("name"): targets[sheet.get(f"{REL_NS}id")]
+            for sheet in workbook.iter(f"{MAIN_NS}sheet")
+        }
+        properties = next(workbook.iter(f"{MAIN_NS}workbookPr"), None)
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self._epoch = EPOCH_1904 if date1904 else EPOCH_1900
+
+    def _cell_formats(self):
+        """
+        Return the kind of value ("date", "duration" or None) shown by each
+        cell format, indexed by the s attribute of cells.
+        """
+        if self._styles is None or self._styles not in self._zip.namelist():
+            return []
+        styles = ET.fromstring(self._zip.read(self._styles))
+        kinds = {}
+        for element in styles.iter():
+            if _local_name(element.tag) == "numFmt":
+                kinds[int(element.get("numFmtId"))] = _format_kind(element.get("formatCode", ""))
+        cell_xfs = next((element for element in styles.iter() if _local_name(element.tag) == "cellXfs"), None)
+        if cell_xfs is None:
+            return []
+
+        formats = []
+        for xf in cell_xfs:
+            format_id = int(xf.get("numFmtId", 0))
+            if format_id in kinds:
+                formats.append(kinds[format_id])
+            elif format_id in DATE_FORMAT_IDS:
+                formats.append("duration" if format_id in DURATION_FORMAT_IDS else "date")
+            else:
+                formats.append(None)
+        return formats
+
+    def _parse(self, path, name):
+        """
+        Yield the elements called name of a part of the workbook as they are
+        parsed, dropping each once it has been read so that only one is held
+        in memory. Tags may carry any namespace prefix (<x:row>) depending on
+        the writer.
+        """
+        with self._zip.open(path) as f:
+            parents = []
+            for event, element in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    parents.append(element)
+                    continue
+                parents.pop()
+                if _local_name(element.tag) == name:
+                    yield element
+                    if parents:
+                        parents[-1].remove(element)
+
+    def _strings(self):
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if "xl/sharedStrings.xml" in self._zip.namelist():
+                self._shared_strings = [_string_text(item) for item in self._parse("xl/sharedStrings.xml", "si")]
+        return self._shared_strings
+
+    def rows(self, name):
+        """
+        Yield the rows of a sheet as lists of cell values.
+        """
+        strings = self._strings()
+        columns = {}
+        for element in self._parse(self._sheets[name], "row"):
+            row = []
+            for cell in element:
+                if _local_name(cell.tag) != "c":
+                    continue
+                ref = cell.get("r")
+                if ref is not None:
+                    letters = ref.rstrip("0123456789")
+                    if letters not in columns:
+                        columns[letters] = _column_index(letters)
+                    row.extend([None] * (columns[letters] - len(row)))
+                row.append(_clean(self._cell_value(cell, strings)))
+            yield row
+
+    def _cell_value(self, cell, strings):
+        cell_type = cell.get("t")
+        text = None
+        for child in cell:
+            name = _local_name(child.tag)
+            if name == "v":
+                text = child.text
+                break
+            if name == "is" and cell_type == "inlineStr":
+                return _string_text(child)
+        if not text:
+            return None
+        if cell_type == "s":
+            return strings[int(text)]
+        if cell_type == "b":
+            return text == "1"
+        if cell_type in ("str", "e"):
+            return text
+        style = int(cell.get("s", 0))
+        kind = self._formats[style] if style < len(self._formats) else None
+        if kind is not None and float(text) >= 0:
+            return _serial_value(float(text), kind, self._epoch)
+        return _number(text)
+
+
+def _string_text(item):
+    """
+    Return the text of a shared or inline string. Rich text runs are joined;
+    phonetic hints (rPh) are not part of the value.
+    """
+    parts = []
+    for child in item:
+        tag = _local_name(child.tag)
+        if tag == "t":
+            parts.append(child.text or "")
+        elif tag == "r":
+            parts.extend(run.text or "" for run in child if _local_name(run.tag) == "t")
+    return "".join(parts)
+
+
+class CalamineWorkbook:
+    """
+    Reads the rows of .xlsx/.xls sheets with python-calamine.
+    """
+
+    def __init__(self, stream):
+        try:
+            self._workbook = python_calamine.CalamineWorkbook.from_filelike(stream)
+        except Exception as e:
+            raise ExcelFormatError(f"Not a valid Excel workbook: {e}")
+
+    @property
+    def sheet_names(self):
+        return list(self._workbook.sheet_names)
+
+    def rows(self, name):
+        for row in self._workbook.get_sheet_by_name(name).iter_rows():
+            yield [_clean(value) for value in row]
+
+
+def open_workbook(stream, filename=""):
+    """
+    Open an uploaded workbook with the fastest available reader.
+    """
+    if python_calamine is not None:
+        return CalamineWorkbook(stream)
+    if filename.lower().endswith(".xls"):
+        raise ExcelFormatError("Legacy .xls workbooks need python-calamine; save the file as .xlsx")
+    return XlsxWorkbook(stream)
+
+
+def _header(row):
+    """
+    Map a header row to column names, renaming variants of the required
+    columns (case, spaces) to their canonical names.
+    """
+    columns = []
+    for position, value in enumerate(row):
+        name = f"Unnamed: {position}" if value is None else str(value)
+        canonical = re.sub(r"[\s-]+", "_", name.strip()).lower()
+        columns.append(canonical if canonical in REQUIRED_COLUMNS else name)
+    return columns
+
+
+def _chunks(rows, columns, chunk_rows):
+    """
+    Group the non-empty rows into DataFrames of chunk_rows rows.
+    """
+    width = len(columns)
+    rows = (row for row in rows if any(value is not None for value in row))
+    while True:
+        block = [row[:width] + [None] * (width - len(row)) for row in islice(rows, chunk_rows)]
+        if not block:
+            return
+        yield pd.DataFrame(block, columns=columns)
+
+
+def read_xlsx(stream, filename="", chunk_rows=CHUNK_ROWS):
+    """
+    Read an uploaded workbook into a DataFrame with the required columns.
+    """
+    workbook = open_workbook(stream, filename)
+    sheet_names = workbook.sheet_names
+
+    for name in sheet_names:
+        rows = workbook.rows(name)
+        columns = _header(next(rows, []))
+        if not missing_columns(columns):
+            return collect_chunks(_chunks(rows, columns, chunk_rows), columns)
+        rows.close()
+
+    if ENTITY_SHEET in sheet_names and COLUMN_SHEET in sheet_names:
+        return _read_er_model(workbook, chunk_rows)
+    raise MissingColumnsError(REQUIRED_COLUMNS)
+
+
+def _records(workbook, name):
+    """
+    Yield the rows of an ER export sheet as dicts keyed by header, skipping
+    rows marked for deletion.
+    """
+    rows = workbook.rows(name)
+    header = [None if value is None else str(value) for value in next(rows, [])]
+    for row in rows:
+        record = dict(zip(header, row))
+        if record.get("Delete ?") != "Yes":
+            yield record
+
+
+def _key(value):
+    return None if value is None else str(value)
+
+
+def _text(value):
+    return None if value is None else str(value).strip()
+
+
+def _read_er_model(workbook, chunk_rows):
+    entities = {}
+    by_model_id = {}
+    by_name = {}
+    for record in _records(workbook, ENTITY_SHEET):
+        entity = {
+            "id": _key(record.get("ID")),
+            "name": _text(record.get("Name")),
+            "description": _text(record.get("Description")),
+        }
+        entities[entity["id"]] = entity
+        by_model_id[_key(record.get("Model ID"))] = entity
+        by_name.setdefault(entity["name"], entity)
+
+    references = {}
+    if FOREIGN_KEY_SHEET in workbook.sheet_names:
+        for record in _records(workbook, FOREIGN_KEY_SHEET):
+            table, reference = _key(record.get("Table")), _key(record.get("Reference"))
+            if table in entities and reference in entities and table != reference:
+                references.setdefault(table, reference)
+
+    def cluster(entity):
+        # Follow the references up to the root entity, guarding against cycles
+        seen = {entity["id"]}
+        while entity["id"] in references and references[entity["id"]] not in seen:
+            entity = entities[references[entity["id"]]]
+            seen.add(entity["id"])
+        return entity["name"]
+
+    columns = REQUIRED_COLUMNS + list(ER_EXTRA_COLUMNS.values())
+
+    def rows():
+        for record in _records(workbook, COLUMN_SHEET):
+            entity = by_model_id.get(_key(record.get("Parent ID"))) or by_name.get(_text(record.get("Parent Name")))
+            name = _text(record.get("Name"))
+            if entity is None or not name:
+                continue
+            yield [
+                cluster(entity),
+                entity["name"],
+                entity["description"] or entity["name"],
+                name,
+                name,
+                _text(record.get("Description")) or None,
+                *(record.get(header) for header in ER_EXTRA_COLUMNS),
+            ]
+
+    return collect_chunks(_chunks(rows(), columns, chunk_rows), columns)
@@ -0,0 +1,184 @@
+"""
+Live broadcast of graph patches to the clients viewing a workspace.
+
+Mutations are published as they are recorded and sent once per tick, as one
+net patch encoded once for every subscriber, so the cost of a broadcast
+grows with the edits of the tick rather than with the graph or the number
+of clients. Each subscriber has its own bounded queue of frames: a client
+that falls behind has its queue dropped and later gets a single catch-up
+patch from the revision journal, so it never holds back the others nor
+grows memory while it is slow.
+"""
+import asyncio
+import os
+from collections import deque
+
+from app.revisions import combine_patches, combine_updates
+from app.serialization import encode_json
+
+# Mutations published within this many seconds are sent as one frame
+TICK_SECONDS = float(os.environ.get("BIM_FEED_TICK_SECONDS", "0.05"))
+
+# Frames queued for one client before it is switched to a catch-up patch
+MAX_QUEUED_FRAMES = int(os.environ.get("BIM_FEED_MAX_QUEUED_FRAMES", "32"))
+
+
+def patch_frame(since, patches):
+    """
+    Return the frame of the net change of patches, applied after revision since.
+    """
+    removed, added = combine_patches(patches)
+    frame = {"type": "patch", "since": since, "revision": patches[-1]["revision"], "removed": removed, "added": added}
+    updated = combine_updates(patches)
+    if updated:
+        frame["updated"] = updated
+    return frame
+
+
+def _encode(frame):
+    return encode_json(frame).decode("utf-8")
+
+
+class Subscriber:
+    """
+    One connected client: its queued (revision, frame) pairs and the
+    revision the frames sent so far brought it to.
+    """
+
+    def __init__(self, revision):
+        self.frames = deque()
+        self.revision = revision
+        self.lagging = False
+        self.ready = asyncio.Event()
+
+
+class ChangeFeed:
+    """
+    The subscribers of one workspace and the patches not yet broadcast.
+
+    revisions is a function returning the workspace's current RevisionLog.
+    Frames are JSON texts: `hello` on connection, `patch` with the links
+    `removed` and `added` and the node fields `updated` after revision
+    `since`, and `reload` when the graph was rebuilt or the client fell
+    further behind than the journal goes. A client whose revision is not a
+    patch's `since` fetches /graph-data/?since= instead of applying it.
+    """
+
+    def __init__(self, revisions):
+        self._revisions = revisions
+        self._subscribers = set()
+        self._pending = []
+        self._tick = None
+        # Revision up to which patches have been handed to the subscribers
+        self._published = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    @property
+    def published(self):
+        return self._revisions().revision if self._published is None else self._published
+
+    def subscribe(self, since=None):
+        """
+        Add a subscriber at the published revision, or catching up from
+        revision since.
+        """
+        self._published = self.published
+        subscriber = Subscriber(self._published)
+        subscriber.frames.append((None, _encode({"type": "hello", "revision": subscriber.revision})))
+        if since is not None and since != subscriber.revision:
+            subscriber.revision = since
+            subscriber.lagging = True
+        subscriber.ready.set()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, patch):
+        """
+        Queue a recorded patch for the next tick.
+        """
+        if not self._subscribers:
+            self._pending.clear()
+            self._published = patch["revision"]
+            return
+        self._pending.append(patch)
+        if self._tick is None:
+            self._tick = asyncio.get_running_loop().call_later(TICK_SECONDS, self.flush)
+
+    def reload(self, revision):
+        """
+        Tell every subscriber the graph was rebuilt at revision.
+        """
+        self._pending.clear()
+        self._published = revision
+        for subscriber in self._subscribers:
+            subscriber.frames.clear()
+            subscriber.lagging = False
+        self._broadcast(revision, _encode({"type": "reload", "revision": revision}))
+
+    def flush(self):
+        """
+        Send the patches published since the last tick as one frame.
+        """
+        if self._tick is not None:
+            self._tick.cancel()
+            self._tick = None
+        if not self._pending:
+            return
+        frame = _encode(patch_frame(self._published, self._pending))
+        self._published = self._pending[-1]["revision"]
+        self._pending = []
+        self._broadcast(self._published, frame)
+
+    def _broadcast(self, revision, frame):
+        for subscriber in self._subscribers:
+            if subscriber.lagging:
+                pass
+            elif len(subscriber.frames) >= MAX_QUEUED_FRAMES:
+                # Drop its backlog; it catches up from the journal instead
+                subscriber.frames.clear()
+                subscriber.lagging = True
+            else:
+                subscriber.frames.append((revision, frame))
+            subscriber.ready.set()
+
+    def _catch_up(self, subscriber):
+        """
+        Return the frame bringing a lagging subscriber to the published
+        revision, or None when it is already there.
+        """
+        subscriber.lagging = False
+        revisions = self._revisions()
+        patches = revisions.since(subscriber.revision)
+        if patches is None:
+            subscriber.revision = revisions.revision
+            return _encode({"type": "reload", "revision": revisions.revision})
+        patches = [patch for patch in patches if patch["revision"] <= self.published]
+        if not patches:
+            return None
+        frame = patch_frame(subscriber.revision, patches)
+        subscriber.revision = frame["revision"]
+        return _encode(frame)
+
+    async def serve(self, send, subscriber):
+        """
+        Send the subscriber's frames with send(text) until cancelled; a slow
+        send only holds back this subscriber.
+        """
+        while True:
+            await subscriber.ready.wait()
+            subscriber.ready.clear()
+            while subscriber.frames or subscriber.lagging:
+                if subscriber.frames:
+                    revision, frame = subscriber.frames.popleft()
+                    if revision is not None:
+                        subscriber.revision = revision
+                else:
+                    frame = self._catch_up(subscriber)
+                    if frame is None:
+                        continue
+                await send(frame)
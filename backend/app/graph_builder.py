@@ -0,0 +1,205 @@
+"""
+Columnar construction of the GoJS node and link arrays from the uploaded DataFrame.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns mapped onto dedicated node fields; every other column is copied onto
+# the attribute nodes as metadata
+CORE_COLUMNS = [
+    "cluster_name",
+    "object_name",
+    "object_name_alt",
+    "attribute_name",
+    "attribute_name_alt",
+    "attribute_definition",
+    "harmonised_attribute",
+]
+
+
+# 16-character salts so cluster and attribute keys hash into separate spaces
+CLUSTER_HASH_KEY = "bim-ai:clusters_"
+ATTRIBUTE_HASH_KEY = "bim-ai:attribute"
+
+
+def _hex_keys(hashes):
+    """
+    Format 64-bit hashes as fixed-width hex node keys.
+    """
+    digits = np.asarray(hashes, dtype=">u8").tobytes().hex()
+    return [digits[i:i + 16] for i in range(0, len(digits), 16)]
+
+
+def cluster_node_keys(cluster_names):
+    """
+    Return deterministic keys for the given cluster names.
+    """
+    hashes = pd.util.hash_array(np.asarray(cluster_names, dtype=object), hash_key=CLUSTER_HASH_KEY)
+    return _hex_keys(hashes)
+
+
+def attribute_node_keys(df, stable=False):
+    """
+    Return a deterministic key for every row of df.
+
+    Keys hash the row's cluster, object and attribute names together with its
+    row position, so re-uploading the same file reproduces the same keys. With
+    stable=True the row position is replaced by the occurrence number of that
+    (cluster, object, attribute) combination, so keys also survive rows being
+    reordered, added or removed elsewhere in the model.
+    """
+    identity = pd.DataFrame({
+        "cluster_name": df["cluster_name"].to_numpy(),
+        "object_name": df["object_name"].to_numpy(),
+        "attribute_name": df["attribute_name"].to_numpy(),
+    })
+    if stable:
+        identity["row"] = identity.groupby(
+            ["cluster_name", "object_name", "attribute_name"], sort=False, dropna=False
+        ).cumcount().to_numpy()
+    else:
+        identity["row"] = np.arange(len(df))
+    hashes = pd.util.hash_pandas_object(identity, index=False, hash_key=ATTRIBUTE_HASH_KEY)
+    return _hex_keys(hashes.to_numpy())
+
+
+def extra_columns(df):
+    """
+    Return the metadata columns of df that are copied onto attribute nodes.
+    """
+    return [col for col in df.columns if col not in CORE_COLUMNS]
+
+
+def count_new_object_values(df):
+    """
+    Count the attribute nodes that carry a truthy 'new_object' value.
+    """
+    total = 0
+    for col in extra_columns(df):
+        if col.strip() == "new_object":
+            values = df[col]
+            total += int((values.notna() & values.astype(bool)).sum())
+    return total
+
+
+def build_graph(df, load_descriptions=False, stable_keys=False, key_factory=None):
+    """
+    Build the GoJS nodeDataArray and linkDataArray for df.
+
+    Clusters and objects are deduplicated with factorize/duplicated, metadata
+    columns are copied column by column behind a NaN mask and links are
+    assembled as arrays, so no per-row pandas access is needed. The output is
+    identical, node for node and in the same order, to the original row loop:
+    cluster nodes first, then for every row its object node (on first
+    occurrence) followed by its attribute node.
+
+    Cluster and attribute keys are content hashes (see attribute_node_keys for
+    stable_keys); object keys are the object name suffixed with its cluster
+    key. A key_factory, if given, is called instead once per cluster, then once
+    per row.
+    """
+    n_rows = len(df)
+
+    # Cluster nodes, in order of first appearance
+    cluster_codes, cluster_names = pd.factorize(df["cluster_name"], use_na_sentinel=False)
+    cluster_names = list(cluster_names)
+    if key_factory is None:
+        cluster_keys = cluster_node_keys(cluster_names)
+    else:
+        cluster_keys = [key_factory() for _ in cluster_names]
+    node_data_array = [
+        {
+            "key": cluster_key,
+            "category": "system",
+            "label": cluster_name,
+            "hoverLabel": cluster_name if load_descriptions else "",
+        }
+        for cluster_key, cluster_name in zip(cluster_keys, cluster_names)
+    ]
+
+    row_cluster_keys = np.asarray(cluster_keys, dtype=object)[cluster_codes]
+
+    # Object nodes are keyed by name within their cluster
+    object_names = df["object_name"].to_numpy(dtype=object)
+    object_keys = object_names + ("_" + row_cluster_keys)
+    first_object_rows = ~pd.Series(object_keys).duplicated().to_numpy()
+
+    object_rows = np.flatnonzero(first_object_rows)
+    object_labels = object_names[object_rows].tolist()
+    if load_descriptions:
+        object_hovers = df["object_name_alt"].to_numpy(dtype=object)[object_rows].tolist()
+    else:
+        object_hovers = [""] * len(object_rows)
+    object_nodes = [
+        {"key": key, "category": "object", "label": label, "hoverLabel": hover}
+        for key, label, hover in zip(object_keys[object_rows].tolist(), object_labels, object_hovers)
+    ]
+
+    # Attribute nodes
+    if key_factory is None:
+        attribute_keys = attribute_node_keys(df, stable=stable_keys)
+    else:
+        attribute_keys = [key_factory() for _ in range(n_rows)]
+    attribute_labels = df["attribute_name"].tolist()
+    if load_descriptions:
+        attribute_hovers = [
+            f"{alt}\n{definition}"
+            for alt, definition in zip(df["attribute_name_alt"].tolist(), df["attribute_definition"].tolist())
+        ]
+    else:
+        attribute_hovers = [""] * n_rows
+    if "harmonised_attribute" in df.columns:
+        # Blank cells are read as NaN; like empty ones they fall back to Harmonised-<name>
+        column = df["harmonised_attribute"]
+        harmonised = column.astype(object).where(column.notna(), "").tolist()
+    else:
+        harmonised = [""] * n_rows
+    attribute_nodes = [
+        {
+            "key": key,
+            "category": "attribute",
+            "label": label,
+            "hoverLabel": hover,
+            "harmonisedAttribute": harmonised_attr if harmonised_attr else f"Harmonised-{label}",
+        }
+        for key, label, hover, harmonised_attr in zip(attribute_keys, attribute_labels, attribute_hovers, harmonised)
+    ]
+
+    # Copy the remaining columns as metadata, skipping missing values
+    for col in extra_columns(df):
+        column_name = col.strip()
+        values = df[col].tolist()
+        present = df[col].notna().to_numpy()
+        if present.all():
+            for node, val in zip(attribute_nodes, values):
+                node[column_name] = val
+        else:
+            for i in np.flatnonzero(present).tolist():
+                attribute_nodes[i][column_name] = values[i]
+
+    # Interleave object and attribute nodes in row order
+    attribute_positions = np.arange(n_rows) + np.cumsum(first_object_rows)
+    row_nodes = np.empty(n_rows + len(object_rows), dtype=object)
+    row_nodes[attribute_positions] = _object_array(attribute_nodes)
+    row_nodes[attribute_positions[object_rows] - 1] = _object_array(object_nodes)
+    node_data_array.extend(row_nodes.tolist())
+
+    # Each row contributes a cluster->object and an object->attribute link
+    link_from = np.empty(2 * n_rows, dtype=object)
+    link_to = np.empty(2 * n_rows, dtype=object)
+    link_from[0::2] = row_cluster_keys
+    link_from[1::2] = object_keys
+    link_to[0::2] = object_keys
+    link_to[1::2] = attribute_keys
+    link_data_array = [{"from": src, "to": dst} for src, dst in zip(link_from.tolist(), link_to.tolist())]
+
+    return node_data_array, link_data_array
+
+
+def _object_array(items):
+    """
+    Wrap a list of dicts in a 1-D object array without numpy inspecting them.
+    """
+    array = np.empty(len(items), dtype=object)
+    array[:] = items
+    return array
@@ -0,0 +1,399 @@
+"""
+Export of the cluster -> object -> attribute graph to Neo4j, and import back.
+
+A model is written as (:BimNode:Cluster)-[:HAS_OBJECT]->(:BimNode:Object)
+-[:HAS_ATTRIBUTE]->(:BimNode:Attribute) nodes tagged with the model ID, plus a
+(:BimModel) node listing the model's columns. Three targets share the same
+records:
+
+- a live database, written in fixed-size UNWIND batches over one pooled
+  driver session
+- a Cypher script of the same batches, for cypher-shell
+- CSV files for an offline `neo4j-admin database import full`
+
+Nodes carry the model's column values (attribute_name, object_name_alt, ...),
+so a model is read back by streaming its attributes in row order into the
+same DataFrame an upload produces.
+"""
+import csv
+import functools
+import json
+import math
+import os
+import re
+import time
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+
+from app.graph_builder import extra_columns
+from app.ingest import CHUNK_ROWS, REQUIRED_COLUMNS, collect_chunks
+
+try:
+    import neo4j
+except ImportError:  # pragma: no cover - depends on the environment
+    neo4j = None
+
+# Rows sent per UNWIND statement
+BATCH_SIZE = int(os.environ.get("NEO4J_BATCH_SIZE", "10000"))
+
+# Connections kept in the driver's pool
+POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", "10"))
+
+# Node label of each graph category, in the order they are written
+NODE_LABELS = {"system": "Cluster", "object": "Object", "attribute": "Attribute"}
+
+# Node properties besides the model's extra columns
+CLUSTER_PROPERTIES = ["key", "cluster_name"]
+OBJECT_PROPERTIES = ["key", "object_name", "object_name_alt"]
+ATTRIBUTE_PROPERTIES = [
+    "key", "row", "attribute_name", "attribute_name_alt", "attribute_definition", "harmonised_attribute",
+]
+
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT bim_node_key IF NOT EXISTS FOR (n:BimNode) REQUIRE (n.model, n.key) IS UNIQUE",
+    "CREATE INDEX bim_node_model IF NOT EXISTS FOR (n:BimNode) ON (n.model)",
+]
+CLEAR_QUERY = (
+    "MATCH (n:BimNode {model: $model}) "
+    "CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+)
+MODEL_QUERY = "MERGE (m:BimModel {model: $model}) SET m.columns = $columns"
+NODE_QUERY = "UNWIND $rows AS row CREATE (n:BimNode:{label}) SET n = row, n.model = $model"
+RELATIONSHIP_QUERY = (
+    "UNWIND $rows AS row "
+    "MATCH (a:BimNode {{model: $model, key: row.from}}) "
+    "MATCH (b:BimNode {{model: $model, key: row.to}}) "
+    "CREATE (a)-[:{type}]->(b)"
+)
+COLUMNS_QUERY = "MATCH (m:BimModel {model: $model}) RETURN m.columns AS columns"
+IMPORT_QUERY = (
+    "MATCH (c:BimNode:Cluster {model: $model})-[:HAS_OBJECT]->(o:Object)-[:HAS_ATTRIBUTE]->(a:Attribute) "
+    "RETURN c.cluster_name AS cluster_name, o.object_name AS object_name, "
+    "o.object_name_alt AS object_name_alt, properties(a) AS attribute "
+    "ORDER BY a.row"
+)
+
+_NODE_QUERIES = {NODE_QUERY.format(label=label) for label in NODE_LABELS.values()}
+_json_string = json.JSONEncoder(ensure_ascii=False).encode
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PARAMETER = re.compile(r"\$(\w+)")
+
+
+class ModelNotFoundError(LookupError):
+    """
+    Raised when the graph database holds no model with the requested ID.
+    """
+
+
+def _batches(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def _value(value):
+    # Missing values are left out of the node, as the graph builder does
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+class GraphExport:
+    """
+    The node and relationship records of one model's graph.
+
+    The column values of objects and attributes are read from the rows they
+    were built from, while names and links come from the current graph, so
+    the export includes drag-and-drop edits.
+    """
+
+    def __init__(self, df, node_data_array, link_data_array, descriptions):
+        self._df = df
+        self._nodes = node_data_array
+        self._links = link_data_array
+        self._rows = descriptions.source_rows()
+        reserved = set(CLUSTER_PROPERTIES + OBJECT_PROPERTIES + ATTRIBUTE_PROPERTIES + ["model"])
+        self.extra_fields = [
+            field for field in dict.fromkeys(col.strip() for col in extra_columns(df)) if field not in reserved
+        ]
+        self.extra_dtypes = {col.strip(): df[col].dtype for col in extra_columns(df)}
+        self.columns = REQUIRED_COLUMNS + ["harmonised_attribute"] + self.extra_fields
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _positions(self, category):
+        return [position for position, node in enumerate(self._nodes) if node["category"] == category]
+
+    def _column(self, name, positions):
+        values = self._df[name].to_numpy(dtype=object)[self._rows[positions]]
+        return [_value(value) for value in values.tolist()]
+
+    def nodes(self, label):
+        """
+        Yield the property maps of the nodes with the given label.
+        """
+        if label == "Cluster":
+            for position in self._positions("system"):
+                node = self._nodes[position]
+                yield {"key": node["key"], "cluster_name": node["label"]}
+            return
+
+        if label == "Object":
+            positions = self._positions("object")
+            for position, alt in zip(positions, self._column("object_name_alt", positions)):
+                node = self._nodes[position]
+                yield {"key": node["key"], "object_name": node["label"], "object_name_alt": alt}
+            return
+
+        positions = self._positions("attribute")
+        rows = self._rows[positions].tolist()
+        alts = self._column("attribute_name_alt", positions)
+        definitions = self._column("attribute_definition", positions)
+        for position, row, alt, definition in zip(positions, rows, alts, definitions):
+            node = self._nodes[position]
+            properties = {
+                "key": node["key"],
+                "row": row,
+                "attribute_name": node["label"],
+                "attribute_name_alt": alt,
+                "attribute_definition": definition,
+                "harmonised_attribute": node.get("harmonisedAttribute"),
+            }
+            for field in self.extra_fields:
+                value = _value(node.get(field))
+                if value is not None:
+                    properties[field] = value
+            yield {name: value for name, value in properties.items() if value is not None}
+
+    def relationships(self, rel_type):
+        """
+        Yield the {from, to} maps of the relationships of the given type.
+
+        The graph repeats a cluster -> object link for every row of the
+        object; each is written once.
+        """
+        clusters = {node["key"] for node in self._nodes if node["category"] == "system"}
+        if rel_type == "HAS_OBJECT":
+            seen = set()
+            for link in self._links:
+                pair = (link["from"], link["to"])
+                if link["from"] in clusters and pair not in seen:
+                    seen.add(pair)
+                    yield {"from": link["from"], "to": link["to"]}
+        else:
+            for link in self._links:
+                if link["from"] not in clusters:
+                    yield {"from": link["from"], "to": link["to"]}
+
+
+def export_statements(export, model, batch_size=BATCH_SIZE):
+    """
+    Yield the (query, parameters) writing the model, one per batch.
+    """
+    yield MODEL_QUERY, {"model": model, "columns": export.columns}
+    for label in NODE_LABELS.values():
+        query = NODE_QUERY.format(label=label)
+        for rows in _batches(export.nodes(label), batch_size):
+            yield query, {"model": model, "rows": rows}
+    for rel_type in ("HAS_OBJECT", "HAS_ATTRIBUTE"):
+        query = RELATIONSHIP_QUERY.format(type=rel_type)
+        for rows in _batches(export.relationships(rel_type), batch_size):
+            yield query, {"model": model, "rows": rows}
+
+
+def cypher_literal(value):
+    """
+    Render a parameter value as a Cypher literal.
+    """
+    if isinstance(value, str):
+        # JSON string escapes are valid in Cypher string literals
+        return _json_string(value)
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value) if math.isfinite(value) else "null"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_cypher_name(k)}: {cypher_literal(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(cypher_literal(v) for v in value) + "]"
+    return _json_string(str(value))
+
+
+@functools.lru_cache(maxsize=1024)
+def _cypher_name(name):
+    name = str(name)
+    return name if _IDENTIFIER.fullmatch(name) else "`" + name.replace("`", "``") + "`"
+
+
+def render_statement(query, parameters):
+    """
+    Inline the parameters of a statement, for a script run without them.
+    """
+    return _PARAMETER.sub(lambda match: cypher_literal(parameters[match.group(1)]), query)
+
+
+def write_cypher_script(export, stream, model, batch_size=BATCH_SIZE):
+    """
+    Write the model as a cypher-shell script to a text stream: the schema,
+    the removal of any earlier copy of the model, then one UNWIND statement
+    per batch.
+    """
+    for query in SCHEMA_QUERIES:
+        stream.write(f"{query};\n")
+    stream.write(f"{render_statement(CLEAR_QUERY, {'model': model})};\n")
+    for query, parameters in export_statements(export, model, batch_size):
+        stream.write(f"{render_statement(query, parameters)};\n")
+
+
+def _csv_type(dtype):
+    # neo4j-admin reads untyped columns as strings
+    if pd.api.types.is_bool_dtype(dtype):
+        return ":boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return ":long"
+    if pd.api.types.is_float_dtype(dtype):
+        return ":double"
+    return ""
+
+
+def write_admin_import(export, directory, model):
+    """
+    Write the model as neo4j-admin import CSV files into directory, with an
+    import.sh running the import into an empty database. Return the paths.
+    """
+    directory = Path(directory)
+    files = {
+        "models.csv": (["model", "columns:string[]"], [{"model": model, "columns": "|".join(export.columns)}]),
+        "clusters.csv": (["key:ID", "model"] + CLUSTER_PROPERTIES[1:], export.nodes("Cluster")),
+        "objects.csv": (["key:ID", "model"] + OBJECT_PROPERTIES[1:], export.nodes("Object")),
+        "attributes.csv": (
+            ["key:ID", "model", "row:long"] + ATTRIBUTE_PROPERTIES[2:]
+            + [f"{field}{_csv_type(export.extra_dtypes[field])}" for field in export.extra_fields],
+            export.nodes("Attribute"),
+        ),
+        "has_object.csv": ([":START_ID", ":END_ID"], export.relationships("HAS_OBJECT")),
+        "has_attribute.csv": ([":START_ID", ":END_ID"], export.relationships("HAS_ATTRIBUTE")),
+    }
+
+    paths = []
+    for name, (header, records) in files.items():
+        fields = [column.split(":")[0] or column for column in header]
+        fields = [{":START_ID": "from", ":END_ID": "to"}.get(field, field) for field in fields]
+        path = directory / name
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for record in records:
+                record.setdefault("model", model)
+                writer.writerow([record.get(field) for field in fields])
+        paths.append(path)
+
+    script = directory / "import.sh"
+    script.write_text(
+        "#!/bin/sh\n"
+        "# Bulk load into an empty database; stop the database first\n"
+        "neo4j-admin database import full \"${1:-neo4j}\" \\\n"
+        "  --nodes=BimModel=models.csv \\\n"
+        "  --nodes=BimNode:Cluster=clusters.csv \\\n"
+        "  --nodes=BimNode:Object=objects.csv \\\n"
+        "  --nodes=BimNode:Attribute=attributes.csv \\\n"
+        "  --relationships=HAS_OBJECT=has_object.csv \\\n"
+        "  --relationships=HAS_ATTRIBUTE=has_attribute.csv \\\n"
+        "  --array-delimiter=\"|\" --multiline-fields=true\n",
+        encoding="utf-8",
+    )
+    paths.append(script)
+    return paths
+
+
+def _write_batch(tx, query, parameters):
+    tx.run(query, parameters).consume()
+
+
+class Neo4jGraphStore:
+    """
+    Writes and reads models in a Neo4j database through one pooled driver.
+    """
+
+    def __init__(self, driver, database=None, batch_size=BATCH_SIZE):
+        self._driver = driver
+        self._database = database
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_env(cls):
+        """
+        Connect to the database named by NEO4J_URI, or return None when it is
+        not configured or the driver is not installed.
+        """
+        uri = os.environ.get("NEO4J_URI")
+        if not uri or neo4j is None:
+            return None
+        driver = neo4j.GraphDatabase.driver(
+            uri,
+            auth=(os.environ.get("NEO4J_USER", "neo4j"), os.environ.get("NEO4J_PASSWORD", "")),
+            max_connection_pool_size=POOL_SIZE,
+        )
+        return cls(driver, database=os.environ.get("NEO4J_DATABASE") or None)
+
+    def close(self):
+        self._driver.close()
+
+    def _session(self):
+        return self._driver.session(database=self._database, fetch_size=self.batch_size)
+
+    def save(self, export, model):
+        """
+        Replace the model in the database with export, and return the counts
+        written and the throughput.
+        """
+        start = time.perf_counter()
+        nodes = relationships = batches = 0
+        with self._session() as session:
+            for query in SCHEMA_QUERIES:
+                session.run(query).consume()
+            session.run(CLEAR_QUERY, {"model": model}).consume()
+            for query, parameters in export_statements(export, model, self.batch_size):
+                session.execute_write(_write_batch, query, parameters)
+                batches += 1
+                if query in _NODE_QUERIES:
+                    nodes += len(parameters["rows"])
+                elif "rows" in parameters:
+                    relationships += len(parameters["rows"])
+        seconds = time.perf_counter() - start
+        return {
+            "model": model,
+            "nodes": nodes,
+            "relationships": relationships,
+            "batches": batches,
+            "seconds": round(seconds, 3),
+            "nodesPerSecond": round(nodes / seconds) if seconds else None,
+        }
+
+    def load(self, model, chunk_rows=CHUNK_ROWS):
+        """
+        Stream a model's attributes back, in row order, into a DataFrame with
+        the model's columns.
+        """
+        with self._session() as session:
+            record = session.run(COLUMNS_QUERY, {"model": model}).single()
+            if record is None:
+                raise ModelNotFoundError(f"No model '{model}' in the graph database")
+            columns = list(record["columns"])
+            attribute_columns = columns[3:]
+
+            result = session.run(IMPORT_QUERY, {"model": model})
+            rows = (
+                [record["cluster_name"], record["object_name"], record["object_name_alt"]]
+                + [record["attribute"].get(col) for col in attribute_columns]
+                for record in result
+            )
+            frames = (pd.DataFrame(block, columns=columns) for block in _batches(rows, chunk_rows))
+            return collect_chunks(frames, columns)
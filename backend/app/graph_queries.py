@@ -0,0 +1,92 @@
+"""
+Paginated, filtered views over the indexed graph, so clients can load a
+cluster overview first and expand clusters and objects on demand.
+"""
+from numbers import Number
+
+
+def _sort_key(field):
+    """
+    Sort key for a node field: missing values last, numbers before text.
+    """
+    def key(node):
+        value = node.get(field)
+        if value is None or value == "":
+            return (1, 1, "")
+        if isinstance(value, Number) and not isinstance(value, bool):
+            return (0, 0, value)
+        return (0, 1, str(value).casefold())
+    return key
+
+
+def _matches(node, search, new_object, filters):
+    if search and search not in str(node.get("label", "")).casefold():
+        return False
+    if new_object is not None and bool(node.get("new_object")) != new_object:
+        return False
+    for field, value in filters:
+        if value not in str(node.get(field, "")).casefold():
+            return False
+    return True
+
+
+def parse_filters(filters):
+    """
+    Parse 'field:value' filter strings into (field, lowercased value) pairs.
+    """
+    parsed = []
+    for item in filters or ():
+        field, sep, value = item.partition(":")
+        if not sep or not field:
+            raise ValueError(f"Invalid filter '{item}', expected 'field:value'")
+        parsed.append((field, value.casefold()))
+    return parsed
+
+
+def select_nodes(nodes, search=None, new_object=None, filters=(), sort=None, descending=False):
+    """
+    Filter and sort a list of nodes.
+
+    search matches the label, new_object keeps nodes with (or without) a
+    truthy new_object value and filters are (field, value) substring matches.
+    """
+    search = search.casefold() if search else None
+    selected = [node for node in nodes if _matches(node, search, new_object, filters)]
+    if sort:
+        selected.sort(key=_sort_key(sort), reverse=descending)
+    return selected
+
+
+def paginate(nodes, offset, limit):
+    """
+    Return one page of nodes together with the paging metadata.
+    """
+    return {
+        "total": len(nodes),
+        "offset": offset,
+        "limit": limit,
+        "nodeDataArray": nodes[offset:offset + limit],
+    }
+
+
+def cluster_overview(nodes, links):
+    """
+    Return the cluster nodes annotated with their object and attribute counts.
+    """
+    overview = []
+    for cluster_key in nodes.keys("system"):
+        object_keys = links.children(cluster_key)
+        overview.append({
+            **nodes.get(cluster_key),
+            "objectCount": len(object_keys),
+            # object->attribute links are never repeated, so links count attributes
+            "attributeCount": sum(links.out_degree(object_key) for object_key in object_keys),
+        })
+    return overview
+
+
+def child_nodes(nodes, links, parent_key):
+    """
+    Return the nodes linked directly under parent_key.
+    """
+    return [nodes.get(key) for key in links.children(parent_key) if key in nodes]
@@ -0,0 +1,202 @@
+"""
+Indexed storage for the graph nodes and links.
+"""
+from collections import Counter
+
+
+class LinkIndex:
+    """
+    The GoJS links held in hash maps from parent to children and child to parent.
+
+    Links are stored under an increasing id, so the ordered id map reproduces
+    the linkDataArray exactly (including the repeated cluster->object links the
+    builder emits), while the parent and child maps make reparenting a node
+    proportional to its own links instead of to the whole graph. The
+    linkDataArray list is only materialized when requested, and cached until
+    the next mutation.
+    """
+
+    def __init__(self, links=()):
+        self._next_id = 0
+        self._links = {}
+        self._incoming = {}
+        self._outgoing = {}
+        self._materialized = None
+        for link in links:
+            self._insert(link)
+
+    def __len__(self):
+        return len(self._links)
+
+    def __getstate__(self):
+        # The materialized list is a cache; pickling it would store every link twice
+        return {**self.__dict__, "_materialized": None}
+
+    def link_data_array(self):
+        """
+        Return the links as a GoJS linkDataArray; callers must not mutate it.
+        """
+        if self._materialized is None:
+            self._materialized = list(self._links.values())
+        return self._materialized
+
+    def parent(self, child):
+        """
+        Return the key of the node child is linked under, or None.
+        """
+        ids = self._incoming.get(child)
+        if not ids:
+            return None
+        return self._links[next(iter(ids))]["from"]
+
+    def children(self, parent):
+        """
+        Return the keys of the nodes linked under parent, in link order.
+        """
+        ids = self._outgoing.get(parent, ())
+        return list(dict.fromkeys(self._links[link_id]["to"] for link_id in ids))
+
+    def out_degree(self, parent):
+        """
+        Return the number of links from parent.
+        """
+        return len(self._outgoing.get(parent, ()))
+
+    def links_to(self, child):
+        """
+        Return the links pointing at child.
+        """
+        return [self._links[link_id] for link_id in self._incoming.get(child, ())]
+
+    def remove_links_to(self, child):
+        """
+        Remove every link pointing at child and return them.
+        """
+        removed = []
+        for link_id in self._incoming.pop(child, ()):
+            link = self._links.pop(link_id)
+            siblings = self._outgoing[link["from"]]
+            del siblings[link_id]
+            if not siblings:
+                del self._outgoing[link["from"]]
+            removed.append(link)
+        if removed:
+            self._materialized = None
+        return removed
+
+    def add(self, parent, child):
+        """
+        Link child under parent and return the new link.
+        """
+        link = {"from": parent, "to": child}
+        self._insert(link)
+        self._materialized = None
+        return link
+
+    def remove(self, parent, child):
+        """
+        Remove one link from parent to child and return it, or None.
+        """
+        ids = self._incoming.get(child, {})
+        link_id = next((link_id for link_id in ids if self._links[link_id]["from"] == parent), None)
+        if link_id is None:
+            return None
+        link = self._links.pop(link_id)
+        del ids[link_id]
+        if not ids:
+            del self._incoming[child]
+        siblings = self._outgoing[parent]
+        del siblings[link_id]
+        if not siblings:
+            del self._outgoing[parent]
+        self._materialized = None
+        return link
+
+    def apply(self, removed, added):
+        """
+        Apply a patch: remove each link in removed, then add each in added.
+
+        Nothing is changed if a removed link is not in the graph.
+        """
+        wanted = Counter((link["from"], link["to"]) for link in removed)
+        missing = [
+            {"from": parent, "to": child}
+            for (parent, child), count in wanted.items()
+            if sum(self._links[link_id]["from"] == parent for link_id in self._incoming.get(child, ())) < count
+        ]
+        if missing:
+            raise KeyError(f"Links not in the graph: {missing}")
+        for link in removed:
+            self.remove(link["from"], link["to"])
+        for link in added:
+            self.add(link["from"], link["to"])
+
+    def _insert(self, link):
+        link_id = self._next_id
+        self._next_id += 1
+        self._links[link_id] = link
+        # dicts used as ordered sets of link ids
+        self._incoming.setdefault(link["to"], {})[link_id] = None
+        self._outgoing.setdefault(link["from"], {})[link_id] = None
+
+
+class NodeIndex:
+    """
+    The GoJS nodes in build order, indexed by key and by category.
+    """
+
+    # Whether the node list was handed out since it was last copied; updates
+    # then copy it, so arrays being read off the event loop never change
+    _shared = True
+
+    def __init__(self, nodes=()):
+        self._nodes = list(nodes)
+        self._positions = {}
+        self._by_category = {}
+        for position, node in enumerate(self._nodes):
+            self._positions[node["key"]] = position
+            self._by_category.setdefault(node["category"], []).append(node["key"])
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def get(self, key):
+        """
+        Return the node with the given key, or None.
+        """
+        position = self._positions.get(key)
+        return None if position is None else self._nodes[position]
+
+    def position(self, key):
+        """
+        Return the position of the node in the nodeDataArray, or None.
+        """
+        return self._positions.get(key)
+
+    def keys(self, category):
+        """
+        Return the keys of the nodes of one category, in build order.
+        """
+        return self._by_category.get(category, [])
+
+    def node_data_array(self):
+        """
+        Return the nodes as a GoJS nodeDataArray; callers must not mutate it.
+        """
+        self._shared = True
+        return self._nodes
+
+    def update(self, key, field, value):
+        """
+        Set a field of a node and return its previous value.
+        """
+        position = self._positions[key]
+        if self._shared:
+            self._nodes = list(self._nodes)
+            self._shared = False
+        node = self._nodes[position]
+        self._nodes[position] = {**node, field: value}
+        return node.get(field)
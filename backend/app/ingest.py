@@ -0,0 +1,134 @@
+"""
+Incremental parsing of uploaded model files into compact DataFrames.
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Columns every uploaded model must provide
+REQUIRED_COLUMNS = [
+    "cluster_name",
+    "object_name",
+    "object_name_alt",
+    "attribute_name",
+    "attribute_name_alt",
+    "attribute_definition",
+]
+
+# Low-cardinality columns always stored as categoricals to keep the DataFrame small
+CATEGORICAL_COLUMNS = ["cluster_name", "object_name", "object_name_alt"]
+
+# Other text columns become categoricals when the first chunk has at most this
+# ratio of distinct values to rows
+CATEGORY_RATIO = 0.5
+
+# Number of rows parsed per chunk
+CHUNK_ROWS = 50_000
+
+
+class MissingColumnsError(ValueError):
+    """
+    Raised when an uploaded file lacks one of the required columns.
+    """
+
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"Missing required columns: {', '.join(missing)}")
+
+
+def missing_columns(columns):
+    """
+    Return the required columns absent from columns.
+    """
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def read_csv_header(stream):
+    """
+    Read only the header row of a binary CSV stream, then rewind it.
+    """
+    start = stream.tell()
+    columns = pd.read_csv(stream, nrows=0, encoding="utf-8").columns.tolist()
+    stream.seek(start)
+    return columns
+
+
+def read_csv_chunked(stream, chunk_rows=CHUNK_ROWS):
+    """
+    Parse a binary CSV stream chunk by chunk into a single DataFrame.
+
+    The header is validated before any data row is parsed and each chunk has
+    its categorical columns compacted before the next one is read, so only one
+    chunk of raw rows is alive at a time on top of the (compact) result.
+    """
+    columns = read_csv_header(stream)
+    missing = missing_columns(columns)
+    if missing:
+        raise MissingColumnsError(missing)
+
+    with pd.read_csv(stream, chunksize=chunk_rows, encoding="utf-8") as reader:
+        return collect_chunks(reader, columns)
+
+
+def collect_chunks(chunks, columns):
+    """
+    Concatenate DataFrame chunks into one DataFrame, converting the
+    categorical columns of each chunk as it arrives.
+    """
+    collected = []
+    categorical_columns = None
+    for chunk in chunks:
+        if categorical_columns is None:
+            categorical_columns = _categorical_columns(chunk)
+        for col in categorical_columns:
+            chunk[col] = chunk[col].astype("category")
+        collected.append(chunk)
+
+    return _concat_chunks(collected, columns, categorical_columns or CATEGORICAL_COLUMNS)
+
+
+def _categorical_columns(chunk):
+    """
+    Pick the columns of the first chunk worth storing as categoricals.
+    """
+    limit = len(chunk) * CATEGORY_RATIO
+    detected = [
+        col for col in chunk.columns
+        if col not in CATEGORICAL_COLUMNS
+        and pd.api.types.is_string_dtype(chunk[col])
+        and chunk[col].nunique() <= limit
+    ]
+    return CATEGORICAL_COLUMNS + detected
+
+
+def _concat_chunks(chunks, columns, categorical_columns):
+    """
+    Concatenate parsed chunks, merging the categoricals' categories.
+    """
+    if not chunks:
+        return pd.DataFrame(columns=columns).astype({col: "category" for col in categorical_columns})
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # pd.concat falls back to object dtype when categories differ, so union them first
+    categoricals = {col: _union([chunk[col] for chunk in chunks]) for col in categorical_columns}
+    for chunk in chunks:
+        chunk.drop(columns=categorical_columns, inplace=True)
+    df = pd.concat(chunks, ignore_index=True)
+    chunks.clear()
+    for col in sorted(categoricals, key=columns.index):
+        df.insert(columns.index(col), col, categoricals[col])
+    return df
+
+
+def _union(parts):
+    """
+    Union the categoricals of one column across chunks.
+
+    A chunk in which a text column is entirely empty parses as float, whose
+    categories cannot be unioned with text ones; such columns are rebuilt from
+    object values instead.
+    """
+    try:
+        return union_categoricals(parts, ignore_order=True)
+    except TypeError:
+        return pd.Categorical(pd.concat([part.astype(object) for part in parts], ignore_index=True))
@@ -1,13 +1,32 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, status
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import Depends, FastAPI, File, UploadFile, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-from io import StringIO
-import uuid
+from starlette.background import BackgroundTask
+import asyncio
+import functools
 import os
 import logging
+import tempfile
+import zipfile
 from pathlib import Path
 
+from app.dependencies import WORKSPACE_ID_PATTERN, get_graph_store, get_workspace, graph_store, metrics, workspaces
+from app.descriptions import DescriptionIndex
+from app.excel import ExcelFormatError, read_xlsx
+from app.graph_builder import build_graph, count_new_object_values
+from app.graph_export import GraphExport, ModelNotFoundError, Neo4jGraphStore, write_admin_import, write_cypher_script
+from app.ingest import MissingColumnsError, read_csv_chunked
+from app.graph_queries import child_nodes, cluster_overview, paginate, parse_filters, select_nodes
+from app.graph_store import LinkIndex, NodeIndex
+from app.metrics import RequestTimer
+from app.normalization import SIMILARITY_THRESHOLD, analyze_model
+from app.search import SearchIndex
+from app.revisions import EDIT, REDO, RESTORE, UNDO, combine_patches
+from app.serialization import SerializedPayload, encode_json, graph_etag
+from app.snapshots import SnapshotStore
+from app.workers import run_build, run_in_pool, shutdown_pools
+from app.workspaces import DEFAULT_WORKSPACE, Workspace
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,16 +37,47 @@ app = FastAPI()
 templates_dir = Path("templates")
 templates_dir.mkdir(exist_ok=True)
 
+# Origins allowed to call the API, and to open the graph feed
+ALLOWED_ORIGINS = ["http://localhost:3000"]  # React frontend URL
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # React frontend URL
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTimer, metrics=metrics)
+
+# Largest page served by the windowed graph queries
+MAX_PAGE_SIZE = 1000
+
+# Largest batch of keys served by /descriptions/
+MAX_DESCRIPTION_KEYS = 5000
+
+# Largest batch of moves accepted by /apply-drag-drop/batch/
+MAX_BATCH_MOVES = 5000
+
+# Drag-and-drop moves allowed, as (sourceType, targetType)
+DRAG_DROP_MOVES = (("attribute", "object"), ("object", "system"))
+
+# Why a move whose source or target is not in the graph is rejected
+NODE_NOT_FOUND = "Source or target node not found."
+
+# Node fields that can be edited, with the categories they apply to
+EDITABLE_FIELDS = {"label": ("system", "object", "attribute"), "harmonisedAttribute": ("attribute",)}
+
+# Longest label or harmonised attribute accepted by an edit
+MAX_FIELD_LENGTH = 500
 
-# In-memory storage for the uploaded DataFrame and node data
-data_store = {"df": None, "nodeDataArray": [], "linkDataArray": [], "loadDescriptions": False}
+# Edits are written to the workspace snapshot at most this often
+SNAPSHOT_DELAY_SECONDS = float(os.environ.get("BIM_SNAPSHOT_DELAY_SECONDS", "5"))
+
+# Keeps references to fire-and-forget tasks until they finish
+_background_tasks = set()
+
+# Snapshot saves waiting out their delay, by workspace ID; shutdown cuts it short
+_delayed_saves = {}
 
 # Copy the Excel template to the templates directory
 # Note: This should be done during app setup or handled via a proper file system approach
@@ -46,6 +96,32 @@ async def startup_event():
         logger.warning("Excel template not found in root directory")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if workspaces.snapshots is not None:
+        for workspace in workspaces.values():
+            await _flush_snapshot(workspace)
+    if graph_store is not None:
+        graph_store.close()
+    shutdown_pools()
+
+
+def _spawn(coro):
+    """
+    Run a coroutine in the background, logging its failure.
+    """
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+
+    def done(task):
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task failed: {task.exception()}")
+
+    task.add_done_callback(done)
+    return task
+
+
 @app.get("/api/templates/ai_template.xlsx")
 async def download_template():
     """
@@ -68,61 +144,47 @@ async def download_template():
 
 
 @app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    stable_keys: bool = Query(False, description="Derive node keys from content so they survive re-uploads"),
+    workspace: Workspace = Depends(get_workspace),
+):
     """
-    Upload a CSV file and parse it into a DataFrame.
+    Upload a CSV file or an Excel workbook and parse it into a DataFrame.
+
+    Workbooks are either a sheet with the same columns as the CSV, or the ER
+    export layout of the Excel template.
+
+    Node keys are always deterministic for a given file. With `stable_keys`,
+    attribute keys no longer depend on row positions, so re-uploading an edited
+    model keeps the keys of every node that did not change.
     """
     try:
-        # Read and parse the CSV file
-        content = await file.read()
-        df = pd.read_csv(StringIO(content.decode("utf-8")))
-
-        # Log the column names for debugging
-        logger.info(f"CSV columns: {df.columns.tolist()}")
-        
-        # Check for new_object column (with or without space)
-        if "new_object" in df.columns:
-            logger.info("Found 'new_object' column (without space)")
-            # Log sample values
-            logger.info(f"Sample 'new_object' values: {df['new_object'].head().tolist()}")
-        elif "new_object " in df.columns:
-            logger.info("Found 'new_object ' column (with space)")
-            # Log sample values
-            logger.info(f"Sample 'new_object ' values: {df['new_object '].head().tolist()}")
-            # Check if values exist
-            non_empty_count = df['new_object '].notna().sum()
-            logger.info(f"Number of non-empty 'new_object ' values: {non_empty_count}")
-            if non_empty_count > 0:
-                sample_values = df[df['new_object '].notna()]['new_object '].head().tolist()
-                logger.info(f"Sample non-empty values: {sample_values}")
-        else:
-            logger.warning("No 'new_object' column found in CSV")
-
-        # Validate required columns
-        required_columns = [
-            "cluster_name",
-            "object_name",
-            "object_name_alt",
-            "attribute_name",
-            "attribute_name_alt",
-            "attribute_definition",
-        ]
-        if not all(col in df.columns for col in required_columns):
-            logger.error("Missing required columns in CSV file")
+        # Parse the file incrementally from the spooled upload in a worker
+        # thread; the header is validated before any data row is read, so
+        # the validation is part of the parse stage
+        filename = file.filename or ""
+        is_excel = filename.lower().endswith((".xlsx", ".xls"))
+        file_kind = "Excel" if is_excel else "CSV"
+        try:
+            with metrics.timed("parse"):
+                if is_excel:
+                    df = await run_in_pool(read_xlsx, file.file, filename)
+                else:
+                    df = await run_in_pool(read_csv_chunked, file.file)
+        except MissingColumnsError as e:
+            logger.error(f"Missing required columns in {file_kind} file: {e.missing}")
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                content={"detail": "Missing required columns in CSV file"}
+                content={"detail": f"Missing required columns in {file_kind} file"}
             )
+        except ExcelFormatError as e:
+            logger.error(f"Invalid Excel file: {e}")
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(e)})
 
-        # Store the validated DataFrame in memory
-        data_store["df"] = df
-        
-        # Clear cached graph data
-        data_store["nodeDataArray"] = []
-        data_store["linkDataArray"] = []
-        
-        # Reset descriptions flag
-        data_store["loadDescriptions"] = False
+        _check_columns(df, file_kind)
+
+        await _install_model(workspace, df, stable_keys)
 
         return {"message": "File uploaded successfully"}
     except Exception as e:
@@ -133,26 +195,63 @@ async def upload_file(file: UploadFile = File(...)):
         )
 
 
-@app.get("/graph-data/")
-def get_graph_data():
+def _check_columns(df, file_kind):
     """
-    Generate graph data from the uploaded CSV file.
+    Log the columns of an uploaded model and its new_object values; samples
+    of the values are only taken when debug logging is on.
     """
-    if data_store["df"] is None:
-        logger.warning("No data available in data_store")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="No data available. Please upload a file first."
-        )
+    logger.info(f"{file_kind} columns: {df.columns.tolist()}")
 
-    if data_store["nodeDataArray"] and not data_store.get("loadDescriptions", False):
-        return {
-            "nodeDataArray": data_store["nodeDataArray"],
-            "linkDataArray": data_store["linkDataArray"],
-        }
-        
-    df = data_store["df"]
-    
+    # The new_object column is spelled with or without a trailing space
+    column = next((name for name in ("new_object", "new_object ") if name in df.columns), None)
+    if column is None:
+        logger.warning(f"No 'new_object' column found in {file_kind} file")
+        return
+    values = df[column]
+    logger.info(f"Number of non-empty '{column}' values: {values.notna().sum()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Sample non-empty '{column}' values: {values.dropna().head().tolist()}")
+
+
+async def _install_model(workspace, df, stable_keys):
+    """
+    Make df the workspace's model and build its graph.
+    """
+    async with workspace.lock:
+        # Build the graph and its per-cluster indexes up front, so the first
+        # (windowed) query does not pay for it. Nothing in the workspace is
+        # replaced until the build succeeds, so a model that fails to build
+        # leaves the previous one in place
+        graph = await _build_graph(df, stable_keys)
+
+        # Store the validated DataFrame in the session's workspace and reset
+        # the descriptions flag
+        workspace.update(df=df, loadDescriptions=False, stableKeys=stable_keys, pendingSnapshot=None)
+        _install_graph(workspace, *graph)
+        await run_in_pool(workspace.update_size)
+
+    _schedule_snapshot(workspace, delay=0)
+
+    # Make room for the new model by evicting idle workspaces
+    workspaces.schedule_eviction(keep=workspace.id)
+
+
+def _index_graph(df, node_data_array, link_data_array):
+    """
+    Build the node, link, description and search indexes of a freshly built graph.
+    """
+    nodes = NodeIndex(node_data_array)
+    links = LinkIndex(link_data_array)
+    descriptions = DescriptionIndex(df, nodes)
+    search = SearchIndex(df, nodes, descriptions.source_rows(), links)
+    return nodes, links, descriptions, search, cluster_overview(nodes, links)
+
+
+async def _build_graph(df, stable_keys):
+    """
+    Build the graph from df in the worker pools and return its node, link,
+    description and search indexes.
+    """
     # Check for new_object column (with or without space)
     if "new_object" in df.columns:
         logger.info("Found 'new_object' column in DataFrame")
@@ -161,171 +260,866 @@ def get_graph_data():
     else:
         logger.warning("No 'new_object' column found in DataFrame")
 
-    # Transform DataFrame into GoJS format
-    node_data_array = []
-    link_data_array = []
-
-    # Track unique nodes
-    added_object_nodes = {}
-    
-    #Create unique keys for each cluster
-    cluster_keys = {}
-    for cluster_name in df["cluster_name"].unique():
-        cluster_key = str(uuid.uuid4())
-        cluster_keys[cluster_name] = cluster_key
-        node_data_array.append({
-            "key": cluster_key, 
-            "category": "system", 
-            "label": cluster_name,
-            # Only add hoverLabel if descriptions should be loaded
-            "hoverLabel": cluster_name if data_store.get("loadDescriptions", False) else ""
-        })
-
-    attribute_nodes_with_new_object = 0
-    
-    # Process each row to create object and attribute nodes
-    for idx, row in df.iterrows():
-        # Add the object node if not already added
-        object_node_key = row["object_name"] + f"_{cluster_keys[row['cluster_name']]}"
-        if object_node_key not in added_object_nodes:
-            object_node = {
-                "key": object_node_key,
-                "category": "object",
-                "label": row["object_name"],
-                # Only add hoverLabel if descriptions should be loaded
-                "hoverLabel": row["object_name_alt"] if data_store.get("loadDescriptions", False) else "",
-            }
-            node_data_array.append(object_node)
-            added_object_nodes[object_node_key] = object_node
-
-        # Add the attribute node
-        attribute_node_key = str(uuid.uuid4())
-        
-        # Check if harmonised_attribute exists in the row
-        harmonised_attr = row.get("harmonised_attribute", "")
-        
-        # Create base attribute node with required fields
-        attribute_node = {
-            "key": attribute_node_key,
-            "category": "attribute",
-            "label": row["attribute_name"],
-            # Only add definition if descriptions should be loaded
-            "hoverLabel": f"{row['attribute_name_alt']}\n{row['attribute_definition']}" if data_store.get("loadDescriptions", False) else "",
-            "harmonisedAttribute": harmonised_attr if harmonised_attr else f"Harmonised-{row['attribute_name']}"
-        }
-        
-        # Add all other columns from the dataframe to preserve metadata
-        for col in df.columns:
-            if col not in ["cluster_name", "object_name", "object_name_alt", "attribute_name", "attribute_name_alt", "attribute_definition", "harmonised_attribute"]:
-                # Add the column to the attribute node, handling column names with spaces
-                column_name = col.strip()
-                # Get the value, handling potential NaN or None
-                val = row.get(col)
-                if pd.notna(val):  # Check if value is not NaN
-                    attribute_node[column_name] = val
-                    
-                    # Track if we're adding new_object values
-                    if column_name == "new_object" and val:
-                        attribute_nodes_with_new_object += 1
-                
-        node_data_array.append(attribute_node)
-        
-        # Create links
-        link_data_array.append({"from": cluster_keys[row["cluster_name"]], "to": object_node_key})
-        link_data_array.append({"from": object_node_key, "to": attribute_node_key})
+    # Transform DataFrame into GoJS format; hover text is served separately
+    with metrics.timed("build"):
+        node_data_array, link_data_array = await run_build(
+            build_graph, df, stable_keys=stable_keys
+        )
+        nodes, links, descriptions, search, clusters = await run_in_pool(
+            _index_graph, df, node_data_array, link_data_array
+        )
+    attribute_nodes_with_new_object = count_new_object_values(df)
 
     # Log statistics on data processing
     logger.info(f"Created {len(node_data_array)} nodes and {len(link_data_array)} links")
     logger.info(f"Attributes with new_object values: {attribute_nodes_with_new_object}")
     
     # Check a sample attribute node to verify it has the new_object property
-    attribute_nodes = [node for node in node_data_array if node["category"] == "attribute"]
-    if attribute_nodes:
-        sample_node = attribute_nodes[0]
+    attribute_keys = nodes.keys("attribute")
+    if attribute_keys:
+        sample_node = nodes.get(attribute_keys[0])
         if "new_object" in sample_node:
             logger.info(f"Sample attribute has 'new_object' property with value: {sample_node['new_object']}")
         else:
             logger.warning("Sample attribute does not have 'new_object' property")
             logger.info(f"Sample attribute properties: {list(sample_node.keys())}")
-    
-    # Cache the generated node and link data
-    data_store["nodeDataArray"] = node_data_array
-    data_store["linkDataArray"] = link_data_array
-    
+
+    return nodes, links, descriptions, search, clusters
+
+
+def _install_graph(workspace, nodes, links, descriptions, search, clusters):
+    """
+    Cache the indexes of a freshly built graph; its keys start a new base
+    revision, which is returned.
+    """
+    workspace.update(
+        nodes=nodes, links=links, descriptions=descriptions, search=search, graphPayload=None, graphBuilt=True
+    )
+    revision = workspace["revisions"].reset()
+    workspace["clusterOverview"] = (_revision_tag(workspace), clusters)
+    workspace.feed.reload(revision)
+    return revision
+
+
+async def _rebuild_graph(workspace, df):
+    """
+    Build the graph of the workspace's model and install it. Returns the new
+    base revision, or None when df was replaced by another upload while it
+    was being built.
+    """
+    graph = await _build_graph(df, workspace.get("stableKeys", False))
+    if workspace["df"] is not df:
+        logger.info(f"Discarding graph built for a replaced model in workspace '{workspace.id}'")
+        return None
+    return _install_graph(workspace, *graph)
+
+
+async def _load_snapshot(workspace, path):
+    """
+    Load a restored workspace's model and graph from its snapshot.
+    """
+    df, nodes, links = await run_in_pool(SnapshotStore.load, path)
+    descriptions = await run_in_pool(DescriptionIndex, df, nodes)
+    search = await run_in_pool(SearchIndex, df, nodes, descriptions.source_rows(), links)
+    clusters = await run_in_pool(cluster_overview, nodes, links)
+    if workspace["pendingSnapshot"] != path:
+        return
+    workspace.update(
+        df=df, nodes=nodes, links=links, descriptions=descriptions, search=search, pendingSnapshot=None,
+        graphBuilt=True, clusterOverview=(_revision_tag(workspace), clusters),
+    )
+    logger.info(f"Loaded workspace '{workspace.id}' from its snapshot")
+
+
+def _schedule_snapshot(workspace, delay=SNAPSHOT_DELAY_SECONDS):
+    """
+    Save the workspace's snapshot in the background, coalescing the edits
+    made within delay seconds into one write.
+    """
+    if workspaces.snapshots is None or "save" in workspace.flights:
+        return
+    _spawn(workspace.flights.do("save", functools.partial(_save_snapshot, workspace, delay)))
+
+
+async def _save_snapshot(workspace, delay):
+    """
+    Write snapshots until the saved revision is the current one. The lock is
+    only held while the state is captured, so edits go on during the write.
+    """
+    while workspace.has_unsaved_changes():
+        _delayed_saves[workspace.id] = asyncio.current_task()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            del _delayed_saves[workspace.id]
+        async with workspace.lock:
+            if not workspace.has_unsaved_changes():
+                break
+            state = SnapshotStore.capture(workspace)
+        workspace["snapshotRevision"] = await run_in_pool(workspaces.snapshots.write, state)
+
+
+async def _flush_snapshot(workspace):
+    """
+    Save the workspace's unsaved edits now: a save waiting out its delay is
+    cut short, and a write in progress is waited for, so writes never overlap.
+    """
+    delayed = _delayed_saves.get(workspace.id)
+    if delayed is not None:
+        delayed.cancel()
+        await asyncio.gather(delayed, return_exceptions=True)
+    await workspace.flights.do("save", functools.partial(_save_snapshot, workspace, 0))
+
+
+async def _require_graph(workspace):
+    """
+    Ensure a graph is available, loading it from the workspace's snapshot or
+    building it from the uploaded data if needed.
+
+    Concurrent requests for the same model share a single build.
+    """
+    while not workspace["graphBuilt"]:
+        snapshot = workspace["pendingSnapshot"]
+        if snapshot is not None:
+            await workspace.flights.do(("snapshot", snapshot), functools.partial(_load_snapshot, workspace, snapshot))
+            continue
+
+        df = workspace["df"]
+        if df is None:
+            logger.warning(f"No data available in workspace '{workspace.id}'")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, 
+                detail="No data available. Please upload a file first."
+            )
+
+        await workspace.flights.do(("graph", id(df)), functools.partial(_rebuild_graph, workspace, df))
+        if workspace["df"] is df:
+            break
+
+
+def _revision_tag(workspace):
+    revisions = workspace["revisions"]
+    return revisions.build, revisions.revision
+
+
+def _cluster_overview(workspace):
+    """
+    Return the clusters with their object and attribute counts at the
+    current revision. They are counted when the graph is indexed, and again
+    only after the graph has been edited.
+    """
+    tag, clusters = workspace["clusterOverview"]
+    if tag != _revision_tag(workspace):
+        clusters = cluster_overview(workspace["nodes"], workspace["links"])
+        workspace["clusterOverview"] = (_revision_tag(workspace), clusters)
+    return clusters
+
+
+def _graph_etag(workspace):
+    return graph_etag(workspace.id, workspace["revisions"], workspace.get("loadDescriptions", False))
+
+
+def _serialize_graph(node_data_array, link_data_array, revision, descriptions, etag):
+    with metrics.timed("serialize"):
+        if descriptions is not None:
+            node_data_array = [
+                {**node, "hoverLabel": hover}
+                for node, hover in zip(node_data_array, descriptions.hover_labels())
+            ]
+        return SerializedPayload(
+            {
+                "nodeDataArray": node_data_array,
+                "linkDataArray": link_data_array,
+                "revision": revision,
+            },
+            etag,
+        )
+
+
+def _compress(payload, coding):
+    with metrics.timed("compress"):
+        return payload.encoded(coding)
+
+
+async def _graph_payload(workspace):
+    """
+    Return the full graph document for the current revision, serialized once
+    per revision (in a worker thread) and reused until the graph changes.
+    """
+    etag = _graph_etag(workspace)
+    payload = workspace.get("graphPayload")
+    if payload is not None and payload.etag == etag:
+        return payload
+
+    # Take the arrays on the event loop, so edits made while the worker
+    # encodes them cannot change what it reads
+    descriptions = workspace["descriptions"] if workspace.get("loadDescriptions", False) else None
+    payload = await workspace.flights.do(etag, functools.partial(
+        run_in_pool,
+        _serialize_graph,
+        workspace["nodes"].node_data_array(),
+        workspace["links"].link_data_array(),
+        workspace["revisions"].revision,
+        descriptions,
+        etag,
+    ))
+    if _graph_etag(workspace) == etag:
+        workspace["graphPayload"] = payload
+    return payload
+
+
+@app.get("/graph-data/")
+async def get_graph_data(
+    request: Request,
+    since: int = Query(None, description="Return only the patches applied after this revision"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    """
+    Generate graph data from the uploaded CSV file.
+
+    With `since`, only the link patches applied after that revision are
+    returned, unless the graph has been rebuilt in the meantime, in which case
+    the full graph is returned as usual.
+
+    The full graph is served from bytes encoded (and compressed) once per
+    revision, with an ETag so unchanged graphs are answered with a 304.
+    """
+    # A graph document restored from a snapshot is served before the model
+    # itself has finished loading
+    cached = workspace.get("graphPayload")
+    if since is not None or cached is None or cached.etag != _graph_etag(workspace):
+        await _require_graph(workspace)
+    revisions = workspace["revisions"]
+
+    if since is not None:
+        patches = revisions.since(since)
+        if patches is not None:
+            return {"revision": revisions.revision, "patches": patches}
+
+    payload = await _graph_payload(workspace)
+
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding, X-Workspace-Id"}
+    if payload.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    coding = payload.choose_encoding(request.headers.get("accept-encoding"))
+    if payload.is_encoded(coding):
+        body = payload.encoded(coding)
+    else:
+        body = await workspace.flights.do(
+            (payload.etag, coding), functools.partial(run_in_pool, _compress, payload, coding)
+        )
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.websocket("/ws/graph/")
+async def graph_feed(
+    websocket: WebSocket,
+    since: int = Query(None, description="Revision of the client's copy of the graph, to catch up from"),
+    workspace_id: str = Query(DEFAULT_WORKSPACE, alias="workspace"),
+):
+    """
+    Stream the edits made to a workspace's graph by any client, as patches
+    batched per tick (see app/feed.py).
+
+    Browsers cannot set headers on a WebSocket, so the workspace is chosen
+    with a query parameter instead of X-Workspace-Id.
+
+    CORS does not apply to WebSockets, so the Origin sent by browsers is
+    checked here against the same allowed origins.
+    """
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        logger.warning(f"Refused graph feed for origin '{origin}'")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not WORKSPACE_ID_PATTERN.match(workspace_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    workspace = await workspaces.get(workspace_id)
+    await websocket.accept()
+
+    feed = workspace.feed
+    subscriber = feed.subscribe(since)
+    sender = asyncio.ensure_future(feed.serve(websocket.send_text, subscriber))
+    try:
+        # Clients only listen; reading tells when they disconnect
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        feed.unsubscribe(subscriber)
+        sender.cancel()
+        # Read its outcome, e.g. a send to a client that already went away
+        (outcome,) = await asyncio.gather(sender, return_exceptions=True)
+        if isinstance(outcome, Exception):
+            logger.info(f"Graph feed of workspace '{workspace.id}' stopped sending: {outcome!r}")
+
+
+def _json_response(content):
+    """
+    Encode a windowed view of the graph the way /graph-data/ is encoded.
+    """
+    return Response(content=encode_json(content), media_type="application/json")
+
+
+def _parse_filters(filters):
+    try:
+        return parse_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/search/")
+async def search_nodes(
+    q: str = Query(..., min_length=1, max_length=200, description="Words or part of a name to look for"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    category: str = Query(None, description="Only nodes of this category: system, object or attribute"),
+    within: str = Query(None, description="Only nodes below this cluster or object"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    """
+    Rank the nodes whose name, alternative name or definition match q,
+    tolerating typos and matching name prefixes.
+    """
+    await _require_graph(workspace)
+    total, exact, matches = workspace["search"].search(q, limit=limit, category=category, within=within)
+    nodes = workspace["nodes"].node_data_array()
+    results = []
+    for position, score, field in matches:
+        node = nodes[position]
+        parent = workspace["search"].parent(position)
+        results.append({
+            "key": node["key"],
+            "category": node["category"],
+            "label": node["label"],
+            "parent": None if parent is None else nodes[parent]["key"],
+            "score": round(score, 4),
+            "match": field,
+        })
     return {
-        "nodeDataArray": node_data_array,
-        "linkDataArray": link_data_array,
+        "query": q,
+        "total": total,
+        "totalExact": exact,
+        "results": results,
+        "revision": workspace["revisions"].revision,
     }
 
 
+@app.get("/graph/clusters/")
+async def get_cluster_overview(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    search: str = Query(None, description="Case-insensitive substring of the cluster label"),
+    sort: str = Query(None, description="Node field to sort by, e.g. label or attributeCount"),
+    descending: bool = False,
+    workspace: Workspace = Depends(get_workspace),
+):
+    """
+    Return a page of cluster nodes with their object and attribute counts,
+    as the first, cheap view of a large model.
+    """
+    await _require_graph(workspace)
+    clusters = select_nodes(
+        _cluster_overview(workspace),
+        search=search, sort=sort, descending=descending,
+    )
+    return _json_response({**paginate(clusters, offset, limit), "revision": workspace["revisions"].revision})
+
+
+@app.get("/graph/nodes/{key}/children/")
+async def get_node_children(
+    key: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    search: str = Query(None, description="Case-insensitive substring of the child label"),
+    new_object: bool = Query(None, description="Keep only children with (or without) a new_object value"),
+    filter: list[str] = Query([], description="Substring filters on node fields, as field:value"),
+    sort: str = Query(None, description="Node field to sort by, e.g. label or harmonisedAttribute"),
+    descending: bool = False,
+    workspace: Workspace = Depends(get_workspace),
+):
+    """
+    Return a page of the objects of a cluster, or of the attributes of an
+    object, together with the links to them.
+    """
+    filters = _parse_filters(filter)
+    await _require_graph(workspace)
+    nodes = workspace["nodes"]
+    if key not in nodes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found.")
+
+    children = select_nodes(
+        child_nodes(nodes, workspace["links"], key),
+        search=search, new_object=new_object, filters=filters, sort=sort, descending=descending,
+    )
+    window = paginate(children, offset, limit)
+    return _json_response({
+        **window,
+        "linkDataArray": [{"from": key, "to": child["key"]} for child in window["nodeDataArray"]],
+        "revision": workspace["revisions"].revision,
+    })
+
+
 @app.post("/load-descriptions/")
-async def load_descriptions():
+async def load_descriptions(workspace: Workspace = Depends(get_workspace)):
     """
     Toggle loading descriptions for nodes.
     """
-    if data_store["df"] is None:
+    if workspace["df"] is None and workspace["pendingSnapshot"] is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No data available. Please upload a file first."
         )
 
-    # Set flag to load descriptions
-    data_store["loadDescriptions"] = True
-    
-    # Clear cached graph data to force regeneration
-    data_store["nodeDataArray"] = []
-    data_store["linkDataArray"] = []
+    # Set flag to load descriptions; the structural graph cache is kept, hover
+    # text is filled in from the description index when the graph is served
+    workspace["loadDescriptions"] = True
 
     return {"message": "Descriptions will be loaded in next graph data fetch"}
 
 
+@app.post("/descriptions/")
+async def get_descriptions(data: dict, workspace: Workspace = Depends(get_workspace)):
+    """
+    Return the hover text of the requested node keys, e.g. the visible ones.
+    """
+    keys = data.get("keys")
+    if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a list of node keys.")
+    if len(keys) > MAX_DESCRIPTION_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_DESCRIPTION_KEYS} keys can be requested at once."
+        )
+
+    await _require_graph(workspace)
+    return {"descriptions": workspace["descriptions"].lookup(keys)}
+
+
+def _record(workspace, removed, added, updated=(), action=EDIT):
+    """
+    Record a mutation applied to the graph as a new revision, keeping the
+    search index in step and publishing the patch to the connected clients.
+    """
+    patch = workspace["revisions"].record(removed, added, updated, action=action)
+    search = workspace["search"]
+    search.reparent(added)
+    for update in updated:
+        if update["field"] == "label":
+            search.relabel(update["key"], update["value"])
+    workspace.feed.publish(patch)
+    return patch
+
+
 @app.post("/apply-drag-drop/")
-async def apply_drag_drop(data: dict):
+async def apply_drag_drop(data: dict, workspace: Workspace = Depends(get_workspace)):
     """
     Update graph data based on drag-and-drop actions.
+
+    Returns the patch (links removed and added) together with the new graph
+    revision, so clients can update their copy without refetching the graph.
     """
-    source_key = data.get("source")
-    target_key = data.get("target")
-    source_type = data.get("sourceType")
-    target_type = data.get("targetType")
-    
-    if not source_key or not target_key:
-       raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid source or target key.")
+    async with workspace.lock:
+        await _require_graph(workspace)
 
-    # Get all the links
-    links = data_store["linkDataArray"]
+        # Validate the move against the graph before touching any link, like a batch move
+        error = _move_error(data, workspace["nodes"], seen=())
+        if error is not None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND if error == NODE_NOT_FOUND else status.HTTP_400_BAD_REQUEST,
+                detail=error,
+            )
+        source_key, target_key = data["source"], data["target"]
 
-    # Find all links connected to source key
-    links_to_remove = [link for link in links if link["to"] == source_key ]
+        # Detach the source from its current parent and link it under the target
+        links = workspace["links"]
+        links_to_remove = links.remove_links_to(source_key)
+        new_link = links.add(target_key, source_key)
 
-    # Filter out all links related to the source key
-    data_store["linkDataArray"] = [link for link in data_store["linkDataArray"] if link not in links_to_remove]
+        patch = _record(workspace, removed=links_to_remove, added=[new_link])
 
-    # Add new link based on drag-and-drop type
-    if source_type == "attribute" and target_type == "object":
-         data_store["linkDataArray"].append({"from": target_key, "to": source_key})
+    _schedule_snapshot(workspace)
+
+    return {"message": "Drag-and-drop operation completed successfully", **patch}
+
+
+def _move_error(move, nodes, seen):
+    """
+    Return why a drag-and-drop move is invalid against the current graph,
+    or None. seen holds the sources already moved by the same batch.
+    """
+    if not isinstance(move, dict):
+        return "Expected an object with source, target, sourceType and targetType."
+    source_key, target_key = move.get("source"), move.get("target")
+    source_type, target_type = move.get("sourceType"), move.get("targetType")
+    if not source_key or not target_key or not isinstance(source_key, str) or not isinstance(target_key, str):
+        return "Invalid source or target key."
+    if (source_type, target_type) not in DRAG_DROP_MOVES:
+        return "Invalid drag-and-drop operation."
+    source, target = nodes.get(source_key), nodes.get(target_key)
+    if source is None or target is None:
+        return NODE_NOT_FOUND
+    if source["category"] != source_type or target["category"] != target_type:
+        return "Node categories do not match sourceType and targetType."
+    if source_key in seen:
+        return "The source is moved more than once."
+    return None
+
+
+@app.post("/apply-drag-drop/batch/")
+async def apply_drag_drop_batch(data: dict, workspace: Workspace = Depends(get_workspace)):
+    """
+    Apply many drag-and-drop moves at once.
+
+    Every move is validated against the current graph before any link is
+    touched; if one is invalid, nothing is applied and the errors are
+    returned by move index. The moves are applied as a single revision with
+    one combined patch, and are undone together.
+    """
+    moves = data.get("moves")
+    if not isinstance(moves, list) or not moves:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a non-empty list of moves.")
+    if len(moves) > MAX_BATCH_MOVES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_MOVES} moves can be applied at once."
+        )
+
+    async with workspace.lock:
+        await _require_graph(workspace)
+        nodes = workspace["nodes"]
+
+        errors = []
+        seen = set()
+        for index, move in enumerate(moves):
+            error = _move_error(move, nodes, seen)
+            if error is not None:
+                errors.append({"index": index, "detail": error})
+            else:
+                seen.add(move["source"])
+        if errors:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors)
+
+        # Detach every source from its current parent and link it under its target
+        links = workspace["links"]
+        patches = [
+            {"removed": links.remove_links_to(move["source"]), "added": [links.add(move["target"], move["source"])]}
+            for move in moves
+        ]
+        removed, added = combine_patches(patches)
+        patch = _record(workspace, removed=removed, added=added)
+
+    _schedule_snapshot(workspace)
+    return {"message": f"Applied {len(moves)} drag-and-drop operations successfully", **patch}
+
+
+@app.patch("/graph/nodes/{key}/")
+async def update_node(key: str, data: dict, workspace: Workspace = Depends(get_workspace)):
+    """
+    Rename a node, or change the harmonised attribute of an attribute.
+
+    The patch lists the `updated` fields with their previous values; like a
+    move, the edit is broadcast to the connected clients and can be undone.
+    """
+    if not data or not set(data) <= set(EDITABLE_FIELDS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Expected some of the fields: {', '.join(EDITABLE_FIELDS)}.",
+        )
+    for field, value in data.items():
+        if not isinstance(value, str) or not value.strip() or len(value) > MAX_FIELD_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{field} must be a non-empty string of at most {MAX_FIELD_LENGTH} characters.",
+            )
+
+    async with workspace.lock:
+        await _require_graph(workspace)
+        nodes = workspace["nodes"]
+        node = nodes.get(key)
+        if node is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found.")
+        for field in data:
+            if node["category"] not in EDITABLE_FIELDS[field]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{field} cannot be set on a {node['category']} node.",
+                )
+
+        updated = []
+        for field, value in data.items():
+            value = value.strip()
+            if value != node.get(field):
+                previous = nodes.update(key, field, value)
+                updated.append({"key": key, "field": field, "value": value, "previous": previous})
+        if not updated:
+            return {"message": "The node already has these values", "revision": workspace["revisions"].revision}
+        patch = _record(workspace, removed=[], added=[], updated=updated)
+
+    _schedule_snapshot(workspace)
+    return {"message": "Node updated successfully", **patch}
+
+
+@app.get("/history/")
+async def get_history(workspace: Workspace = Depends(get_workspace)):
+    """
+    List the versions of the graph that can still be restored.
+    """
+    revisions = workspace["revisions"]
+    return {
+        "revision": revisions.revision,
+        "baseRevision": revisions.base_revision,
+        "canUndo": revisions.can_undo,
+        "canRedo": revisions.can_redo,
+        "versions": revisions.history(),
+    }
+
+
+async def _apply_history(workspace, change, action, unavailable):
+    """
+    Apply the (removed, added, updated) changes computed by
+    change(revisions) from the journal and record them as a new revision.
+    Returns the patch.
+    """
+    async with workspace.lock:
+        await _require_graph(workspace)
+        changes = change(workspace["revisions"])
+        if changes is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=unavailable)
+
+        removed, added, updated = changes
+        try:
+            missing = [update["key"] for update in updated if update["key"] not in workspace["nodes"]]
+            if missing:
+                raise KeyError(missing[0])
+            workspace["links"].apply(removed, added)
+        except KeyError as e:
+            logger.error(f"History of workspace '{workspace.id}' does not match its graph: {e}")
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The history no longer matches the graph.")
+        for update in updated:
+            workspace["nodes"].update(update["key"], update["field"], update["value"])
+        patch = _record(workspace, removed=removed, added=added, updated=updated, action=action)
+
+    _schedule_snapshot(workspace)
+    return patch
+
+
+@app.post("/history/undo/")
+async def undo(workspace: Workspace = Depends(get_workspace)):
+    """
+    Revert the last edit. The revert is a new revision with its own patch.
+    """
+    patch = await _apply_history(workspace, lambda revisions: revisions.undo_patch(), UNDO, "Nothing to undo.")
+    return {"message": "Undo completed successfully", **patch}
 
-    elif source_type == "object" and target_type == "system":
-        data_store["linkDataArray"].append({"from": target_key, "to": source_key})
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid drag-and-drop operation.")
 
+@app.post("/history/redo/")
+async def redo(workspace: Workspace = Depends(get_workspace)):
+    """
+    Reapply the last undone edit.
+    """
+    patch = await _apply_history(workspace, lambda revisions: revisions.redo_patch(), REDO, "Nothing to redo.")
+    return {"message": "Redo completed successfully", **patch}
 
-    return {"message": "Drag-and-drop operation completed successfully"}
+
+@app.post("/history/restore/{revision}/")
+async def restore_version(revision: int, workspace: Workspace = Depends(get_workspace)):
+    """
+    Bring the links back to their state at an earlier revision. The restore
+    is a new revision (which can be undone), patching only the links that
+    changed since then.
+    """
+    if revision == workspace["revisions"].revision:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The graph is already at this version.")
+    patch = await _apply_history(
+        workspace,
+        lambda revisions: revisions.restore_patch(revision),
+        RESTORE,
+        "This version is no longer in the history.",
+    )
+    return {"message": f"Restored version {revision}", **patch}
+
+
+async def _graph_export(workspace):
+    """
+    Capture the workspace's graph for an export. Edits replace the link list
+    rather than mutating it, so later edits do not affect a running export.
+    """
+    async with workspace.lock:
+        await _require_graph(workspace)
+        return GraphExport(
+            workspace["df"],
+            workspace["nodes"].node_data_array(),
+            workspace["links"].link_data_array(),
+            workspace["descriptions"],
+        )
+
+
+def _cypher_file(export, model):
+    with tempfile.NamedTemporaryFile("w", suffix=".cypher", delete=False, encoding="utf-8") as f:
+        write_cypher_script(export, f, model)
+    return f.name
+
+
+def _admin_import_archive(export, model):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_admin_import(export, directory, model)
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+                for path in paths:
+                    archive.write(path, path.name)
+    return f.name
+
+
+@app.get("/export/neo4j/cypher/")
+async def export_cypher(workspace: Workspace = Depends(get_workspace)):
+    """
+    Download the graph as a cypher-shell script of batched UNWIND statements.
+    """
+    export = await _graph_export(workspace)
+    path = await run_in_pool(_cypher_file, export, workspace.id)
+    return FileResponse(
+        path=path,
+        filename=f"{workspace.id}.cypher",
+        media_type="text/plain",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@app.get("/export/neo4j/admin-import/")
+async def export_admin_import(workspace: Workspace = Depends(get_workspace)):
+    """
+    Download the graph as neo4j-admin import CSV files, zipped with the
+    command that bulk loads them.
+    """
+    export = await _graph_export(workspace)
+    path = await run_in_pool(_admin_import_archive, export, workspace.id)
+    return FileResponse(
+        path=path,
+        filename=f"{workspace.id}-neo4j-import.zip",
+        media_type="application/zip",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@app.post("/export/neo4j/")
+async def export_neo4j(
+    workspace: Workspace = Depends(get_workspace),
+    store: Neo4jGraphStore = Depends(get_graph_store),
+):
+    """
+    Write the graph to the configured Neo4j database under the workspace ID,
+    replacing any earlier export of it.
+    """
+    export = await _graph_export(workspace)
+    try:
+        result = await run_in_pool(store.save, export, workspace.id)
+    except Exception as e:
+        logger.error(f"Neo4j export of workspace '{workspace.id}' failed: {e}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Neo4j export failed: {e}")
+
+    logger.info(
+        f"Exported {result['nodes']} nodes and {result['relationships']} relationships "
+        f"to Neo4j in {result['seconds']}s ({result['nodesPerSecond']} nodes/s)"
+    )
+    return result
+
+
+@app.post("/import/neo4j/")
+async def import_neo4j(
+    model: str = Query(None, description="Model ID in the database; defaults to the workspace ID"),
+    stable_keys: bool = Query(False, description="Derive node keys from content so they survive re-uploads"),
+    workspace: Workspace = Depends(get_workspace),
+    store: Neo4jGraphStore = Depends(get_graph_store),
+):
+    """
+    Load a model exported to the configured Neo4j database into the
+    workspace, as if it had been uploaded.
+    """
+    model = model or workspace.id
+    try:
+        df = await run_in_pool(store.load, model)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        logger.error(f"Neo4j import of model '{model}' failed: {e}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Neo4j import failed: {e}")
+
+    await _install_model(workspace, df, stable_keys)
+    return {"message": f"Model '{model}' imported successfully", "rows": len(df)}
+
+
+@app.get("/analysis/normalization/")
+async def get_normalization_analysis(
+    threshold: float = Query(SIMILARITY_THRESHOLD, gt=0, le=1, description="Similarity from which definitions or attribute sets count as duplicates"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Largest number of groups returned per finding"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    """
+    Report redundancy in the model: attributes repeated across objects,
+    harmonised attribute candidates, synonyms and overlapping objects.
+    """
+    async with workspace.lock:
+        await _require_graph(workspace)
+        revision = workspace["revisions"].revision
+        arguments = (
+            workspace["df"],
+            workspace["nodes"].node_data_array(),
+            workspace["links"].link_data_array(),
+            workspace["descriptions"].source_rows(),
+        )
+
+    result = await workspace.flights.do(
+        ("normalization", revision, threshold, limit),
+        functools.partial(run_in_pool, analyze_model, *arguments, threshold=threshold, limit=limit),
+    )
+    return {"revision": revision, **result}
+
+
+@app.delete("/workspace/")
+async def reset_workspace(workspace: Workspace = Depends(get_workspace)):
+    """
+    Drop the workspace's model and delete its snapshot, e.g. when the tab
+    that owns it is closed.
+    """
+    async with workspace.lock:
+        workspace.reset()
+        workspace.feed.reload(workspace["revisions"].revision)
+    # Wait for a snapshot write in progress, so it cannot recreate the files
+    await _flush_snapshot(workspace)
+    await workspaces.forget(workspace.id)
+    return {"message": f"Workspace '{workspace.id}' reset"}
 
 
 @app.get("/graph-summary/")
-def get_graph_summary():
+async def get_graph_summary(workspace: Workspace = Depends(get_workspace)):
     """
     Provide a summary of the graph data (useful for large datasets).
     """
-    if not data_store["nodeDataArray"] or not data_store["linkDataArray"]:
+    await _require_graph(workspace)
+    if not workspace["nodes"] or not workspace["links"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No graph data available. Please upload a file first."
         )
 
     return {
-        "nodeCount": len(data_store["nodeDataArray"]),
-        "linkCount": len(data_store["linkDataArray"]),
-    }
\ No newline at end of file
+        "nodeCount": len(workspace["nodes"]),
+        "linkCount": len(workspace["links"]),
+    }
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Serve the request and stage timing histograms in the Prometheus text
+    format, when enabled with BIM_METRICS=1.
+    """
+    if not metrics.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled. Set BIM_METRICS=1 to enable them.",
+        )
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,156 @@
+"""
+Opt-in timing of requests and of the stages of processing a model, exposed
+as histograms in the Prometheus text format.
+"""
+import bisect
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = "bim_stage_seconds"
+REQUEST_SECONDS = "bim_request_seconds"
+
+DESCRIPTIONS = {
+    STAGE_SECONDS: "Time spent in each stage of processing a model.",
+    REQUEST_SECONDS: "Time spent handling HTTP requests, by route.",
+}
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their sum.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+def _labels(labels):
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return ",".join(f'{name}="{value}"' for name, value in escaped)
+
+
+class Metrics:
+    """
+    Histograms keyed by metric name and labels.
+
+    Disabled metrics record nothing, so the timers cost a clock read at most.
+    Observations may come from worker threads.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build metrics enabled by BIM_METRICS=1.
+        """
+        return cls(enabled=os.environ.get("BIM_METRICS", "").lower() in ("1", "true", "yes"))
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = name, tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """
+        Time the enclosed block as one run of stage.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage)
+
+    def totals(self, name):
+        """
+        Return {labels: (count, sum)} of the histograms of metric name, with
+        labels as sorted (name, value) pairs.
+        """
+        with self._lock:
+            return {
+                labels: (histogram.count, histogram.sum)
+                for (metric, labels), histogram in self._histograms.items()
+                if metric == name
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """
+        Return every histogram in the Prometheus text exposition format.
+        """
+        with self._lock:
+            snapshot = sorted(
+                (name, labels, list(histogram.counts), histogram.sum)
+                for (name, labels), histogram in self._histograms.items()
+            )
+        lines = []
+        for name, series in itertools.groupby(snapshot, key=lambda item: item[0]):
+            lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for _, labels, counts, total in series:
+                label_text = _labels(labels)
+                for bound, cumulative in zip((*BUCKETS, "+Inf"), itertools.accumulate(counts)):
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {total}")
+                lines.append(f"{name}_count{{{label_text}}} {sum(counts)}")
+        return "".join(f"{line}\n" for line in lines)
+
+
+class RequestTimer:
+    """
+    ASGI middleware timing HTTP requests by method and route template.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe(
+                REQUEST_SECONDS,
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+            )
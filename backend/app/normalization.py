@@ -0,0 +1,271 @@
+"""
+Redundancy (3NF) analysis of a model: repeated attributes, harmonised
+attribute candidates, synonyms and objects with overlapping attribute sets.
+
+Nothing is compared pairwise. Exact repeats are found by grouping hashed name
+signatures; near duplicates by MinHash signatures bucketed with LSH bands,
+where each bucket member is checked against the bucket's first member only,
+so the work stays linear in the number of attributes even when a common
+phrase puts most definitions in one bucket.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Estimated Jaccard similarity from which two definitions (or attribute sets)
+# count as near duplicates
+SIMILARITY_THRESHOLD = 0.8
+
+# MinHash signature length, split into LSH bands of NUM_PERMUTATIONS / BANDS
+# rows; 16 bands of 4 rows make pairs above ~0.5 similarity likely candidates
+NUM_PERMUTATIONS = 64
+BANDS = 16
+
+# Objects must share at least this many attributes to be reported as overlapping
+MIN_SHARED_ATTRIBUTES = 2
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_name(name):
+    """
+    Reduce a name to its lowercase words, so "Serial-No." matches "serial no".
+    """
+    return " ".join(_WORD.findall(str(name).lower())) if name is not None else ""
+
+
+def _flatten(token_sets):
+    """
+    Flatten per-document token lists into (document ids, token hashes).
+    """
+    lengths = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64, count=len(token_sets))
+    doc_ids = np.repeat(np.arange(len(token_sets)), lengths)
+    flat = np.empty(int(lengths.sum()), dtype=object)
+    flat[:] = [token for tokens in token_sets for token in tokens]
+    return doc_ids, pd.util.hash_array(flat)
+
+
+def minhash_signatures(doc_ids, hashes, n_docs, num_permutations=NUM_PERMUTATIONS, seed=0):
+    """
+    Return the (n_docs, num_permutations) MinHash signatures of the token
+    hashes of each document, using multiply-shift hashing as permutations.
+    Documents without tokens keep the maximum value in every position.
+    """
+    signatures = np.full((n_docs, num_permutations), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if not len(hashes):
+        return signatures
+    order = np.argsort(doc_ids, kind="stable")
+    doc_ids, hashes = doc_ids[order], hashes[order]
+    starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+    docs = doc_ids[starts]
+
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2**63, num_permutations, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2**63, num_permutations, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(num_permutations):
+            values = ((hashes * multipliers[i] + offsets[i]) >> np.uint64(32)).astype(np.uint32)
+            signatures[docs, i] = np.minimum.reduceat(values, starts)
+    return signatures
+
+
+def similar_pairs(signatures, valid, threshold=SIMILARITY_THRESHOLD, bands=BANDS):
+    """
+    Return the (left, right) document pairs whose signatures agree in at
+    least threshold of their positions, among the LSH candidates.
+
+    Within each band bucket only (member, first member) pairs are checked.
+    """
+    rows = signatures.shape[1] // bands
+    documents = np.flatnonzero(valid)
+    pairs = [np.empty(0, dtype=np.int64)]
+    if not len(documents):
+        return pairs[0], pairs[0]
+    for band in range(bands):
+        block = signatures[documents, band * rows:(band + 1) * rows]
+        keys = pd.util.hash_pandas_object(pd.DataFrame(block), index=False).to_numpy()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        firsts = np.repeat(order[starts], sizes)
+        members = order[order != firsts]
+        firsts = firsts[order != firsts]
+        if not len(members):
+            continue
+        left, right = documents[firsts], documents[members]
+        similarity = (signatures[left] == signatures[right]).mean(axis=1)
+        keep = similarity >= threshold
+        low, high = np.minimum(left[keep], right[keep]), np.maximum(left[keep], right[keep])
+        pairs.append(low.astype(np.int64) * len(signatures) + high)
+    codes = np.unique(np.concatenate(pairs))
+    return codes // len(signatures), codes % len(signatures)
+
+
+def connected_components(n, left, right):
+    """
+    Label the components of the graph with n vertices and the given edges;
+    each vertex gets the smallest vertex of its component.
+    """
+    labels = np.arange(n)
+    while True:
+        low, high = labels[left], labels[right]
+        differ = low != high
+        if not differ.any():
+            return labels
+        # Hook the larger root under the smaller, then flatten the trees
+        np.minimum.at(labels, np.maximum(low, high)[differ], np.minimum(low, high)[differ])
+        while True:
+            flattened = labels[labels]
+            if np.array_equal(flattened, labels):
+                break
+            labels = flattened
+
+
+def _groups(codes, min_size=2):
+    """
+    Return the positions sharing each code, for codes held at least min_size
+    times, largest groups first; negative codes are ignored.
+    """
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    if not len(order):
+        return []
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    selected = np.flatnonzero(sizes >= min_size)
+    selected = selected[np.argsort(-sizes[selected], kind="stable")]
+    return [order[starts[i]:starts[i] + sizes[i]] for i in selected.tolist()]
+
+
+def _definition_components(definitions, threshold):
+    """
+    Group attributes whose definitions are near duplicates; attributes
+    without a definition get -1.
+    """
+    token_sets = [sorted(set(_WORD.findall(definition.lower()))) if definition else [] for definition in definitions]
+    doc_ids, hashes = _flatten(token_sets)
+    signatures = minhash_signatures(doc_ids, hashes, len(token_sets))
+    valid = np.fromiter((bool(tokens) for tokens in token_sets), dtype=bool, count=len(token_sets))
+    left, right = similar_pairs(signatures, valid, threshold)
+    labels = connected_components(len(token_sets), left, right)
+    return np.where(valid, labels, -1)
+
+
+def _overlapping_objects(object_codes, name_codes, n_objects, threshold):
+    """
+    Return (object a, object b, jaccard, shared) for objects whose sets of
+    attribute names overlap by at least threshold.
+    """
+    pairs = pd.DataFrame({"object": object_codes, "name": name_codes}).drop_duplicates()
+    pairs = pairs[pairs["object"] >= 0]
+    sets = pairs.groupby("object")["name"].agg(frozenset)
+    sizes = np.zeros(n_objects, dtype=np.int64)
+    sizes[sets.index.to_numpy()] = sets.map(len).to_numpy()
+
+    signatures = minhash_signatures(
+        pairs["object"].to_numpy(), pd.util.hash_array(pairs["name"].to_numpy()), n_objects
+    )
+    left, right = similar_pairs(signatures, sizes >= MIN_SHARED_ATTRIBUTES, threshold)
+
+    overlaps = []
+    for a, b in zip(left.tolist(), right.tolist()):
+        shared = len(sets[a] & sets[b])
+        jaccard = shared / len(sets[a] | sets[b])
+        if jaccard >= threshold and shared >= MIN_SHARED_ATTRIBUTES:
+            overlaps.append((a, b, jaccard, shared))
+    overlaps.sort(key=lambda overlap: (-overlap[2], -overlap[3]))
+    return overlaps
+
+
+def analyze_model(df, node_data_array, link_data_array, source_rows, threshold=SIMILARITY_THRESHOLD, limit=100):
+    """
+    Analyze the attributes of a graph for redundancy.
+
+    Returns, for each kind of finding, its total and its `limit` largest
+    groups, plus `byNode` mapping every node key in those groups to the
+    findings ("kind/index") it appears in.
+    """
+    positions = [position for position, node in enumerate(node_data_array) if node["category"] == "attribute"]
+    attributes = [node_data_array[position] for position in positions]
+    keys = np.array([node["key"] for node in attributes], dtype=object)
+    names = [node["label"] for node in attributes]
+    harmonised = [node.get("harmonisedAttribute") or "" for node in attributes]
+    definitions = df["attribute_definition"].to_numpy(dtype=object)[source_rows[positions]].tolist()
+    definitions = ["" if pd.isna(definition) else str(definition) for definition in definitions]
+
+    parents = {link["to"]: link["from"] for link in link_data_array}
+    object_codes, object_keys = pd.factorize(pd.Series([parents.get(key) for key in keys.tolist()], dtype=object))
+    name_codes, normalized_names = pd.factorize(pd.Series([normalize_name(name) for name in names], dtype=object))
+    definition_labels = _definition_components(definitions, threshold)
+
+    findings = {}
+
+    # The same attribute name under several objects
+    repeated = []
+    for group in _groups(name_codes):
+        objects = np.unique(object_codes[group])
+        objects = objects[objects >= 0]
+        if len(objects) < 2:
+            continue
+        variants = np.unique(definition_labels[group])
+        repeated.append({
+            "name": normalized_names[name_codes[group[0]]],
+            "attributeKeys": keys[group].tolist(),
+            "objectKeys": object_keys[objects].tolist(),
+            "definitionVariants": int((variants >= 0).sum()),
+        })
+    findings["repeatedAttributes"] = repeated
+
+    # Attributes sharing a harmonised name: duplicates when their definitions agree
+    harmonised_codes, harmonised_names = pd.factorize(pd.Series(harmonised, dtype=object))
+    candidates = []
+    for group in _groups(harmonised_codes):
+        labels = definition_labels[group]
+        defined = group[labels >= 0]
+        definition_groups = [
+            keys[defined[members]].tolist() for members in _groups(definition_labels[defined], min_size=1)
+        ]
+        if len(defined) < 2:
+            verdict = "undefined"
+        elif len(definition_groups) == 1:
+            verdict = "duplicate"
+        else:
+            verdict = "divergent"
+        candidates.append({
+            "harmonisedAttribute": harmonised_names[harmonised_codes[group[0]]],
+            "attributeKeys": keys[group].tolist(),
+            "verdict": verdict,
+            "definitionGroups": definition_groups,
+        })
+    findings["harmonisedCandidates"] = candidates
+
+    # Near-identical definitions under different names
+    synonyms = []
+    for group in _groups(definition_labels):
+        distinct = np.unique(name_codes[group])
+        if len(distinct) < 2:
+            continue
+        synonyms.append({
+            "names": normalized_names[distinct].tolist(),
+            "attributeKeys": keys[group].tolist(),
+        })
+    findings["synonymCandidates"] = synonyms
+
+    # Objects whose attribute sets overlap heavily
+    findings["overlappingObjects"] = [
+        {"objectKeys": [object_keys[a], object_keys[b]], "jaccard": round(jaccard, 3), "sharedAttributes": shared}
+        for a, b, jaccard, shared in _overlapping_objects(object_codes, name_codes, len(object_keys), threshold)
+    ]
+
+    result = {"attributeCount": len(keys), "objectCount": len(object_keys), "threshold": threshold}
+    by_node = {}
+    for kind, groups in findings.items():
+        result[kind] = {"total": len(groups), "groups": groups[:limit]}
+        for index, group in enumerate(groups[:limit]):
+            for key in group.get("attributeKeys", []) + group.get("objectKeys", []):
+                by_node.setdefault(key, []).append(f"{kind}/{index}")
+    result["byNode"] = by_node
+    return result
@@ -0,0 +1,192 @@
+"""
+Graph revision tracking so clients can fetch patches instead of the full graph.
+"""
+import uuid
+from collections import Counter, deque
+from itertools import islice
+
+# Number of patches kept for incremental fetches and history; older clients
+# get the full graph, and older versions can no longer be restored
+MAX_PATCHES = 1000
+
+# Kinds of recorded mutations
+EDIT = "edit"
+UNDO = "undo"
+REDO = "redo"
+RESTORE = "restore"
+
+
+def _link_key(link):
+    return link["from"], link["to"]
+
+
+def combine_patches(patches, invert=False):
+    """
+    Return the net (removed, added) links of applying patches in order, or of
+    reverting them (in reverse order) with invert.
+
+    Links are counted as a multiset, so a link added by one patch and removed
+    by a later one cancels out.
+    """
+    delta = Counter()
+    for patch in reversed(patches) if invert else patches:
+        removed, added = (patch["added"], patch["removed"]) if invert else (patch["removed"], patch["added"])
+        delta.subtract(_link_key(link) for link in removed)
+        delta.update(_link_key(link) for link in added)
+    removed = [{"from": parent, "to": child} for (parent, child), count in delta.items() for _ in range(-count)]
+    added = [{"from": parent, "to": child} for (parent, child), count in delta.items() for _ in range(count)]
+    return removed, added
+
+
+def combine_updates(patches, invert=False):
+    """
+    Return the net node field updates of applying patches in order, or of
+    reverting them (in reverse order) with invert: one {key, field, value,
+    previous} per field whose value ends up changed.
+    """
+    net = {}
+    for patch in reversed(patches) if invert else patches:
+        for update in patch.get("updated", ()):
+            previous, value = (update["value"], update["previous"]) if invert else (update["previous"], update["value"])
+            field = update["key"], update["field"]
+            net[field] = (net[field][0] if field in net else previous, value)
+    return [
+        {"key": key, "field": field, "value": value, "previous": previous}
+        for (key, field), (previous, value) in net.items()
+        if value != previous
+    ]
+
+
+def _combine(patches, invert=False):
+    return (*combine_patches(patches, invert), combine_updates(patches, invert))
+
+
+class RevisionLog:
+    """
+    Monotonically increasing graph revision with a bounded journal of patches.
+
+    Each patch records the links removed and added by one mutation and, when
+    it changed node fields (e.g. a label), their `updated` values along with
+    the previous ones. Patches are contiguous, so the patches after a given revision can be sliced out
+    directly. A full rebuild of the graph starts a new base revision: clients
+    older than the base must refetch the whole graph. Every rebuild also gets
+    a new random `build` ID, since revisions alone repeat across workspaces.
+
+    The journal doubles as the edit history. Undo, redo and restoring a
+    version are recorded as new patches computed from the journaled ones, so
+    they cost time proportional to the change and memory grows per edit.
+    """
+
+    def __init__(self, max_patches=MAX_PATCHES):
+        self.revision = 0
+        self.base_revision = 0
+        self.build = uuid.uuid4().hex[:12]
+        self._patches = deque(maxlen=max_patches)
+        self._actions = deque(maxlen=max_patches)
+        # Revisions whose patch undo (resp. redo) reverts (resp. reapplies), last on top
+        self._undo = []
+        self._redo = []
+
+    def reset(self):
+        """
+        Start a new base revision after the graph was rebuilt from scratch.
+        """
+        self.revision += 1
+        self.base_revision = self.revision
+        self.build = uuid.uuid4().hex[:12]
+        self._patches.clear()
+        self._actions.clear()
+        self._undo.clear()
+        self._redo.clear()
+        return self.revision
+
+    def record(self, removed, added, updated=(), action=EDIT):
+        """
+        Record a mutation and return its patch.
+
+        Recording an UNDO (REDO) patch consumes the top of the undo (redo)
+        stack; any other mutation can be undone and clears the redo stack.
+        """
+        self.revision += 1
+        if len(self._patches) == self._patches.maxlen:
+            self.base_revision = self._patches[0]["revision"]
+        patch = {"revision": self.revision, "removed": removed, "added": added}
+        if updated:
+            patch["updated"] = list(updated)
+        self._patches.append(patch)
+        self._actions.append(action)
+
+        if action == UNDO:
+            self._redo.append(self._undo.pop())
+        elif action == REDO:
+            self._redo.pop()
+            self._undo.append(self.revision)
+        else:
+            self._undo.append(self.revision)
+            self._redo.clear()
+        return patch
+
+    def get(self, revision):
+        """
+        Return the patch that produced revision, or None if it is not kept.
+        """
+        if revision <= self.base_revision or revision > self.revision:
+            return None
+        return self._patches[revision - self.base_revision - 1]
+
+    def undo_patch(self):
+        """
+        Return the (removed, added, updated) changes that undo the last edit,
+        or None.
+        """
+        patch = self.get(self._undo[-1]) if self._undo else None
+        return None if patch is None else _combine([patch], invert=True)
+
+    def redo_patch(self):
+        """
+        Return the (removed, added, updated) changes that redo the last undone
+        edit, or None.
+        """
+        patch = self.get(self._redo[-1]) if self._redo else None
+        return None if patch is None else _combine([patch])
+
+    def restore_patch(self, revision):
+        """
+        Return the (removed, added, updated) changes that bring the graph
+        back to its state at revision, or None if that version is no longer
+        kept.
+        """
+        patches = self.since(revision)
+        return None if patches is None else _combine(patches, invert=True)
+
+    def history(self):
+        """
+        Return the kept versions, oldest first.
+        """
+        return [
+            {
+                "revision": patch["revision"],
+                "action": action,
+                "removed": len(patch["removed"]),
+                "added": len(patch["added"]),
+                "updated": len(patch.get("updated", ())),
+            }
+            for patch, action in zip(self._patches, self._actions)
+        ]
+
+    @property
+    def can_undo(self):
+        return self.undo_patch() is not None
+
+    @property
+    def can_redo(self):
+        return self.redo_patch() is not None
+
+    def since(self, revision):
+        """
+        Return the patches applied after revision, or None if they are no
+        longer available and the client needs the full graph.
+        """
+        if revision < self.base_revision or revision > self.revision:
+            return None
+        return list(islice(self._patches, revision - self.base_revision, None))
@@ -0,0 +1,319 @@
+"""
+Ranked fuzzy search over node names, alternative names and definitions.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Names are indexed on their first MAX_NAME_CHARS characters
+MAX_NAME_CHARS = 64
+
+# Minimum score of a returned node, out of 1 for an exact name match
+MIN_SCORE = 0.3
+
+# Weight of a match on the alternative name, and on the definition, relative
+# to one on the name itself
+ALT_WEIGHT = 0.9
+DEFINITION_WEIGHT = 0.7
+
+# Names are prefixed with this marker, so a query shares its leading
+# trigrams with the names it is a prefix of
+_START = "\x02\x02"
+
+# Names are encoded in blocks of this many rows, to bound the code point matrix
+_ENCODE_ROWS = 20_000
+
+# Terms in more than this share of the documents also get a bitmap, which
+# is at most an eighth of the size of their postings
+BITMAP_SHARE = 1 / 32
+
+# Postings scanned before the best candidates are checked against the terms
+# not yet scanned; the budget doubles after each check that is not conclusive
+CANDIDATE_BUDGET = 20_000
+
+_WORD = re.compile(r"\w+")
+
+MATCH_FIELDS = ("name", "alt", "definition")
+
+
+def normalize(text):
+    """
+    Reduce text to its lowercase words separated by single spaces.
+    """
+    return " ".join(_WORD.findall(text.casefold())) if isinstance(text, str) else ""
+
+
+def _trigrams(texts):
+    """
+    Return the (text index, trigram code) of the distinct trigrams of each
+    text, each trigram packing three 21-bit code points into one integer.
+    """
+    texts_out, codes_out = [], []
+    width = MAX_NAME_CHARS + len(_START)
+    for start in range(0, len(texts), _ENCODE_ROWS):
+        block = np.array([_START + text[:MAX_NAME_CHARS] for text in texts[start:start + _ENCODE_ROWS]], dtype=f"<U{width}")
+        points = block.view(np.uint32).reshape(len(block), width).astype(np.int64)
+        codes = (points[:, :-2] << 42) | (points[:, 1:-1] << 21) | points[:, 2:]
+        rows, _ = np.nonzero(points[:, 2:])
+        texts_out.append(rows + start)
+        codes_out.append(codes[points[:, 2:] != 0])
+    if not texts_out:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    text_ids, codes = np.concatenate(texts_out), np.concatenate(codes_out)
+    # Keep each trigram once per text
+    order = np.lexsort((text_ids, codes))
+    text_ids, codes = text_ids[order], codes[order]
+    distinct = np.r_[True, (codes[1:] != codes[:-1]) | (text_ids[1:] != text_ids[:-1])]
+    return text_ids[distinct], codes[distinct]
+
+
+def _postings(terms, documents, n_documents):
+    """
+    Group documents by term, sorted by term: (terms, starts, documents,
+    bitmaps), where bitmaps holds the packed document bitmap of each term
+    in more than BITMAP_SHARE of the documents.
+    """
+    order = np.argsort(terms, kind="stable")
+    terms, documents = terms[order], documents[order].astype(np.int32)
+    starts = np.flatnonzero(np.r_[True, terms[1:] != terms[:-1]]) if len(terms) else np.empty(0, np.int64)
+    starts = np.r_[starts, len(terms)]
+    bitmaps = {}
+    for i in np.flatnonzero(np.diff(starts) > n_documents * BITMAP_SHARE).tolist():
+        bits = np.zeros(n_documents, dtype=bool)
+        bits[documents[starts[i]:starts[i + 1]]] = True
+        bitmaps[i] = np.packbits(bits)
+    return terms[starts[:-1]], starts, documents, bitmaps
+
+
+def _contains(documents, bitmap, needles):
+    """
+    Return whether each of the sorted needles is in the sorted documents,
+    read from the bitmap of the documents when there is one.
+    """
+    if bitmap is not None:
+        return (bitmap[needles >> 3] & (128 >> (needles & 7))) != 0
+    if not len(documents):
+        return np.zeros(len(needles), dtype=bool)
+    found = np.searchsorted(documents, needles)
+    return documents[np.minimum(found, len(documents) - 1)] == needles
+
+
+def _lookup(terms, starts, documents, bitmaps, query_terms):
+    """
+    Return the (documents, bitmap) of every query term found in the postings.
+    """
+    found = np.searchsorted(terms, query_terms)
+    found = found[(found < len(terms)) & (terms[np.minimum(found, len(terms) - 1)] == query_terms)] if len(terms) else found[:0]
+    return [(documents[starts[i]:starts[i + 1]], bitmaps.get(i)) for i in found.tolist()]
+
+
+class SearchIndex:
+    """
+    Trigram postings over node names and token postings over definitions.
+
+    Each node has two name fields, its label and its alternative name, and
+    field f of node i is document 2 * i + f of the trigram postings. A name
+    scores by how much of the query's trigrams it holds, with the trigram
+    similarity of the whole name as a tie-break; a definition scores by the
+    idf-weighted share of the query's words it contains. Postings are sorted
+    arrays, so a query only reads the postings of its rare terms and checks
+    the candidates those yield against the common ones, by binary search or
+    in the bitmaps kept for the most common terms. Parents are kept per node
+    and updated as nodes are moved, so results can be restricted to a
+    cluster or object. Relabelled nodes are kept in a small overlay, which
+    every query checks directly, until the index is rebuilt with the graph.
+    """
+
+    def __init__(self, df, nodes, source_rows, links):
+        self._nodes = nodes
+        node_data_array = nodes.node_data_array()
+        n_nodes = len(node_data_array)
+        categories = [node["category"] for node in node_data_array]
+        self._categories = np.array(categories, dtype=object)
+
+        alt_columns = {"object": "object_name_alt", "attribute": "attribute_name_alt"}
+        alts = [""] * n_nodes
+        for category, column in alt_columns.items():
+            positions = np.flatnonzero(self._categories == category)
+            values = df[column].to_numpy(dtype=object)[source_rows[positions]].tolist()
+            for position, value in zip(positions.tolist(), values):
+                alts[position] = normalize(value)
+
+        names = []
+        for node, alt in zip(node_data_array, alts):
+            names.append(normalize(node.get("label")))
+            names.append(alt)
+        field_ids, codes = _trigrams(names)
+        self._trigrams = _postings(codes, field_ids, len(names))
+        self._name_sizes = np.bincount(field_ids, minlength=len(names)).astype(np.int32)
+
+        # Definitions, as token postings over attribute positions
+        positions = np.flatnonzero(self._categories == "attribute")
+        definitions = df["attribute_definition"].to_numpy(dtype=object)[source_rows[positions]].tolist()
+        token_lists = [set(normalize(definition).split()) for definition in definitions]
+        lengths = [len(tokens) for tokens in token_lists]
+        token_codes, vocabulary = pd.factorize(
+            pd.Series([token for tokens in token_lists for token in tokens], dtype=object)
+        )
+        documents = np.repeat(positions, lengths)
+        self._vocabulary = pd.Index(vocabulary)
+        self._tokens = _postings(token_codes.astype(np.int64), documents, n_nodes)
+        frequencies = np.diff(self._tokens[1])
+        self._idf = np.log1p(max(len(positions), 1) / np.maximum(frequencies, 1))
+
+        # Trigram codes of the labels set since the index was built, by position
+        self._relabelled = {}
+
+        self._parents = np.full(n_nodes, -1, dtype=np.int32)
+        for position, node in enumerate(node_data_array):
+            parent = links.parent(node["key"])
+            if parent is not None:
+                self._parents[position] = nodes.position(parent)
+
+    @property
+    def nbytes(self):
+        arrays = [
+            *self._trigrams[:3], *self._trigrams[3].values(), *self._tokens[:3], *self._tokens[3].values(),
+            self._name_sizes, self._idf, self._parents,
+        ]
+        arrays += self._relabelled.values()
+        return sum(array.nbytes for array in arrays) + self._vocabulary.memory_usage(deep=True)
+
+    def reparent(self, links):
+        """
+        Record the parents set by added links, e.g. the added side of a patch.
+        """
+        for link in links:
+            child, parent = self._nodes.position(link["to"]), self._nodes.position(link["from"])
+            if child is not None and parent is not None:
+                self._parents[child] = parent
+
+    def relabel(self, key, label):
+        """
+        Index the new label of a node.
+        """
+        position = self._nodes.position(key)
+        _, codes = _trigrams([normalize(label)])
+        self._relabelled[position] = codes
+        self._name_sizes[2 * position] = len(codes)
+
+    def _query_terms(self, query):
+        """
+        Return the query's name trigrams and definition words found in the
+        index, as (documents, bitmap, weight, field kind) with kind 0 for
+        names and 1 for definitions, and the query's trigram codes. A term's
+        weight bounds what holding it adds to a node's score.
+        """
+        _, codes = _trigrams([query])
+        terms = [(documents, bitmap, 1 / len(codes), 0) for documents, bitmap in _lookup(*self._trigrams, codes)]
+
+        tokens = list(dict.fromkeys(query.split()))
+        term_ids = self._vocabulary.get_indexer(tokens)
+        known = term_ids[term_ids >= 0].tolist()
+        total = sum(self._idf[i] for i in known) + math.log1p(len(self._categories)) * (len(tokens) - len(known))
+        _, starts, documents, bitmaps = self._tokens
+        for term_id in known:
+            weight = DEFINITION_WEIGHT * self._idf[term_id] / total
+            terms.append((documents[starts[term_id]:starts[term_id + 1]], bitmaps.get(term_id), weight, 1))
+        return terms, codes
+
+    def _filter(self, candidates, category, within):
+        if category is not None:
+            candidates = candidates[self._categories[candidates] == category]
+        if within is not None:
+            ancestor = self._nodes.position(within)
+            if ancestor is None:
+                return candidates[:0]
+            parents = self._parents[candidates]
+            grandparents = np.where(parents >= 0, self._parents[np.maximum(parents, 0)], -1)
+            candidates = candidates[(parents == ancestor) | (grandparents == ancestor)]
+        return candidates
+
+    def _scores(self, candidates, terms, query_codes):
+        """
+        Return the (name, alt, definition) scores of the candidate nodes.
+        """
+        query_size = len(query_codes)
+        fields = np.column_stack([2 * candidates, 2 * candidates + 1]).ravel()
+        shared = np.zeros(len(fields))
+        definition = np.zeros(len(candidates))
+        for documents, bitmap, weight, kind in terms:
+            if kind == 0:
+                shared += _contains(documents, bitmap, fields)
+            else:
+                definition += weight * _contains(documents, bitmap, candidates)
+        for position, codes in self._relabelled.items():
+            index = np.searchsorted(candidates, position)
+            if index < len(candidates) and candidates[index] == position:
+                shared[2 * index] = len(np.intersect1d(codes, query_codes))
+        similarity = shared / np.maximum(query_size + self._name_sizes[fields] - shared, 1)
+        names = (0.75 * shared / max(query_size, 1) + 0.25 * similarity).reshape(-1, 2)
+        return np.column_stack([names * (1, ALT_WEIGHT), definition])
+
+    def _rank(self, candidates, terms, query_codes, limit):
+        scores = self._scores(candidates, terms, query_codes)
+        best_field = scores.argmax(axis=1)
+        best = scores[np.arange(len(scores)), best_field]
+        selected = np.flatnonzero(best >= MIN_SCORE)
+        if len(selected) > limit:
+            # Keep every tie of the limit-th score, so position breaks ties
+            kth = -np.partition(-best[selected], limit - 1)[limit - 1]
+            selected = selected[best[selected] >= kth]
+        selected = selected[np.lexsort((candidates[selected], -best[selected]))][:limit]
+        results = [
+            (position, score, MATCH_FIELDS[field])
+            for position, score, field in zip(
+                candidates[selected].tolist(), best[selected].tolist(), best_field[selected].tolist()
+            )
+        ]
+        return int((best >= MIN_SCORE).sum()), results
+
+    def search(self, query, limit=20, category=None, within=None):
+        """
+        Return (total, exact, [(position, score, field)]) for the best matches
+        of query, optionally only nodes of one category or below one node.
+
+        Candidates are gathered from the query's rarest terms first. Once the
+        terms left could not lift any other node to MIN_SCORE, every match is
+        a candidate; once they could not lift one past the limit-th best
+        candidate, the results are final but total only counts the matches
+        among the candidates, and exact is False.
+        """
+        query = normalize(query)
+        if not query:
+            return 0, True, []
+        terms, query_codes = self._query_terms(query)
+        terms.sort(key=lambda term: len(term[0]))
+        remaining = [0.0, 0.0]
+        for _, _, weight, kind in terms:
+            remaining[kind] += weight
+
+        # Relabelled nodes are always candidates, their postings being stale
+        found = [np.fromiter(self._relabelled, dtype=np.int64, count=len(self._relabelled))]
+        scanned, budget = 0, CANDIDATE_BUDGET
+        for documents, _, weight, kind in terms:
+            if scanned and scanned + len(documents) > budget:
+                candidates = self._filter(np.unique(np.concatenate(found)), category, within)
+                total, results = self._rank(candidates, terms, query_codes, limit)
+                if len(results) == limit and results[-1][1] > max(remaining):
+                    return total, False, results
+                budget *= 2
+            found.append(documents // 2 if kind == 0 else documents)
+            remaining[kind] -= weight
+            scanned += len(documents)
+            if max(remaining) < MIN_SCORE:
+                break
+        candidates = self._filter(np.unique(np.concatenate(found)), category, within)
+        if not len(candidates):
+            return 0, True, []
+        total, results = self._rank(candidates, terms, query_codes, limit)
+        return total, True, results
+
+    def parent(self, position):
+        """
+        Return the position of the node's parent, or None.
+        """
+        parent = int(self._parents[position])
+        return None if parent < 0 else parent
@@ -0,0 +1,150 @@
+"""
+Pre-serialized, pre-compressed graph payloads.
+"""
+import datetime
+import gzip
+import json
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Payloads smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def graph_etag(workspace_id, revisions, with_descriptions=False):
+    """
+    Return the ETag of a workspace's graph document at the current revision.
+
+    Revisions start over in every workspace and process, so the tag also
+    names the workspace and the random ID of the graph build.
+    """
+    suffix = "-d" if with_descriptions else ""
+    return f'W/"{workspace_id}-{revisions.build}-{revisions.revision}{suffix}"'
+
+
+def _json_default(value):
+    """
+    Encode the values JSON has no type for: dates and times read from
+    workbooks become ISO 8601 strings, and durations ISO 8601 durations.
+    """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return pd.Timedelta(value).isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_json(obj):
+    """
+    Serialize obj to JSON bytes, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        obj, default=_json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding):
+    """
+    Return the content codings an Accept-Encoding header allows (q > 0).
+    """
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class SerializedPayload:
+    """
+    A JSON document encoded once, with its compressed variants built lazily
+    on first request and then kept alongside it.
+    """
+
+    def __init__(self, obj, etag):
+        self.body = encode_json(obj)
+        self.etag = etag
+        self._encoded = {}
+
+    @classmethod
+    def from_body(cls, body, etag):
+        """
+        Wrap an already encoded JSON document.
+        """
+        payload = cls.__new__(cls)
+        payload.body = body
+        payload.etag = etag
+        payload._encoded = {}
+        return payload
+
+    def matches(self, if_none_match):
+        """
+        Whether an If-None-Match header value matches this payload's ETag.
+        """
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+    def encode(self, accept_encoding):
+        """
+        Return (content encoding or None, body) for an Accept-Encoding header.
+        """
+        coding = self.choose_encoding(accept_encoding)
+        return coding, self.encoded(coding)
+
+    def choose_encoding(self, accept_encoding):
+        """
+        Return the content encoding to serve for an Accept-Encoding header, or
+        None for the uncompressed body.
+        """
+        if len(self.body) < COMPRESS_MIN_BYTES:
+            return None
+        accepted = _accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def is_encoded(self, coding):
+        """
+        Whether the body for coding is ready without compressing it.
+        """
+        return coding is None or coding in self._encoded
+
+    def encoded(self, coding):
+        """
+        Return the body in the given content encoding (None for identity).
+        """
+        if coding is None:
+            return self.body
+        if coding not in self._encoded:
+            if coding == "br":
+                self._encoded[coding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                self._encoded[coding] = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+        return self._encoded[coding]
@@ -0,0 +1,308 @@
+"""
+On-disk snapshots of workspaces, so models survive restarts without being
+re-uploaded, re-parsed or rebuilt.
+
+A snapshot is a directory holding:
+
+- manifest.json: the workspace settings, revision and column layout
+- columns/: the DataFrame in a columnar NumPy layout. Text columns are
+  dictionary-encoded into int32 codes (memory-mapped on load) and their
+  distinct values, concatenated into one UTF-8 file with an offsets array;
+  numeric columns are stored as plain .npy arrays
+- graph.pkl: the node and link arrays the indexes are rebuilt from
+- revisions.pkl: the revision log
+- graph.json: the encoded /graph-data/ document of the saved revision
+"""
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.graph_store import LinkIndex, NodeIndex
+from app.serialization import SerializedPayload, encode_json, graph_etag
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 3
+
+# Snapshots neither saved nor restored for this long are deleted
+SNAPSHOT_TTL_SECONDS = float(os.environ.get("BIM_SNAPSHOT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def _write_text(path, values):
+    """
+    Write strings as one UTF-8 text plus the offsets of each string in it.
+    """
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    with open(path.with_suffix(".txt"), "w", encoding="utf-8", newline="") as f:
+        f.write("".join(values))
+    np.save(path.with_suffix(".offsets.npy"), offsets)
+
+
+def _read_text(path):
+    with open(path.with_suffix(".txt"), encoding="utf-8", newline="") as f:
+        text = f.read()
+    offsets = np.load(path.with_suffix(".offsets.npy")).tolist()
+    return [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _is_text(values):
+    return pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty")
+
+
+def _write_column(directory, position, series):
+    """
+    Write one DataFrame column and return its manifest entry.
+    """
+    path = directory / str(position)
+    entry = {"name": series.name, "dtype": str(series.dtype)}
+    if isinstance(series.dtype, pd.CategoricalDtype) and _is_text(series.cat.categories):
+        entry.update(layout="category", categories_dtype=str(series.cat.categories.dtype))
+        codes, values = series.cat.codes.to_numpy(), series.cat.categories
+    elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufmM":
+        entry["layout"] = "numpy"
+        np.save(path.with_suffix(".npy"), series.to_numpy())
+        return entry
+    elif _is_text(series):
+        entry["layout"] = "text"
+        codes, values = pd.factorize(series)
+    else:
+        # Mixed values that have no columnar layout
+        entry["layout"] = "pickle"
+        with open(path.with_suffix(".pkl"), "wb") as f:
+            pickle.dump(series, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return entry
+
+    np.save(path.with_suffix(".codes.npy"), codes.astype(np.int32))
+    _write_text(path, list(values))
+    return entry
+
+
+def _read_column(directory, position, entry):
+    path = directory / str(position)
+    layout = entry["layout"]
+    if layout == "numpy":
+        return pd.Series(np.load(path.with_suffix(".npy"), mmap_mode="r"), name=entry["name"])
+    if layout == "pickle":
+        with open(path.with_suffix(".pkl"), "rb") as f:
+            return pickle.load(f)
+
+    codes = np.load(path.with_suffix(".codes.npy"), mmap_mode="r")
+    values = _read_text(path)
+    if layout == "category":
+        categories = pd.Index(values, dtype=entry["categories_dtype"])
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories), name=entry["name"])
+    # Code -1 (missing) picks the trailing NaN
+    values = np.array(values + [np.nan], dtype=object)
+    return pd.Series(values[codes], name=entry["name"], dtype=entry["dtype"])
+
+
+class SnapshotStore:
+    """
+    Workspace snapshots kept under a root directory, one directory each.
+    """
+
+    def __init__(self, root, ttl=SNAPSHOT_TTL_SECONDS):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a store in BIM_SNAPSHOT_DIR, or return None when it is not set.
+        """
+        root = os.environ.get("BIM_SNAPSHOT_DIR")
+        return cls(root) if root else None
+
+    def path(self, workspace_id):
+        return self.root / workspace_id
+
+    def workspace_ids(self):
+        """
+        Return the IDs of the saved workspaces.
+        """
+        if not self.root.is_dir():
+            return []
+        return sorted(path.parent.name for path in self.root.glob("*/manifest.json"))
+
+    def touch(self, workspace_id):
+        """
+        Mark a snapshot as used, so the sweep keeps it for another ttl.
+        """
+        try:
+            os.utime(self.path(workspace_id) / "manifest.json")
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, keep=()):
+        """
+        Delete the snapshots unused for longer than ttl, except those of the
+        workspaces in keep. Returns the deleted IDs.
+        """
+        cutoff = time.time() - self.ttl
+        deleted = []
+        for workspace_id in self.workspace_ids():
+            if workspace_id in keep:
+                continue
+            try:
+                used = (self.path(workspace_id) / "manifest.json").stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if used < cutoff:
+                self.delete(workspace_id)
+                deleted.append(workspace_id)
+        return deleted
+
+    @staticmethod
+    def capture(workspace):
+        """
+        Take what a snapshot of the workspace is written from.
+
+        Called under the workspace lock, which can be released right after:
+        edits replace the node and link arrays instead of changing them, so
+        only references are taken, plus a pickled copy of the revision log.
+        """
+        revisions = workspace["revisions"]
+        return {
+            "workspace": workspace.id,
+            "df": workspace["df"],
+            "nodes": workspace["nodes"].node_data_array(),
+            "links": workspace["links"].link_data_array(),
+            "revisions": pickle.dumps(revisions, protocol=pickle.HIGHEST_PROTOCOL),
+            "revision": revisions.revision,
+            "stableKeys": workspace.get("stableKeys", False),
+            "loadDescriptions": workspace.get("loadDescriptions", False),
+            "sizeBytes": workspace.size_bytes,
+        }
+
+    def save(self, workspace):
+        """
+        Write a snapshot of the workspace, replacing the previous one.
+
+        The caller must hold the workspace lock for the whole write; see
+        capture() and write() to hold it only while the state is taken.
+        Returns the saved revision.
+        """
+        revision = self.write(self.capture(workspace))
+        workspace["snapshotRevision"] = revision
+        return revision
+
+    def write(self, state):
+        """
+        Write a snapshot from a captured state, replacing the previous one,
+        and return the saved revision. Writes of one workspace must not
+        overlap.
+        """
+        workspace_id = state["workspace"]
+        started = time.perf_counter()
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.path(workspace_id)
+        staging = self.root / f".{workspace_id}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        (staging / "columns").mkdir(parents=True)
+
+        df = state["df"]
+        columns = [
+            _write_column(staging / "columns", position, df.iloc[:, position])
+            for position in range(df.shape[1])
+        ]
+
+        # pickle to files (not bytes), so the GIL is released between frames
+        with open(staging / "graph.pkl", "wb") as f:
+            pickle.dump((state["nodes"], state["links"]), f, protocol=pickle.HIGHEST_PROTOCOL)
+        (staging / "revisions.pkl").write_bytes(state["revisions"])
+
+        (staging / "graph.json").write_bytes(encode_json({
+            "nodeDataArray": state["nodes"],
+            "linkDataArray": state["links"],
+            "revision": state["revision"],
+        }))
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "workspace": workspace_id,
+            "revision": state["revision"],
+            "rows": len(df),
+            "columns": columns,
+            "stableKeys": state["stableKeys"],
+            "loadDescriptions": state["loadDescriptions"],
+            "sizeBytes": state["sizeBytes"],
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # Swap the complete snapshot in place of the previous one
+        previous = self.root / f".{workspace_id}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        if target.exists():
+            target.rename(previous)
+        staging.rename(target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        logger.info(
+            f"Saved snapshot of workspace '{workspace_id}' at revision {state['revision']} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return state["revision"]
+
+    def delete(self, workspace_id):
+        """
+        Delete the snapshot of a workspace, if any.
+        """
+        shutil.rmtree(self.path(workspace_id), ignore_errors=True)
+
+    def restore(self, workspace):
+        """
+        Fill a new workspace from its snapshot, without loading the model.
+
+        Only the settings, the revision log and the encoded graph document
+        (cached as the graph payload) are read; the DataFrame and graph
+        indexes are left for load(). Returns False without a snapshot.
+        """
+        path = self.path(workspace.id)
+        manifest_path = path / "manifest.json"
+        if not manifest_path.exists():
+            return False
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring snapshot of workspace '{workspace.id}' with an unknown version")
+            return False
+
+        with open(path / "revisions.pkl", "rb") as f:
+            workspace["revisions"] = pickle.load(f)
+        workspace["stableKeys"] = manifest["stableKeys"]
+        workspace["loadDescriptions"] = manifest["loadDescriptions"]
+        workspace["pendingSnapshot"] = str(path)
+        workspace["snapshotRevision"] = manifest["revision"]
+        workspace.size_bytes = manifest["sizeBytes"]
+        self.touch(workspace.id)
+
+        # The saved document is the structural graph; it is only valid as the
+        # payload while descriptions are not requested
+        if not manifest["loadDescriptions"]:
+            workspace["graphPayload"] = SerializedPayload.from_body(
+                (path / "graph.json").read_bytes(), graph_etag(workspace.id, workspace["revisions"])
+            )
+        return True
+
+    @staticmethod
+    def load(path):
+        """
+        Load the DataFrame and graph indexes of a snapshot directory.
+        """
+        path = Path(path)
+        manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+        columns = [
+            _read_column(path / "columns", position, entry)
+            for position, entry in enumerate(manifest["columns"])
+        ]
+        df = pd.concat(columns, axis=1) if columns else pd.DataFrame(index=range(manifest["rows"]))
+        with open(path / "graph.pkl", "rb") as f:
+            nodes, links = pickle.load(f)
+        return df, NodeIndex(nodes), LinkIndex(links)
@@ -0,0 +1,90 @@
+"""
+Worker pools that keep CPU-bound work off the event loop, and single-flight
+deduplication of that work.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Pool used for the graph build: "thread" or "process"
+BUILD_POOL = os.environ.get("BIM_WORKER_POOL", "thread")
+
+# Number of workers in each pool
+WORKER_COUNT = int(os.environ.get("BIM_WORKER_COUNT", min(4, os.cpu_count() or 1)))
+
+_pools = {}
+
+
+def get_pool(kind):
+    """
+    Return the shared executor of the given kind, creating it on first use.
+    """
+    if kind not in _pools:
+        if kind == "process":
+            # spawn rather than fork: the server process runs threads
+            _pools[kind] = ProcessPoolExecutor(
+                max_workers=WORKER_COUNT, mp_context=multiprocessing.get_context("spawn")
+            )
+        elif kind == "thread":
+            _pools[kind] = ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix="bim-worker")
+        else:
+            raise ValueError(f"Unknown worker pool '{kind}', expected 'thread' or 'process'")
+    return _pools[kind]
+
+
+async def run_in_pool(fn, *args, kind="thread", **kwargs):
+    """
+    Run fn(*args, **kwargs) in a worker pool and await its result.
+
+    Work sent to the process pool must be a module-level function with
+    picklable arguments and result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(kind), functools.partial(fn, *args, **kwargs))
+
+
+async def run_build(fn, *args, **kwargs):
+    """
+    Run a graph build step in the configured BIM_WORKER_POOL.
+    """
+    return await run_in_pool(fn, *args, kind=BUILD_POOL, **kwargs)
+
+
+def shutdown_pools():
+    """
+    Shut down every pool created so far.
+    """
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while a call for a key is running, later
+    calls for the same key await its result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def do(self, key, fn):
+        """
+        Await fn() (a coroutine function), sharing one call per key.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(functools.partial(self._forget, key))
+        # A cancelled waiter (e.g. a disconnected client) must not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,309 @@
+"""
+Per-session model workspaces with LRU/TTL eviction under a memory budget.
+"""
+import asyncio
+import functools
+import logging
+import os
+import pickle
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from app.feed import ChangeFeed
+from app.graph_store import LinkIndex, NodeIndex
+from app.revisions import RevisionLog
+from app.snapshots import SnapshotStore
+from app.workers import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKSPACE = "default"
+
+# Snapshots are swept for expired ones at most this often
+SWEEP_INTERVAL_SECONDS = 60
+
+# Rough per-item costs of the graph structures, used to estimate workspace size
+NODE_BYTES = 600
+LINK_BYTES = 350
+
+
+class Workspace(dict):
+    """
+    The state of one loaded model: its DataFrame, graph indexes, revision log
+    and serialized payload cache, and the feed of its connected clients.
+
+    Handlers that modify the workspace hold its lock, so concurrent edits to
+    the same model are serialized without blocking other workspaces. Work
+    derived from the model (graph builds, payload encodes) goes through
+    flights, so concurrent readers share one computation.
+    """
+
+    def __init__(self, workspace_id):
+        super().__init__()
+        self.id = workspace_id
+        self.lock = asyncio.Lock()
+        self.flights = SingleFlight()
+        self.feed = ChangeFeed(lambda: self["revisions"])
+        self.last_access = time.monotonic()
+        self.size_bytes = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the loaded model and every structure derived from it.
+        """
+        self.clear()
+        self.update({
+            "df": None,
+            "nodes": NodeIndex(),
+            "links": LinkIndex(),
+            "loadDescriptions": False,
+            "stableKeys": False,
+            "revisions": RevisionLog(),
+            "graphPayload": None,
+            "graphBuilt": False,
+            "clusterOverview": None,
+            "descriptions": None,
+            "search": None,
+            "pendingSnapshot": None,
+            "snapshotRevision": None,
+        })
+        self.size_bytes = 0
+
+    def has_unsaved_changes(self):
+        """
+        Whether the loaded model differs from its last snapshot.
+        """
+        return self["df"] is not None and self["snapshotRevision"] != self["revisions"].revision
+
+    def update_size(self):
+        """
+        Re-estimate the memory held by the model and its graph.
+        """
+        df = self["df"]
+        df_bytes = int(df.memory_usage(deep=True).sum()) if df is not None else 0
+        search_bytes = self["search"].nbytes if self.get("search") is not None else 0
+        self.size_bytes = df_bytes + len(self["nodes"]) * NODE_BYTES + len(self["links"]) * LINK_BYTES + search_bytes
+        return self.size_bytes
+
+
+class WorkspaceManager:
+    """
+    Workspaces keyed by session or model ID.
+
+    Workspaces idle for longer than ttl seconds are evicted, and the least
+    recently used ones are evicted while the total estimated size exceeds the
+    memory budget. With a snapshot store, evicted workspaces are kept in (or
+    first saved to) their snapshot; otherwise with a spill directory they are
+    pickled to disk. Either way they are restored transparently on their next
+    use; without both they are dropped. Workspaces whose lock is held, or
+    with connected clients, are never evicted.
+
+    The manager is only used from the event loop, so it needs no lock of its
+    own; reading and writing workspaces on disk runs in worker threads.
+    Evictions also sweep the snapshots that have not been used for the
+    snapshot store's ttl.
+    """
+
+    def __init__(self, memory_budget, ttl, spill_dir=None, snapshots=None):
+        self.memory_budget = memory_budget
+        self.ttl = ttl
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.snapshots = snapshots
+        self._workspaces = OrderedDict()
+        self._flights = SingleFlight()
+        self._evicting = False
+        self._swept = None
+        # Keeps references to background evictions until they finish
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a manager configured from BIM_WORKSPACE_* environment variables.
+        """
+        return cls(
+            memory_budget=int(float(os.environ.get("BIM_WORKSPACE_MEMORY_MB", "2048")) * 2**20),
+            ttl=float(os.environ.get("BIM_WORKSPACE_TTL_SECONDS", "3600")),
+            spill_dir=os.environ.get("BIM_WORKSPACE_SPILL_DIR") or None,
+            snapshots=SnapshotStore.from_env(),
+        )
+
+    def __contains__(self, workspace_id):
+        return workspace_id in self._workspaces
+
+    def __len__(self):
+        return len(self._workspaces)
+
+    def values(self):
+        """
+        Return the workspaces held in memory.
+        """
+        return list(self._workspaces.values())
+
+    def peek(self, workspace_id=DEFAULT_WORKSPACE):
+        """
+        Return the workspace held in memory for workspace_id, or None.
+        """
+        return self._workspaces.get(workspace_id)
+
+    async def get(self, workspace_id=DEFAULT_WORKSPACE):
+        """
+        Return the workspace for workspace_id, creating or restoring it.
+
+        Concurrent first requests for a workspace share one restore, and so
+        one Workspace. Idle workspaces are then evicted in the background.
+        """
+        workspace = self._workspaces.get(workspace_id)
+        if workspace is None:
+            workspace = await self._flights.do(workspace_id, functools.partial(self._load, workspace_id))
+        else:
+            self._workspaces.move_to_end(workspace_id)
+        workspace.last_access = time.monotonic()
+        self.schedule_eviction(keep=workspace_id)
+        return workspace
+
+    async def _load(self, workspace_id):
+        workspace = None
+        if self.snapshots is not None or self.spill_dir is not None:
+            workspace = await asyncio.to_thread(self._restore, workspace_id)
+        return self._workspaces.setdefault(workspace_id, workspace or Workspace(workspace_id))
+
+    def total_size(self):
+        return sum(workspace.size_bytes for workspace in self._workspaces.values())
+
+    def schedule_eviction(self, keep=None):
+        """
+        Evict in the background, so no request waits on other workspaces
+        being written out.
+        """
+        if self._evicting:
+            return
+        task = asyncio.ensure_future(self.evict(keep=keep))
+        self._tasks.add(task)
+        task.add_done_callback(self._evicted)
+
+    def _evicted(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Evicting workspaces failed: {task.exception()}")
+
+    async def evict(self, keep=None):
+        """
+        Evict expired workspaces, then least recently used ones until the
+        total size fits the memory budget. Returns the evicted IDs, or
+        nothing while another eviction is running.
+        """
+        if self._evicting:
+            return []
+        self._evicting = True
+        try:
+            now = time.monotonic()
+            evicted = []
+            for workspace_id, workspace in list(self._workspaces.items()):
+                if workspace_id != keep and now - workspace.last_access > self.ttl and await self._evict(workspace):
+                    evicted.append(workspace_id)
+
+            for workspace_id, workspace in list(self._workspaces.items()):
+                if self.total_size() <= self.memory_budget:
+                    break
+                if workspace_id != keep and await self._evict(workspace):
+                    evicted.append(workspace_id)
+
+            if self.snapshots is not None and (self._swept is None or now - self._swept > SWEEP_INTERVAL_SECONDS):
+                self._swept = now
+                deleted = await asyncio.to_thread(self.snapshots.sweep, keep=set(self._workspaces))
+                if deleted:
+                    logger.info(f"Deleted {len(deleted)} expired snapshot(s)")
+            return evicted
+        finally:
+            self._evicting = False
+
+    def clear(self):
+        """
+        Drop every workspace held in memory.
+        """
+        self._workspaces.clear()
+
+    async def _evict(self, workspace):
+        """
+        Write out and drop an idle workspace. The write runs in a worker
+        thread under the workspace lock, so it never sees half an edit; a
+        workspace used in the meantime stays loaded.
+        """
+        # A snapshot being written by an edit must not overlap with this one
+        if workspace.lock.locked() or len(workspace.feed) or "save" in workspace.flights:
+            return False
+        accessed = workspace.last_access
+        async with workspace.lock:
+            kept_in = await asyncio.to_thread(self._write_out, workspace)
+            if workspace.last_access != accessed or len(workspace.feed) or self.peek(workspace.id) is not workspace:
+                if kept_in == "spill":
+                    self._spill_path(workspace.id).unlink(missing_ok=True)
+                return False
+            del self._workspaces[workspace.id]
+        if kept_in == "snapshot":
+            logger.info(f"Dropped idle workspace '{workspace.id}', kept in its snapshot")
+        elif kept_in == "spill":
+            logger.info(f"Spilled idle workspace '{workspace.id}' to disk")
+        else:
+            logger.info(f"Dropped idle workspace '{workspace.id}'")
+        return True
+
+    def _write_out(self, workspace):
+        """
+        Save what an evicted workspace needs to be restored, and return where
+        it is kept: "snapshot", "spill" or None when it is dropped.
+        """
+        if self.snapshots is not None and (workspace["df"] is not None or workspace["pendingSnapshot"]):
+            if workspace.has_unsaved_changes():
+                self.snapshots.save(workspace)
+            else:
+                self.snapshots.touch(workspace.id)
+            return "snapshot"
+        if self.spill_dir is not None and workspace["df"] is not None:
+            self._spill(workspace)
+            return "spill"
+        return None
+
+    async def forget(self, workspace_id):
+        """
+        Delete what is kept on disk of a workspace: its snapshot and spill file.
+        """
+        await asyncio.to_thread(self._forget, workspace_id)
+
+    def _forget(self, workspace_id):
+        if self.snapshots is not None:
+            self.snapshots.delete(workspace_id)
+        if self.spill_dir is not None:
+            self._spill_path(workspace_id).unlink(missing_ok=True)
+
+    def _spill_path(self, workspace_id):
+        return self.spill_dir / f"{workspace_id}.pkl"
+
+    def _spill(self, workspace):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        state = {key: value for key, value in workspace.items() if key != "graphPayload"}
+        with open(self._spill_path(workspace.id), "wb") as f:
+            pickle.dump({"state": state, "size_bytes": workspace.size_bytes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _restore(self, workspace_id):
+        if self.snapshots is not None:
+            workspace = Workspace(workspace_id)
+            if self.snapshots.restore(workspace):
+                logger.info(f"Restored workspace '{workspace_id}' from its snapshot")
+                return workspace
+        if self.spill_dir is None:
+            return None
+        path = self._spill_path(workspace_id)
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            spilled = pickle.load(f)
+        path.unlink()
+        workspace = Workspace(workspace_id)
+        workspace.update(spilled["state"])
+        workspace.size_bytes = spilled["size_bytes"]
+        logger.info(f"Restored workspace '{workspace_id}' from disk")
+        return workspace
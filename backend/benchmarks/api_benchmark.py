@@ -0,0 +1,187 @@
+"""
+Benchmark the upload, graph and drag-and-drop endpoints end to end.
+
+Run from the backend directory:
+
+    python -m benchmarks.api_benchmark --rows 1000 10000 100000 1000000 --save results.json
+    python -m benchmarks.api_benchmark --rows 1000 10000 100000 --compare results.json
+
+Synthetic models are uploaded as CSV through the ASGI app in process, so the
+timings include routing, validation and serialization but no network. The
+graph is fetched cold (encoded and gzipped for the first time), cached and
+revalidated with its ETag, the last two as the median of a few runs;
+drag-and-drop is the median of --moves moves. Stage columns come from the
+/metrics histograms, which are enabled for the run.
+
+--save writes the results as JSON; --compare reruns against such a file and
+exits with status 1 when a timing or payload size grew by more than
+--tolerance.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from app.dependencies import metrics, workspaces
+from app.main import app
+from app.metrics import STAGE_SECONDS
+from app.workspaces import DEFAULT_WORKSPACE
+from benchmarks.graph_builder_benchmark import make_model
+
+# Measurements compared by --compare; all are lower-is-better
+MEASUREMENTS = (
+    "upload_s", "graph_cold_s", "graph_cached_ms", "not_modified_ms", "drag_drop_ms", "payload_mb", "gzip_mb",
+)
+
+STAGES = ("parse", "build", "serialize", "compress")
+
+# Runs of the cached and revalidated graph requests whose median is kept
+REPEATS = 5
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _fetch(client, headers):
+    """
+    GET the graph, returning the response and its body as sent (not decoded).
+    """
+    with client.stream("GET", "/graph-data/", headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def _median(fn, repeats=REPEATS):
+    return statistics.median(_timed(fn)[1] for _ in range(repeats))
+
+
+def _stage_seconds():
+    return {dict(labels)["stage"]: total for labels, (_, total) in metrics.totals(STAGE_SECONDS).items()}
+
+
+def measure(client, n_rows, moves):
+    """
+    Return the measurements of one model size.
+    """
+    workspaces.clear()
+    metrics.reset()
+    body = make_model(n_rows).to_csv(index=False).encode("utf-8")
+
+    response, upload_s = _timed(
+        lambda: client.post("/upload/", files={"file": ("model.csv", body, "text/csv")})
+    )
+    response.raise_for_status()
+
+    gzip_headers = {"Accept-Encoding": "gzip"}
+    (cold, gzip_body), graph_cold_s = _timed(lambda: _fetch(client, gzip_headers))
+    graph_cached_s = _median(lambda: _fetch(client, gzip_headers))
+    revalidate_headers = {**gzip_headers, "If-None-Match": cold.headers["ETag"]}
+    assert _fetch(client, revalidate_headers)[0].status_code == 304
+    not_modified_s = _median(lambda: _fetch(client, revalidate_headers))
+    _, body = _fetch(client, {"Accept-Encoding": "identity"})
+
+    nodes = workspaces.peek(DEFAULT_WORKSPACE)["nodes"]
+    objects = nodes.keys("object")[:2]
+    attributes = nodes.keys("attribute")
+    durations = []
+    for i in range(moves):
+        move = {
+            "source": attributes[i % len(attributes)], "target": objects[i % len(objects)],
+            "sourceType": "attribute", "targetType": "object",
+        }
+        response, seconds = _timed(lambda: client.post("/apply-drag-drop/", json=move))
+        response.raise_for_status()
+        durations.append(seconds)
+
+    return {
+        "rows": n_rows,
+        "upload_s": upload_s,
+        "graph_cold_s": graph_cold_s,
+        "graph_cached_ms": graph_cached_s * 1000,
+        "not_modified_ms": not_modified_s * 1000,
+        "drag_drop_ms": statistics.median(durations) * 1000,
+        "payload_mb": len(body) / 1e6,
+        "gzip_mb": len(gzip_body) / 1e6,
+        "stages_s": _stage_seconds(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each measurement against the baseline and return the regressions,
+    as (rows, measurement, ratio).
+    """
+    previous = {result["rows"]: result for result in baseline["results"]}
+    regressions = []
+    print(f"\n{'rows':>10} {'measurement':>16} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for result in results:
+        before = previous.get(result["rows"])
+        if before is None:
+            continue
+        for name in MEASUREMENTS:
+            if not before.get(name):
+                continue
+            ratio = result[name] / before[name]
+            flag = " !" if ratio > 1 + tolerance else ""
+            print(f"{result['rows']:>10} {name:>16} {before[name]:>10.3f} {result[name]:>10.3f} {ratio:>7.2f}{flag}")
+            if flag:
+                regressions.append((result["rows"], name, ratio))
+    return regressions
+
+
+def run(rows, moves):
+    print(
+        f"{'rows':>10} {'upload (s)':>11} {'cold (s)':>9} {'cached (ms)':>12} {'304 (ms)':>9} "
+        f"{'drag (ms)':>10} {'MB':>8} {'gzip MB':>8}  stages (s)"
+    )
+    results = []
+    metrics.enabled = True
+    with TestClient(app) as client:
+        for n_rows in rows:
+            result = measure(client, n_rows, moves)
+            stages = " ".join(f"{stage}={result['stages_s'].get(stage, 0):.3f}" for stage in STAGES)
+            print(
+                f"{n_rows:>10} {result['upload_s']:>11.2f} {result['graph_cold_s']:>9.2f} "
+                f"{result['graph_cached_ms']:>12.1f} {result['not_modified_ms']:>9.2f} "
+                f"{result['drag_drop_ms']:>10.2f} {result['payload_mb']:>8.1f} {result['gzip_mb']:>8.1f}  {stages}"
+            )
+            results.append(result)
+    workspaces.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--moves", type=int, default=20)
+    parser.add_argument("--save", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed growth before a regression")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.moves)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} measurement(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark broadcasting edits to many clients against refetching the graph.
+
+Run from the backend directory:
+
+    python -m benchmarks.feed_benchmark --rows 10000 100000 1000000 --clients 100
+
+Edits are attribute moves published in ticks of --edits-per-tick. The feed
+cost is the time to publish, encode and hand every tick's frame to every
+client; the refetch columns are what polling clients would download instead,
+the full (uncompressed) graph per client after each tick.
+"""
+import argparse
+import asyncio
+import time
+
+from app.feed import ChangeFeed
+from app.graph_builder import build_graph
+from app.graph_store import LinkIndex
+from app.revisions import RevisionLog
+from app.serialization import encode_json
+from benchmarks.graph_builder_benchmark import make_model
+
+TICKS = 20
+
+
+async def _broadcast(node_data_array, links, clients, edits_per_tick):
+    log = RevisionLog()
+    log.reset()
+    feed = ChangeFeed(lambda: log)
+    sent = [0]
+
+    async def send(frame):
+        sent[0] += len(frame)
+
+    subscribers = [feed.subscribe() for _ in range(clients)]
+    senders = [asyncio.ensure_future(feed.serve(send, subscriber)) for subscriber in subscribers]
+    await asyncio.sleep(0)
+    sent[0] = 0
+
+    objects = [node["key"] for node in node_data_array if node["category"] == "object"][:2]
+    attributes = [node["key"] for node in node_data_array if node["category"] == "attribute"]
+    start = time.perf_counter()
+    for tick in range(TICKS):
+        for i in range(edits_per_tick):
+            child = attributes[(tick * edits_per_tick + i) % len(attributes)]
+            removed = links.remove_links_to(child)
+            added = [links.add(objects[(tick + i) % 2], child)]
+            feed.publish(log.record(removed, added))
+        feed.flush()
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    for sender in senders:
+        sender.cancel()
+    return elapsed / TICKS, sent[0] / TICKS / clients
+
+
+def run(sizes, clients, edits_per_tick):
+    print(
+        f"{'rows':>10} {'clients':>8} {'feed/tick (ms)':>15} {'frame (KB)':>11} "
+        f"{'refetch/tick (MB)':>18} {'graph (MB)':>11}"
+    )
+    for n_rows in sizes:
+        node_data_array, link_data_array = build_graph(make_model(n_rows))
+        graph_bytes = len(encode_json({"nodeDataArray": node_data_array, "linkDataArray": link_data_array}))
+        per_tick, frame_bytes = asyncio.run(
+            _broadcast(node_data_array, LinkIndex(link_data_array), clients, edits_per_tick)
+        )
+        print(
+            f"{n_rows:>10} {clients:>8} {per_tick * 1000:>15.2f} {frame_bytes / 1e3:>11.1f} "
+            f"{graph_bytes * clients / 1e6:>18.1f} {graph_bytes / 1e6:>11.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--edits-per-tick", type=int, default=10)
+    args = parser.parse_args()
+    run(args.rows, args.clients, args.edits_per_tick)
+
+
+if __name__ == "__main__":
+    main()
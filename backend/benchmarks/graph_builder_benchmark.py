@@ -0,0 +1,133 @@
+"""
+Benchmark the columnar graph builder against the original row-by-row loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.graph_builder_benchmark --rows 10000 100000 1000000
+
+Both builders are checked for identical output (with deterministic keys)
+before being timed.
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.graph_builder import build_graph
+
+
+def make_model(n_rows, seed=0):
+    """
+    Generate a synthetic asset model with n_rows attribute rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n_rows // 5000)
+    n_objects = max(1, n_rows // 20)
+    object_ids = np.sort(rng.integers(0, n_objects, n_rows))
+    cluster_ids = object_ids % n_clusters
+    new_object = np.where(rng.random(n_rows) < 0.1, "NewObject", None)
+    return pd.DataFrame({
+        "cluster_name": [f"Cluster{i}" for i in cluster_ids],
+        "object_name": [f"Object{i}" for i in object_ids],
+        "object_name_alt": [f"Object {i} Alt" for i in object_ids],
+        "attribute_name": [f"Attribute{i}" for i in range(n_rows)],
+        "attribute_name_alt": [f"Attr {i}" for i in range(n_rows)],
+        "attribute_definition": [f"Definition of attribute {i}" for i in range(n_rows)],
+        "new_object ": new_object,
+        "data_type": rng.choice(["string", "integer", "date"], n_rows),
+    })
+
+
+def build_graph_rowwise(df, load_descriptions=False, key_factory=None):
+    """
+    The original df.iterrows() implementation, kept as the reference.
+    """
+    node_data_array = []
+    link_data_array = []
+    added_object_nodes = {}
+    cluster_keys = {}
+    for cluster_name in df["cluster_name"].unique():
+        cluster_key = key_factory()
+        cluster_keys[cluster_name] = cluster_key
+        node_data_array.append({
+            "key": cluster_key,
+            "category": "system",
+            "label": cluster_name,
+            "hoverLabel": cluster_name if load_descriptions else ""
+        })
+    for idx, row in df.iterrows():
+        object_node_key = row["object_name"] + f"_{cluster_keys[row['cluster_name']]}"
+        if object_node_key not in added_object_nodes:
+            object_node = {
+                "key": object_node_key,
+                "category": "object",
+                "label": row["object_name"],
+                "hoverLabel": row["object_name_alt"] if load_descriptions else "",
+            }
+            node_data_array.append(object_node)
+            added_object_nodes[object_node_key] = object_node
+        attribute_node_key = key_factory()
+        harmonised_attr = row.get("harmonised_attribute", "")
+        attribute_node = {
+            "key": attribute_node_key,
+            "category": "attribute",
+            "label": row["attribute_name"],
+            "hoverLabel": f"{row['attribute_name_alt']}\n{row['attribute_definition']}" if load_descriptions else "",
+            "harmonisedAttribute": harmonised_attr if harmonised_attr else f"Harmonised-{row['attribute_name']}"
+        }
+        for col in df.columns:
+            if col not in ["cluster_name", "object_name", "object_name_alt", "attribute_name", "attribute_name_alt", "attribute_definition", "harmonised_attribute"]:
+                column_name = col.strip()
+                val = row.get(col)
+                if pd.notna(val):
+                    attribute_node[column_name] = val
+        node_data_array.append(attribute_node)
+        link_data_array.append({"from": cluster_keys[row["cluster_name"]], "to": object_node_key})
+        link_data_array.append({"from": object_node_key, "to": attribute_node_key})
+    return node_data_array, link_data_array
+
+
+def counter_keys():
+    """
+    Deterministic key factory so both builders can be compared byte for byte.
+    """
+    counter = itertools.count()
+    return lambda: f"k{next(counter)}"
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(rows, legacy_limit):
+    print(f"{'rows':>10} {'columnar (s)':>14} {'row loop (s)':>14} {'speedup':>9}")
+    for n_rows in rows:
+        df = make_model(n_rows)
+        fast, fast_time = _timed(build_graph, df, load_descriptions=True, key_factory=counter_keys())
+        if n_rows > legacy_limit:
+            print(f"{n_rows:>10} {fast_time:>14.3f} {'skipped':>14} {'-':>9}")
+            continue
+        slow, slow_time = _timed(build_graph_rowwise, df, load_descriptions=True, key_factory=counter_keys())
+        if json.dumps(fast) != json.dumps(slow):
+            raise AssertionError(f"Builders disagree at {n_rows} rows")
+        print(f"{n_rows:>10} {fast_time:>14.3f} {slow_time:>14.3f} {slow_time / fast_time:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--legacy-limit", type=int, default=1_000_000,
+        help="Skip the row loop above this many rows (it takes minutes at 1M)",
+    )
+    args = parser.parse_args()
+    run(args.rows, args.legacy_limit)
+
+
+if __name__ == "__main__":
+    main()
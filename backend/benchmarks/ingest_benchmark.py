@@ -0,0 +1,129 @@
+"""
+Compare peak memory of whole-payload CSV parsing with chunked ingestion.
+
+Run from the backend directory:
+
+    python -m benchmarks.ingest_benchmark --rows 100000 1000000
+
+Each strategy runs in a fresh process so its peak RSS is measured in isolation.
+The same model is also written as an .xlsx workbook and read with the
+streaming Excel reader.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import zipfile
+from io import StringIO
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from app.excel import read_xlsx
+from app.ingest import read_csv_chunked
+from benchmarks.graph_builder_benchmark import make_model
+
+
+def _parse_whole(path):
+    with open(path, "rb") as f:
+        content = f.read()
+    return pd.read_csv(StringIO(content.decode("utf-8")))
+
+
+def _parse_chunked(path):
+    with open(path, "rb") as f:
+        return read_csv_chunked(f)
+
+
+def _parse_xlsx(path):
+    with open(path.replace(".csv", ".xlsx"), "rb") as f:
+        return read_xlsx(f, "model.xlsx")
+
+
+def write_xlsx(df, path):
+    """
+    Write df as a single-sheet .xlsx workbook with inline strings.
+    """
+    def cell(value):
+        if pd.isna(value):
+            return "<c/>"
+        return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        with z.open("xl/worksheets/sheet1.xml", "w") as f:
+            f.write(b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for row in itertools.chain([df.columns.tolist()], df.itertuples(index=False, name=None)):
+                f.write(("<row>" + "".join(map(cell, row)) + "</row>").encode("utf-8"))
+            f.write(b"</sheetData></worksheet>")
+        z.writestr(
+            "xl/workbook.xml",
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Model" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        z.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" Type="worksheet"/></Relationships>',
+        )
+
+
+def _peak_rss_mb():
+    """
+    Peak RSS of this process. VmHWM is preferred because ru_maxrss survives
+    exec and would report the parent's peak in a freshly spawned child.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+STRATEGIES = {"whole payload": _parse_whole, "chunked": _parse_chunked, "xlsx streamed": _parse_xlsx}
+
+
+def _measure(name, path, results):
+    start = time.perf_counter()
+    df = STRATEGIES[name](path)
+    elapsed = time.perf_counter() - start
+    peak_mb = _peak_rss_mb()
+    df_mb = df.memory_usage(deep=True).sum() / 2**20
+    results.put((elapsed, peak_mb, df_mb))
+
+
+def run(rows):
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'rows':>10} {'strategy':>14} {'file MB':>9} {'time (s)':>9} {'peak RSS MB':>12} {'df MB':>8}")
+    for n_rows in rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.csv")
+            model = make_model(n_rows)
+            model.to_csv(path, index=False)
+            write_xlsx(model, path.replace(".csv", ".xlsx"))
+            del model
+            file_mb = os.path.getsize(path) / 2**20
+            for name in STRATEGIES:
+                results = ctx.Queue()
+                proc = ctx.Process(target=_measure, args=(name, path, results))
+                proc.start()
+                elapsed, peak_mb, df_mb = results.get()
+                proc.join()
+                print(f"{n_rows:>10} {name:>14} {file_mb:>9.1f} {elapsed:>9.2f} {peak_mb:>12.1f} {df_mb:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Microbenchmark reparenting with the LinkIndex against list scans.
+
+Run from the backend directory:
+
+    python -m benchmarks.link_index_benchmark --links 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from app.graph_store import LinkIndex
+
+
+def make_links(n_links, fan_out=20):
+    """
+    Build cluster->object->attribute style links, n_links in total.
+    """
+    links = []
+    n_objects = max(1, n_links // (2 * fan_out))
+    for i in range(n_links // 2):
+        obj = f"o{i % n_objects}"
+        links.append({"from": f"c{i % n_objects % 50}", "to": obj})
+        links.append({"from": obj, "to": f"a{i}"})
+    return links
+
+
+def reparent_list(links, source, target):
+    """
+    The original list-scan implementation.
+    """
+    links_to_remove = [link for link in links if link["to"] == source]
+    links = [link for link in links if link not in links_to_remove]
+    links.append({"from": target, "to": source})
+    return links
+
+
+def reparent_index(index, source, target):
+    index.remove_links_to(source)
+    index.add(target, source)
+
+
+def run(sizes, edits):
+    print(f"{'links':>10} {'list (ms/edit)':>15} {'index (ms/edit)':>16} {'build (s)':>10} {'materialize (ms)':>17}")
+    rng = random.Random(0)
+    for n_links in sizes:
+        links = make_links(n_links)
+        moves = [(f"a{rng.randrange(n_links // 2)}", f"o{rng.randrange(max(1, n_links // 40))}") for _ in range(edits)]
+
+        list_edits = min(edits, max(1, 2_000_000 // n_links))
+        start = time.perf_counter()
+        current = links
+        for source, target in moves[:list_edits]:
+            current = reparent_list(current, source, target)
+        list_ms = (time.perf_counter() - start) * 1000 / list_edits
+
+        start = time.perf_counter()
+        index = LinkIndex(links)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source, target in moves:
+            reparent_index(index, source, target)
+        index_ms = (time.perf_counter() - start) * 1000 / edits
+
+        start = time.perf_counter()
+        index.link_data_array()
+        materialize_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n_links:>10} {list_ms:>15.3f} {index_ms:>16.4f} {build_s:>10.3f} {materialize_ms:>17.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--links", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--edits", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.links, args.edits)
+
+
+if __name__ == "__main__":
+    main()
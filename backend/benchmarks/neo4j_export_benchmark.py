@@ -0,0 +1,105 @@
+"""
+Benchmark the Neo4j export targets in nodes per second.
+
+Run from the backend directory:
+
+    python -m benchmarks.neo4j_export_benchmark --rows 10000 100000 1000000
+
+Without a database the "database" column measures the exporter's own cost
+(records, batching, one transaction per batch) against a driver that
+discards the statements. With NEO4J_URI (and NEO4J_USER, NEO4J_PASSWORD)
+set, the export is written to that database under the model ID "benchmark",
+and read back.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_export import BATCH_SIZE, GraphExport, Neo4jGraphStore, write_admin_import, write_cypher_script
+from app.graph_store import NodeIndex
+from benchmarks.graph_builder_benchmark import make_model
+
+
+class _NullResult:
+    def consume(self):
+        return None
+
+
+class _NullSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None):
+        return _NullResult()
+
+    def execute_write(self, fn, *args):
+        return fn(self, *args)
+
+
+class NullDriver:
+    """
+    A driver that accepts every statement without sending it anywhere.
+    """
+
+    def session(self, **config):
+        return _NullSession()
+
+    def close(self):
+        pass
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _cypher(export, directory):
+    with open(os.path.join(directory, "model.cypher"), "w", encoding="utf-8") as f:
+        write_cypher_script(export, f, "benchmark")
+
+
+def run(sizes, batch_size):
+    store = Neo4jGraphStore.from_env()
+    reading = store is not None
+    if store is None:
+        store = Neo4jGraphStore(NullDriver())
+    store.batch_size = batch_size
+
+    header = f"{'rows':>10} {'nodes':>10} {'database (n/s)':>15} {'cypher (n/s)':>13} {'admin csv (n/s)':>16}"
+    print(header + (f" {'import (rows/s)':>16}" if reading else ""))
+    for n_rows in sizes:
+        df = make_model(n_rows)
+        node_data_array, link_data_array = build_graph(df)
+        export = GraphExport(df, node_data_array, link_data_array, DescriptionIndex(df, NodeIndex(node_data_array)))
+        n_nodes = len(export)
+
+        _, database_s = _timed(store.save, export, "benchmark")
+        with tempfile.TemporaryDirectory() as directory:
+            _, cypher_s = _timed(_cypher, export, directory)
+            _, admin_s = _timed(write_admin_import, export, directory, "benchmark")
+
+        line = f"{n_rows:>10} {n_nodes:>10} {n_nodes / database_s:>15,.0f} {n_nodes / cypher_s:>13,.0f} {n_nodes / admin_s:>16,.0f}"
+        if reading:
+            _, import_s = _timed(store.load, "benchmark")
+            line += f" {n_rows / import_s:>16,.0f}"
+        print(line)
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    run(args.rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
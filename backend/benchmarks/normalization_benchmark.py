@@ -0,0 +1,68 @@
+"""
+Benchmark the normalization analysis on synthetic models with duplicates.
+
+Run from the backend directory:
+
+    python -m benchmarks.normalization_benchmark --rows 10000 100000 1000000
+
+A fifth of the attributes are renamed into 50 shared names with near-identical
+definitions, and every twentieth object copies the attributes of the one
+before it, so every kind of finding is present.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_store import NodeIndex
+from app.normalization import analyze_model
+from benchmarks.graph_builder_benchmark import make_model
+
+
+def make_redundant_model(n_rows, seed=0):
+    """
+    Generate a synthetic model with repeated attributes and overlapping objects.
+    """
+    df = make_model(n_rows, seed)
+    rng = np.random.default_rng(seed)
+    shared = rng.choice(n_rows, n_rows // 5, replace=False)
+    df.loc[shared, "attribute_name"] = [f"Shared{i % 50}" for i in range(len(shared))]
+    df.loc[shared, "attribute_definition"] = [f"Shared definition {i % 50} used across the model" for i in range(len(shared))]
+
+    # Objects whose id is a multiple of 20 take the attribute names of the previous object
+    object_ids = df["object_name"].str.slice(6).astype(int).to_numpy()
+    names = df["attribute_name"].to_numpy(dtype=object).copy()
+    for object_id in np.unique(object_ids[object_ids % 20 == 0]).tolist():
+        source = names[object_ids == object_id - 1]
+        target = np.flatnonzero(object_ids == object_id)
+        names[target[:len(source)]] = source[:len(target)]
+    df["attribute_name"] = names
+    return df
+
+
+def run(sizes):
+    print(f"{'rows':>10} {'analysis (s)':>13} {'repeated':>9} {'harmonised':>11} {'synonyms':>9} {'overlapping':>12}")
+    for n_rows in sizes:
+        df = make_redundant_model(n_rows)
+        node_data_array, link_data_array = build_graph(df)
+        source_rows = DescriptionIndex(df, NodeIndex(node_data_array)).source_rows()
+
+        start = time.perf_counter()
+        result = analyze_model(df, node_data_array, link_data_array, source_rows)
+        elapsed = time.perf_counter() - start
+
+        totals = [result[kind]["total"] for kind in ("repeatedAttributes", "harmonisedCandidates", "synonymCandidates", "overlappingObjects")]
+        print(f"{n_rows:>10} {elapsed:>13.2f} {totals[0]:>9} {totals[1]:>11} {totals[2]:>9} {totals[3]:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
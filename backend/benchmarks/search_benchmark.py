@@ -0,0 +1,70 @@
+"""
+Benchmark building the search index and answering queries against it.
+
+Run from the backend directory:
+
+    python -m benchmarks.search_benchmark --rows 10000 100000 1000000
+
+Each query kind is run against several different targets and the median
+latency is reported: a name prefix, a name with two letters swapped, an
+alternative name and a pair of definition words.
+"""
+import argparse
+import statistics
+import time
+
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_store import LinkIndex, NodeIndex
+from app.search import SearchIndex
+from benchmarks.graph_builder_benchmark import make_model
+
+REPEATS = 20
+
+
+def _queries(n_rows):
+    targets = [(i * 7919) % n_rows for i in range(REPEATS)]
+    return {
+        "prefix": [f"attribute{i}"[:-1] for i in targets],
+        "typo": [f"atrtibute{i}" for i in targets],
+        "alt": [f"attr {i}" for i in targets],
+        "definition": [f"definition attribute {i}" for i in targets],
+    }
+
+
+def run(sizes):
+    kinds = list(_queries(1))
+    print(f"{'rows':>10} {'build (s)':>10} {'size (MB)':>10} " + " ".join(f"{kind + ' (ms)':>16}" for kind in kinds))
+    for n_rows in sizes:
+        df = make_model(n_rows)
+        node_data_array, link_data_array = build_graph(df)
+        nodes = NodeIndex(node_data_array)
+        source_rows = DescriptionIndex(df, nodes).source_rows()
+
+        start = time.perf_counter()
+        index = SearchIndex(df, nodes, source_rows, LinkIndex(link_data_array))
+        build = time.perf_counter() - start
+
+        latencies = []
+        for queries in _queries(n_rows).values():
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query)
+                timings.append(time.perf_counter() - start)
+            latencies.append(statistics.median(timings) * 1000)
+        print(
+            f"{n_rows:>10} {build:>10.2f} {index.nbytes / 1e6:>10.1f} "
+            + " ".join(f"{latency:>16.2f}" for latency in latencies)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare FastAPI's default JSON response path with pre-serialized payloads.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization_benchmark --rows 10000 100000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.graph_builder import build_graph
+from app.serialization import SerializedPayload
+from benchmarks.graph_builder_benchmark import make_model
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run(rows):
+    print(f"{'rows':>8} {'default (ms)':>13} {'encode once (ms)':>17} {'gzip once (ms)':>15} "
+          f"{'cached (ms)':>12} {'MB':>6} {'gzip MB':>8}")
+    for n_rows in rows:
+        nodes, links = build_graph(make_model(n_rows))
+        document = {"nodeDataArray": nodes, "linkDataArray": links, "revision": 1}
+
+        _, default_ms = _timed(
+            lambda: json.dumps(jsonable_encoder(document), ensure_ascii=False, allow_nan=False,
+                               separators=(",", ":")).encode("utf-8")
+        )
+        payload, encode_ms = _timed(lambda: SerializedPayload(document, 'W/"bench-1"'))
+        (_, compressed), gzip_ms = _timed(lambda: payload.encode("gzip"))
+        _, cached_ms = _timed(lambda: payload.encode("gzip"))
+
+        print(f"{n_rows:>8} {default_ms:>13.1f} {encode_ms:>17.1f} {gzip_ms:>15.1f} {cached_ms:>12.3f} "
+              f"{len(payload.body) / 2**20:>6.1f} {len(compressed) / 2**20:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark saving and restoring workspace snapshots against re-uploading.
+
+Run from the backend directory:
+
+    python -m benchmarks.snapshot_benchmark --rows 10000 100000 1000000
+
+"restore" is what startup pays before a model's graph document is servable;
+"load" is the background load of the model and graph indexes that follows,
+compared with parsing the CSV and rebuilding the graph.
+"""
+import argparse
+import io
+import tempfile
+import time
+
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_store import LinkIndex, NodeIndex
+from app.ingest import read_csv_chunked
+from app.snapshots import SnapshotStore
+from app.workspaces import Workspace
+from benchmarks.graph_builder_benchmark import make_model
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def rebuild(csv_bytes):
+    df = read_csv_chunked(io.BytesIO(csv_bytes))
+    node_data_array, link_data_array = build_graph(df)
+    nodes = NodeIndex(node_data_array)
+    return df, nodes, LinkIndex(link_data_array), DescriptionIndex(df, nodes)
+
+
+def load(path):
+    df, nodes, links = SnapshotStore.load(path)
+    return df, nodes, links, DescriptionIndex(df, nodes)
+
+
+def run(sizes):
+    print(f"{'rows':>10} {'reupload (s)':>13} {'save (s)':>9} {'restore (s)':>12} {'load (s)':>9}")
+    for n_rows in sizes:
+        csv_bytes = make_model(n_rows).to_csv(index=False).encode("utf-8")
+        (df, nodes, links, _), reupload_s = _timed(rebuild, csv_bytes)
+
+        with tempfile.TemporaryDirectory() as root:
+            store = SnapshotStore(root)
+            workspace = Workspace("benchmark")
+            workspace.update(df=df, nodes=nodes, links=links)
+            _, save_s = _timed(store.save, workspace)
+
+            restored = Workspace("benchmark")
+            _, restore_s = _timed(store.restore, restored)
+            _, load_s = _timed(load, restored["pendingSnapshot"])
+
+        print(f"{n_rows:>10} {reupload_s:>13.2f} {save_s:>9.2f} {restore_s:>12.3f} {load_s:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_store import NodeIndex
+
+
+def _upload(client, test_csv_file):
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+
+def test_description_index_matches_builder(test_csv_file):
+    """The index yields the same hover text the builder produces inline."""
+    df = pd.read_csv(test_csv_file)
+    nodes, _ = build_graph(df)
+    described, _ = build_graph(df, load_descriptions=True)
+
+    index = DescriptionIndex(df, NodeIndex(nodes))
+
+    assert index.hover_labels() == [node["hoverLabel"] for node in described]
+    assert index.lookup([nodes[-1]["key"], "missing"]) == {nodes[-1]["key"]: "Alt3\nThis is definition 3"}
+
+
+def test_descriptions_endpoint(client, test_csv_file):
+    """Hover text is returned only for the requested keys."""
+    _upload(client, test_csv_file)
+    nodes = client.get("/graph-data/").json()["nodeDataArray"]
+    obj = next(node for node in nodes if node["category"] == "object")
+
+    response = client.post("/descriptions/", json={"keys": [obj["key"]]})
+
+    assert response.json() == {"descriptions": {obj["key"]: "Object1 Alt"}}
+    assert client.post("/descriptions/", json={"keys": "x"}).status_code == 400
+    assert client.post("/descriptions/", json={"keys": [{"a": 1}]}).status_code == 400
+    assert client.post("/descriptions/", json={"keys": [obj["key"], None]}).status_code == 400
+
+
+def test_load_descriptions_keeps_graph_cache(client, test_csv_file):
+    """Toggling descriptions keeps keys, links and revision of the cached graph."""
+    _upload(client, test_csv_file)
+    before = client.get("/graph-data/").json()
+
+    client.post("/load-descriptions/")
+    after = client.get("/graph-data/").json()
+
+    assert after["revision"] == before["revision"]
+    assert [node["key"] for node in after["nodeDataArray"]] == [node["key"] for node in before["nodeDataArray"]]
+    assert after["linkDataArray"] == before["linkDataArray"]
+    assert all(node["hoverLabel"] for node in after["nodeDataArray"])
@@ -0,0 +1,230 @@
+import io
+import zipfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+import pytest
+from fastapi import status
+
+from app.excel import ExcelFormatError, XlsxWorkbook, read_xlsx
+from app.ingest import MissingColumnsError
+
+TEMPLATE = Path(__file__).resolve().parents[2] / "ai_template.xlsx"
+
+HEADER = ["Cluster Name", "object_name", "Object Name Alt", "attribute_name", "attribute_name_alt", "attribute_definition", "new_object"]
+ROWS = [
+    ["Cluster1", "Object1", "Object1 Alt", "Attribute1", "Alt1", "Def1", None],
+    ["Cluster1", "Object1", "Object1 Alt", "Attribute2", "Alt2", "Def2", "NewObj"],
+    [None, None, None, None, None, None, None],
+    ["Cluster2", "Object2", "Object2 Alt", "Attribute3", "Alt3", 3.5, None],
+]
+
+
+def _cell(column, row, value):
+    ref = f"{chr(65 + column)}{row}"
+    if value is None:
+        return ""
+    if isinstance(value, tuple):
+        value, style = value
+        return f'<c r="{ref}" s="{style}"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+
+
+def _styles(number_formats):
+    """
+    Return a styles part whose cell format i + 1 shows number_formats[i], a
+    built-in format ID or a custom format code.
+    """
+    custom, xfs = [], ['<xf numFmtId="0"/>']
+    for i, code in enumerate(number_formats):
+        format_id = code
+        if isinstance(code, str):
+            format_id = 164 + i
+            custom.append(f'<numFmt numFmtId="{format_id}" formatCode={quoteattr(code)}/>')
+        xfs.append(f'<xf numFmtId="{format_id}" applyNumberFormat="1"/>')
+    return (
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f"<numFmts>{''.join(custom)}</numFmts><cellXfs>{''.join(xfs)}</cellXfs></styleSheet>"
+    )
+
+
+def make_xlsx(sheets, number_formats=(), date1904=False):
+    """
+    Build a minimal .xlsx workbook from {sheet name: rows}, with inline
+    strings. Cells given as (serial, style) use cell format style, which
+    shows number_formats[style - 1].
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(
+            "[Content_Types].xml",
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/></Types>',
+        )
+        z.writestr(
+            "_rels/.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            "</Relationships>",
+        )
+        sheet_entries, rels = [], []
+        properties = '<workbookPr date1904="1"/>' if date1904 else ""
+        if number_formats:
+            z.writestr("xl/styles.xml", _styles(number_formats))
+            rels.append(
+                '<Relationship Id="rIdStyles" Target="styles.xml" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+            )
+        for index, (name, rows) in enumerate(sheets.items(), start=1):
+            sheet_entries.append(f'<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>')
+            rels.append(f'<Relationship Id="rId{index}" Target="worksheets/sheet{index}.xml" Type="worksheet"/>')
+            body = "".join(
+                f'<row r="{r}">' + "".join(_cell(c, r, value) for c, value in enumerate(row)) + "</row>"
+                for r, row in enumerate(rows, start=1)
+            )
+            z.writestr(
+                f"xl/worksheets/sheet{index}.xml",
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f"<sheetData>{body}</sheetData></worksheet>",
+            )
+        z.writestr(
+            "xl/workbook.xml",
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"{properties}<sheets>{''.join(sheet_entries)}</sheets></workbook>",
+        )
+        z.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{''.join(rels)}</Relationships>",
+        )
+    buffer.seek(0)
+    return buffer
+
+
+def test_read_xlsx_flat_sheet():
+    """A sheet with the CSV columns is read with the header names normalized."""
+    workbook = make_xlsx({"Notes": [["Read me"]], "Model": [HEADER] + ROWS})
+    df = read_xlsx(workbook, "model.xlsx", chunk_rows=2)
+
+    assert df.columns.tolist()[:6] == ["cluster_name", "object_name", "object_name_alt", "attribute_name", "attribute_name_alt", "attribute_definition"]
+    assert df["attribute_name"].tolist() == ["Attribute1", "Attribute2", "Attribute3"]
+    assert df["attribute_definition"].tolist() == ["Def1", "Def2", 3.5]
+    assert set(df["cluster_name"].cat.categories) == {"Cluster1", "Cluster2"}
+    assert df.index.tolist() == [0, 1, 2]
+
+
+def test_read_xlsx_template_er_layout():
+    """The ER export layout of the template maps columns to attributes of their entity."""
+    with open(TEMPLATE, "rb") as f:
+        df = read_xlsx(f, TEMPLATE.name)
+
+    assert len(df) == 19
+    assert set(df["cluster_name"]) == {"Transformator"}
+    assert set(df["object_name"]) == {"Transformator", "Funktionale Transformatoren", "Mechanische Eigenschaften", "Olgekuhlte"}
+    row = df[df["attribute_name"] == "Gewicht Al"].iloc[0]
+    assert row["object_name"] == "Mechanische Eigenschaften"
+    assert row["data_type"] == "integer"
+
+
+def test_xlsx_workbook_reads_shared_strings():
+    """Shared strings, numbers and gaps between cells are decoded."""
+    with open(TEMPLATE, "rb") as f:
+        rows = list(XlsxWorkbook(f).rows("Diagram"))
+
+    assert rows[0][:3] == ["Diagram", "ID", "Name"]
+    assert rows[1][0] is None and rows[1][2] == "ai template Entity Relationship Diagram"
+
+
+def test_read_xlsx_rejects_missing_columns_and_invalid_files():
+    with pytest.raises(MissingColumnsError):
+        read_xlsx(make_xlsx({"Sheet1": [["col1", "col2"], [1, 2]]}), "model.xlsx")
+    with pytest.raises(ExcelFormatError):
+        read_xlsx(io.BytesIO(b"not a zip"), "model.xlsx")
+
+
+def test_upload_xlsx(client):
+    """Workbooks are accepted by /upload/ like CSV files."""
+    workbook = make_xlsx({"Model": [HEADER] + ROWS})
+    response = client.post(
+        "/upload/",
+        files={"file": ("model.xlsx", workbook, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    data = client.get("/graph-data/").json()
+    labels = {node["label"] for node in data["nodeDataArray"] if node["category"] == "attribute"}
+    assert labels == {"Attribute1", "Attribute2", "Attribute3"}
+
+
+def test_xlsx_workbook_scans_prefixed_tags_rich_text_and_entities():
+    """Prefixed tags, escaped text, rich text runs and phonetic hints are decoded."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(
+            "xl/workbook.xml",
+            '<x:workbook xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<x:sheets><x:sheet name="Data" sheetId="1" r:id="rId1"/></x:sheets></x:workbook>',
+        )
+        z.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="/xl/worksheets/data.xml" Type="worksheet"/></Relationships>',
+        )
+        z.writestr(
+            "xl/sharedStrings.xml",
+            '<x:sst xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            "<x:si><x:r><x:t>Rich </x:t></x:r><x:r><x:t>text</x:t></x:r><x:rPh><x:t>hint</x:t></x:rPh></x:si>"
+            "<x:si><x:t/></x:si></x:sst>",
+        )
+        z.writestr(
+            "xl/worksheets/data.xml",
+            '<x:worksheet xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><x:sheetData>'
+            '<x:row r="1"><x:c r="A1" t="s"><x:v>0</x:v></x:c><x:c r="C1" t="inlineStr"><x:is><x:t xml:space="preserve">A &amp; B&#10;</x:t></x:is></x:c></x:row>'
+            '<x:row r="2"/>'
+            '<x:row r="3"><x:c r="B3" t="b"><x:v>1</x:v></x:c><x:c r="C3" s="1"><x:f>1/4</x:f><x:v>0.25</x:v></x:c><x:c r="D3" t="s"><x:v>1</x:v></x:c></x:row>'
+            "</x:sheetData></x:worksheet>",
+        )
+    buffer.seek(0)
+
+    assert list(XlsxWorkbook(buffer).rows("Data")) == [
+        ["Rich text", None, "A & B\n"],
+        [],
+        [None, True, 0.25, None],
+    ]
+
+
+def test_xlsx_workbook_reads_dates_by_number_format():
+    """Serials shown with date, time or duration formats are decoded like python-calamine does."""
+    number_formats = [14, "yyyy\\-mm\\-dd hh:mm", 21, "[h]:mm", 10, '"Day "0', "[Red]0.00"]
+    row = [(45000, 1), (45000.5, 2), (0.75, 3), (1.5, 4), (0.25, 5), (3, 6), (2.5, 7), (1.25, 1), 45000]
+
+    [values] = XlsxWorkbook(make_xlsx({"Dates": [row]}, number_formats)).rows("Dates")
+    assert values == [
+        datetime(2023, 3, 15), datetime(2023, 3, 15, 12), time(18), timedelta(days=1, hours=12),
+        0.25, 3, 2.5, datetime(1900, 1, 1, 6), 45000,
+    ]
+    assert all(type(value) is datetime for value in (values[0], values[7]))
+
+    [values] = XlsxWorkbook(make_xlsx({"Dates": [row]}, number_formats, date1904=True)).rows("Dates")
+    assert (values[0], values[7]) == (datetime(2027, 3, 16), datetime(1904, 1, 2, 6))
+
+
+def test_upload_xlsx_with_dates(client):
+    """Date cells of metadata columns are served as ISO 8601 strings."""
+    rows = [HEADER + ["reviewed"], *(row + [(45000, 1)] for row in ROWS if row[0])]
+    workbook = make_xlsx({"Model": rows}, number_formats=[14])
+    response = client.post("/upload/", files={"file": ("model.xlsx", workbook, "application/octet-stream")})
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/graph-data/")
+    assert response.status_code == status.HTTP_200_OK
+    attributes = [node for node in response.json()["nodeDataArray"] if node["category"] == "attribute"]
+    assert {node["reviewed"] for node in attributes} == {"2023-03-15T00:00:00"}
@@ -0,0 +1,124 @@
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi import status
+from starlette.websockets import WebSocketDisconnect
+
+from app import feed as feed_module
+from app.feed import ChangeFeed
+from app.revisions import RevisionLog
+
+CSV = """cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition,harmonised_attribute
+Plant,Transformer,Power transformer,Rated Power,Nennleistung,Continuous apparent power,Power
+Grid,Cable,Power cable,Rated Voltage,Nennspannung,Voltage the insulation is rated for,Voltage
+"""
+
+
+def _move(log, child, old, new):
+    return log.record(removed=[{"from": old, "to": child}], added=[{"from": new, "to": child}])
+
+
+async def _drain(feed, subscriber):
+    """Return the frames the subscriber is sent until it goes idle."""
+    sent = []
+
+    async def send(frame):
+        sent.append(json.loads(frame))
+
+    task = asyncio.ensure_future(feed.serve(send, subscriber))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    return sent
+
+
+def test_feed_batches_one_net_patch_per_tick():
+    """Edits within a tick reach every subscriber as one net patch."""
+    log = RevisionLog()
+    base = log.reset()
+    feed = ChangeFeed(lambda: log)
+
+    async def scenario():
+        first, second = feed.subscribe(), feed.subscribe()
+        for new in ("b", "c", "d"):
+            feed.publish(_move(log, "x", {"b": "a", "c": "b", "d": "c"}[new], new))
+        feed.flush()
+        return await _drain(feed, first), await _drain(feed, second)
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    hello, patch = first
+    assert hello == {"type": "hello", "revision": base}
+    assert patch == {
+        "type": "patch", "since": base, "revision": log.revision,
+        "removed": [{"from": "a", "to": "x"}], "added": [{"from": "d", "to": "x"}],
+    }
+
+
+def test_feed_slow_subscriber_catches_up_from_journal(monkeypatch):
+    """A subscriber whose queue overflows gets one catch-up patch, the others every frame."""
+    monkeypatch.setattr(feed_module, "MAX_QUEUED_FRAMES", 2)
+    log = RevisionLog()
+    base = log.reset()
+    feed = ChangeFeed(lambda: log)
+
+    async def scenario():
+        slow, fast = feed.subscribe(), feed.subscribe()
+        fast_frames = await _drain(feed, fast)
+        for i in range(5):
+            feed.publish(_move(log, "x", f"p{i}", f"p{i + 1}"))
+            feed.flush()
+            fast_frames += await _drain(feed, fast)
+        return await _drain(feed, slow), fast_frames
+
+    slow_frames, fast_frames = asyncio.run(scenario())
+    assert [frame["revision"] for frame in fast_frames[1:]] == list(range(base + 1, base + 6))
+    assert slow_frames == [{
+        "type": "patch", "since": base, "revision": base + 5,
+        "removed": [{"from": "p0", "to": "x"}], "added": [{"from": "p5", "to": "x"}],
+    }]
+
+
+def test_websocket_broadcasts_node_updates(client):
+    """Relabels and harmonised attribute edits are broadcast, searchable and undoable."""
+    client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+    nodes = {node["label"]: node for node in client.get("/graph-data/").json()["nodeDataArray"]}
+    key = nodes["Rated Power"]["key"]
+
+    with client.websocket_connect("/ws/graph/") as websocket:
+        revision = websocket.receive_json()["revision"]
+
+        response = client.patch(f"/graph/nodes/{key}/", json={"label": "Apparent Power", "harmonisedAttribute": "Rating"})
+        assert response.status_code == status.HTTP_200_OK
+        frame = websocket.receive_json()
+        assert (frame["type"], frame["since"], frame["revision"]) == ("patch", revision, response.json()["revision"])
+        assert frame["updated"] == [
+            {"key": key, "field": "label", "value": "Apparent Power", "previous": "Rated Power"},
+            {"key": key, "field": "harmonisedAttribute", "value": "Rating", "previous": "Power"},
+        ]
+        assert client.get("/search/", params={"q": "apparent"}).json()["results"][0]["key"] == key
+
+        client.post("/history/undo/")
+        frame = websocket.receive_json()
+        assert [(update["field"], update["value"]) for update in frame["updated"]] == [
+            ("label", "Rated Power"), ("harmonisedAttribute", "Power"),
+        ]
+
+    labels = {node["key"]: node["label"] for node in client.get("/graph-data/").json()["nodeDataArray"]}
+    assert labels[key] == "Rated Power"
+    assert client.patch(f"/graph/nodes/{nodes['Plant']['key']}/", json={"harmonisedAttribute": "X"}).status_code == 400
+    assert client.patch("/graph/nodes/missing/", json={"label": "X"}).status_code == 404
+
+
+def test_websocket_checks_origin(client):
+    """Only the allowed origins may open the graph feed."""
+    client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+
+    with client.websocket_connect("/ws/graph/", headers={"Origin": "http://localhost:3000"}) as websocket:
+        assert websocket.receive_json()["type"] == "hello"
+
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/ws/graph/", headers={"Origin": "https://evil.example"}):
+            pass
+    assert refused.value.code == status.WS_1008_POLICY_VIOLATION
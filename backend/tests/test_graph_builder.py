@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app.graph_builder import attribute_node_keys, build_graph, count_new_object_values
+
+
+def _counter_keys():
+    counter = itertools.count()
+    return lambda: f"k{next(counter)}"
+
+
+def _model():
+    return pd.DataFrame({
+        "cluster_name": ["Cluster1", "Cluster2", "Cluster1"],
+        "object_name": ["Object1", "Object2", "Object1"],
+        "object_name_alt": ["Object1 Alt", "Object2 Alt", "Object1 Alt"],
+        "attribute_name": ["Attribute1", "Attribute2", "Attribute3"],
+        "attribute_name_alt": ["Alt1", "Alt2", "Alt3"],
+        "attribute_definition": ["Def1", "Def2", "Def3"],
+        "harmonised_attribute": ["H1", "", "H3"],
+        "new_object ": ["NewObj", np.nan, ""],
+    })
+
+
+def test_build_graph_matches_row_order():
+    """Nodes come out clusters first, then object (on first use) and attribute per row."""
+    nodes, links = build_graph(_model(), key_factory=_counter_keys())
+
+    assert nodes == [
+        {"key": "k0", "category": "system", "label": "Cluster1", "hoverLabel": ""},
+        {"key": "k1", "category": "system", "label": "Cluster2", "hoverLabel": ""},
+        {"key": "Object1_k0", "category": "object", "label": "Object1", "hoverLabel": ""},
+        {"key": "k2", "category": "attribute", "label": "Attribute1", "hoverLabel": "",
+         "harmonisedAttribute": "H1", "new_object": "NewObj"},
+        {"key": "Object2_k1", "category": "object", "label": "Object2", "hoverLabel": ""},
+        {"key": "k3", "category": "attribute", "label": "Attribute2", "hoverLabel": "",
+         "harmonisedAttribute": "Harmonised-Attribute2"},
+        {"key": "k4", "category": "attribute", "label": "Attribute3", "hoverLabel": "",
+         "harmonisedAttribute": "H3", "new_object": ""},
+    ]
+    assert links == [
+        {"from": "k0", "to": "Object1_k0"},
+        {"from": "Object1_k0", "to": "k2"},
+        {"from": "k1", "to": "Object2_k1"},
+        {"from": "Object2_k1", "to": "k3"},
+        {"from": "k0", "to": "Object1_k0"},
+        {"from": "Object1_k0", "to": "k4"},
+    ]
+
+
+def test_build_graph_with_descriptions():
+    """Hover labels are filled from the alt/definition columns when requested."""
+    nodes, _ = build_graph(_model(), load_descriptions=True, key_factory=_counter_keys())
+    hovers = {node["label"]: node["hoverLabel"] for node in nodes}
+
+    assert hovers["Cluster1"] == "Cluster1"
+    assert hovers["Object2"] == "Object2 Alt"
+    assert hovers["Attribute3"] == "Alt3\nDef3"
+
+
+def test_count_new_object_values():
+    """Only present, non-empty new_object values are counted."""
+    assert count_new_object_values(_model()) == 1
+
+
+def test_build_graph_keys_are_deterministic():
+    """Building the same model twice yields the same keys."""
+    first_nodes, first_links = build_graph(_model())
+    second_nodes, second_links = build_graph(_model())
+
+    assert first_nodes == second_nodes
+    assert first_links == second_links
+    assert len({node["key"] for node in first_nodes}) == len(first_nodes)
+
+
+def test_stable_keys_survive_row_changes():
+    """With stable keys, reordering and adding rows keeps existing attribute keys."""
+    df = _model()
+    edited = pd.concat([df.iloc[[2, 0, 1]], df.iloc[[1]].assign(attribute_name="Attribute4")], ignore_index=True)
+
+    keys = attribute_node_keys(df, stable=True)
+    edited_keys = attribute_node_keys(edited, stable=True)
+
+    assert edited_keys[:3] == [keys[2], keys[0], keys[1]]
+    assert edited_keys[3] not in keys
+    assert attribute_node_keys(edited)[:3] != edited_keys[:3]
@@ -66,4 +66,225 @@ def test_apply_drag_drop(client, test_csv_file):
         
         assert response.status_code == status.HTTP_200_OK
         assert "message" in response.json()
-        assert "Drag-and-drop operation completed successfully" in response.json()["message"]
\ No newline at end of file
+        assert "Drag-and-drop operation completed successfully" in response.json()["message"]
+
+def test_graph_data_since_returns_patches(client, test_csv_file):
+    """After a drag-drop, fetching since the old revision returns only the patch."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    data = client.get("/graph-data/").json()
+    revision = data["revision"]
+    attribute = next(node for node in data["nodeDataArray"] if node["category"] == "attribute")
+    objects = [node for node in data["nodeDataArray"] if node["category"] == "object"]
+    old_link = next(link for link in data["linkDataArray"] if link["to"] == attribute["key"])
+    target = next(obj for obj in objects if obj["key"] != old_link["from"])
+
+    response = client.post(
+        "/apply-drag-drop/",
+        json={"source": attribute["key"], "target": target["key"], "sourceType": "attribute", "targetType": "object"}
+    )
+    patch = response.json()
+    assert patch["revision"] == revision + 1
+    assert patch["removed"] == [old_link]
+    assert patch["added"] == [{"from": target["key"], "to": attribute["key"]}]
+
+    delta = client.get(f"/graph-data/?since={revision}").json()
+    assert "nodeDataArray" not in delta
+    assert delta["revision"] == revision + 1
+    assert delta["patches"] == [{k: patch[k] for k in ("revision", "removed", "added")}]
+
+
+def test_graph_data_since_stale_revision_returns_full_graph(client, test_csv_file):
+    """A revision older than the last rebuild gets the full graph."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    data = client.get("/graph-data/?since=0").json()
+    assert "nodeDataArray" in data
+    assert data["revision"] > 0
+
+
+def test_apply_drag_drop_invalid_operation_keeps_links(client, test_csv_file):
+    """A rejected drag-drop leaves the links and revision untouched."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+    data = client.get("/graph-data/").json()
+    attribute = next(node for node in data["nodeDataArray"] if node["category"] == "attribute")
+    system = next(node for node in data["nodeDataArray"] if node["category"] == "system")
+
+    response = client.post(
+        "/apply-drag-drop/",
+        json={"source": attribute["key"], "target": system["key"], "sourceType": "attribute", "targetType": "system"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    after = client.get(f"/graph-data/?since={data['revision']}").json()
+    assert after["patches"] == []
+
+
+def test_graph_data_conditional_get(client, test_csv_file):
+    """An unchanged graph is answered with 304; an edit changes the ETag."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    first = client.get("/graph-data/")
+    etag = first.headers["etag"]
+    assert first.status_code == status.HTTP_200_OK
+
+    cached = client.get("/graph-data/", headers={"If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.content == b""
+
+    data = first.json()
+    obj = next(node for node in data["nodeDataArray"] if node["category"] == "object")
+    system = next(node for node in data["nodeDataArray"] if node["category"] == "system")
+    client.post(
+        "/apply-drag-drop/",
+        json={"source": obj["key"], "target": system["key"], "sourceType": "object", "targetType": "system"}
+    )
+
+    changed = client.get("/graph-data/", headers={"If-None-Match": etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["etag"] != etag
+
+
+def _link_multiset(links):
+    return sorted((link["from"], link["to"]) for link in links)
+
+
+def test_undo_redo_and_restore_version(client, test_csv_file):
+    """Undo, redo and restore bring the links back to earlier versions."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    original = client.get("/graph-data/").json()
+    attributes = [node for node in original["nodeDataArray"] if node["category"] == "attribute"]
+    objects = [node for node in original["nodeDataArray"] if node["category"] == "object"]
+    for attribute in attributes[:2]:
+        parent = next(link["from"] for link in original["linkDataArray"] if link["to"] == attribute["key"])
+        target = next(obj["key"] for obj in objects if obj["key"] != parent)
+        client.post("/apply-drag-drop/", json={
+            "source": attribute["key"], "target": target, "sourceType": "attribute", "targetType": "object",
+        })
+    edited = client.get("/graph-data/").json()
+
+    undone = client.post("/history/undo/").json()
+    assert undone["revision"] == original["revision"] + 3
+    redone = client.post("/history/redo/").json()
+    assert redone["removed"] == undone["added"] and redone["added"] == undone["removed"]
+    assert _link_multiset(client.get("/graph-data/").json()["linkDataArray"]) == _link_multiset(edited["linkDataArray"])
+    assert client.post("/history/redo/").status_code == status.HTTP_409_CONFLICT
+
+    restored = client.post(f"/history/restore/{original['revision']}/").json()
+    assert len(restored["removed"]) == 2 and len(restored["added"]) == 2
+    assert _link_multiset(client.get("/graph-data/").json()["linkDataArray"]) == _link_multiset(original["linkDataArray"])
+
+    # The restore itself can be undone
+    client.post("/history/undo/")
+    assert _link_multiset(client.get("/graph-data/").json()["linkDataArray"]) == _link_multiset(edited["linkDataArray"])
+
+    history = client.get("/history/").json()
+    assert [version["action"] for version in history["versions"]] == ["edit", "edit", "undo", "redo", "restore", "undo"]
+    assert history["canRedo"] is True
+    assert client.post("/history/restore/0/").status_code == status.HTTP_409_CONFLICT
+
+
+def test_apply_drag_drop_batch(client, test_csv_file):
+    """A batch of moves is applied as one revision with one combined patch."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    data = client.get("/graph-data/").json()
+    nodes = {node["label"]: node["key"] for node in data["nodeDataArray"]}
+    moves = [
+        {"source": nodes["Attribute1"], "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object"},
+        {"source": nodes["Attribute2"], "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object"},
+        {"source": nodes["Object1"], "target": nodes["Cluster2"], "sourceType": "object", "targetType": "system"},
+    ]
+
+    response = client.post("/apply-drag-drop/batch/", json={"moves": moves})
+    assert response.status_code == status.HTTP_200_OK
+    patch = response.json()
+    assert patch["revision"] == data["revision"] + 1
+    assert sorted(link["to"] for link in patch["added"]) == sorted(move["source"] for move in moves)
+
+    children = client.get(f"/graph/nodes/{nodes['Object2']}/children/").json()
+    assert {node["label"] for node in children["nodeDataArray"]} == {"Attribute1", "Attribute2", "Attribute3"}
+
+    # The whole batch is undone at once
+    client.post("/history/undo/")
+    restored = client.get("/graph-data/").json()
+    assert sorted(map(str, restored["linkDataArray"])) == sorted(map(str, data["linkDataArray"]))
+
+
+def test_apply_drag_drop_batch_rejects_invalid_moves(client, test_csv_file):
+    """One invalid move rejects the whole batch without changing any link."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+    data = client.get("/graph-data/").json()
+    nodes = {node["label"]: node["key"] for node in data["nodeDataArray"]}
+    moves = [
+        {"source": nodes["Attribute1"], "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object"},
+        {"source": nodes["Attribute2"], "target": nodes["Cluster2"], "sourceType": "attribute", "targetType": "object"},
+        {"source": "missing", "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object"},
+        {"source": nodes["Attribute1"], "target": nodes["Object1"], "sourceType": "attribute", "targetType": "object"},
+    ]
+
+    response = client.post("/apply-drag-drop/batch/", json={"moves": moves})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert [error["index"] for error in response.json()["detail"]] == [1, 2, 3]
+    assert client.get(f"/graph-data/?since={data['revision']}").json()["patches"] == []
+
+
+def test_apply_drag_drop_rejects_unknown_and_mismatched_nodes(client, test_csv_file):
+    """Single moves are validated like batch moves: nothing is recorded or broadcast."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+    data = client.get("/graph-data/").json()
+    nodes = {node["label"]: node["key"] for node in data["nodeDataArray"]}
+
+    with client.websocket_connect("/ws/graph/") as websocket:
+        websocket.receive_json()
+        missing = client.post("/apply-drag-drop/", json={
+            "source": "missing", "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object",
+        })
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+        mismatched = client.post("/apply-drag-drop/", json={
+            "source": nodes["Object1"], "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object",
+        })
+        assert mismatched.status_code == status.HTTP_400_BAD_REQUEST
+
+        moved = client.post("/apply-drag-drop/", json={
+            "source": nodes["Attribute1"], "target": nodes["Object2"], "sourceType": "attribute", "targetType": "object",
+        })
+        assert moved.status_code == status.HTTP_200_OK
+        assert websocket.receive_json()["since"] == data["revision"]
+
+    assert moved.json()["revision"] == data["revision"] + 1
+    assert client.get("/history/").json()["canUndo"] is True
+    assert client.get(f"/graph-data/?since={data['revision']}").json()["patches"] == [
+        {"revision": data["revision"] + 1, "removed": moved.json()["removed"], "added": moved.json()["added"]}
+    ]
+
+
+def test_graph_data_etag_is_per_workspace(client, test_csv_file):
+    """Another workspace at the same revision never matches the ETag."""
+    with open(test_csv_file, 'rb') as f:
+        body = f.read()
+    for workspace_id in ("tab-a", "tab-b"):
+        client.post(
+            "/upload/", files={"file": ("test.csv", body, "text/csv")}, headers={"X-Workspace-Id": workspace_id}
+        )
+
+    first = client.get("/graph-data/", headers={"X-Workspace-Id": "tab-a"})
+    assert "X-Workspace-Id" in first.headers["vary"]
+    other = client.get("/graph-data/", headers={"X-Workspace-Id": "tab-b", "If-None-Match": first.headers["etag"]})
+    assert other.status_code == status.HTTP_200_OK
+    assert other.json()["revision"] == first.json()["revision"]
+
+    # A model uploaded again starts a new build with a new ETag
+    client.post("/upload/", files={"file": ("test.csv", body, "text/csv")}, headers={"X-Workspace-Id": "tab-a"})
+    again = client.get("/graph-data/", headers={"X-Workspace-Id": "tab-a", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == status.HTTP_200_OK
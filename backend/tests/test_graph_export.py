@@ -0,0 +1,213 @@
+import csv
+import io
+import re
+import zipfile
+
+import pytest
+from fastapi import status
+
+from app import graph_export
+from app.dependencies import get_graph_store
+from app.graph_export import Neo4jGraphStore, cypher_literal, render_statement
+from app.main import app
+
+
+class FakeResult:
+    def __init__(self, records=()):
+        self._records = list(records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    """
+    Runs the exporter's statements against an in-memory graph.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn, *args):
+        self._driver.transactions += 1
+        return fn(self, *args)
+
+    def run(self, query, parameters=None):
+        parameters = parameters or {}
+        model = parameters.get("model")
+        graph = self._driver.graph
+        if query == graph_export.CLEAR_QUERY:
+            graph["nodes"] = {k: v for k, v in graph["nodes"].items() if k[0] != model}
+            graph["relationships"] = [r for r in graph["relationships"] if r[0] != model]
+        elif query == graph_export.MODEL_QUERY:
+            graph["models"][model] = list(parameters["columns"])
+        elif query.startswith("UNWIND $rows AS row CREATE"):
+            label = re.search(r"BimNode:(\w+)", query).group(1)
+            for row in parameters["rows"]:
+                assert (model, row["key"]) not in graph["nodes"]
+                graph["nodes"][(model, row["key"])] = (label, {**row, "model": model})
+        elif query.startswith("UNWIND $rows AS row MATCH"):
+            rel_type = re.search(r"\[:(\w+)\]", query).group(1)
+            for row in parameters["rows"]:
+                assert (model, row["from"]) in graph["nodes"] and (model, row["to"]) in graph["nodes"]
+                graph["relationships"].append((model, rel_type, row["from"], row["to"]))
+        elif query == graph_export.COLUMNS_QUERY:
+            columns = graph["models"].get(model)
+            return FakeResult([] if columns is None else [{"columns": columns}])
+        elif query == graph_export.IMPORT_QUERY:
+            return FakeResult(self._import_records(model))
+        return FakeResult()
+
+    def _import_records(self, model):
+        graph = self._driver.graph
+        children = {}
+        for rel_model, _, parent, child in graph["relationships"]:
+            if rel_model == model:
+                children.setdefault(parent, []).append(child)
+        records = []
+        for (node_model, key), (label, cluster) in graph["nodes"].items():
+            if node_model != model or label != "Cluster":
+                continue
+            for object_key in children.get(key, []):
+                obj = graph["nodes"][(model, object_key)][1]
+                for attribute_key in children.get(object_key, []):
+                    records.append({
+                        "cluster_name": cluster["cluster_name"],
+                        "object_name": obj["object_name"],
+                        "object_name_alt": obj.get("object_name_alt"),
+                        "attribute": graph["nodes"][(model, attribute_key)][1],
+                    })
+        return sorted(records, key=lambda record: record["attribute"]["row"])
+
+
+class FakeDriver:
+    def __init__(self):
+        self.graph = {"nodes": {}, "relationships": [], "models": {}}
+        self.sessions = 0
+        self.transactions = 0
+
+    def session(self, database=None, fetch_size=None):
+        self.sessions += 1
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_store():
+    store = Neo4jGraphStore(FakeDriver(), batch_size=2)
+    app.dependency_overrides[get_graph_store] = lambda: store
+    yield store
+    app.dependency_overrides.pop(get_graph_store, None)
+
+
+def _upload(client, test_csv_file, workspace="default"):
+    with open(test_csv_file, "rb") as f:
+        response = client.post(
+            "/upload/", files={"file": ("test.csv", f, "text/csv")}, headers={"X-Workspace-Id": workspace}
+        )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_export_and_import_round_trip(client, test_csv_file, fake_store):
+    """A model written in batches is read back with its drag-and-drop edits."""
+    _upload(client, test_csv_file)
+    nodes = client.get("/graph-data/").json()["nodeDataArray"]
+    attribute = next(node for node in nodes if node["label"] == "Attribute3")
+    object1 = next(node for node in nodes if node["label"] == "Object1")
+    client.post("/apply-drag-drop/", json={
+        "source": attribute["key"], "target": object1["key"], "sourceType": "attribute", "targetType": "object",
+    })
+
+    response = client.post("/export/neo4j/")
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    # 2 clusters, 2 objects and 3 attributes; each cluster -> object link once
+    assert (result["nodes"], result["relationships"]) == (7, 5)
+    assert result["batches"] == 1 + 1 + 1 + 2 + 1 + 2
+    assert fake_store._driver.sessions == 1
+    assert fake_store._driver.transactions == result["batches"]
+
+    # Exporting again replaces the model instead of duplicating it
+    assert client.post("/export/neo4j/").json()["nodes"] == 7
+    assert len(fake_store._driver.graph["nodes"]) == 7
+
+    response = client.post("/import/neo4j/?model=default", headers={"X-Workspace-Id": "copy"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["rows"] == 3
+
+    imported = client.get("/graph-data/", headers={"X-Workspace-Id": "copy"}).json()
+    labels = {node["key"]: node["label"] for node in imported["nodeDataArray"]}
+    parents = {labels[link["to"]]: labels[link["from"]] for link in imported["linkDataArray"]}
+    assert parents["Attribute3"] == "Object1"
+    # Models are rows of attributes, so the emptied object is not imported
+    assert "Object2" not in parents and "Cluster2" not in labels.values()
+
+    descriptions = client.post(
+        "/descriptions/", json={"keys": list(labels)}, headers={"X-Workspace-Id": "copy"}
+    ).json()["descriptions"]
+    assert "Alt3\nThis is definition 3" in descriptions.values()
+
+
+def test_import_unknown_model_and_unconfigured_store(client, test_csv_file, fake_store):
+    assert client.post("/import/neo4j/?model=missing").status_code == status.HTTP_404_NOT_FOUND
+
+    app.dependency_overrides.pop(get_graph_store)
+    _upload(client, test_csv_file)
+    assert client.post("/export/neo4j/").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_cypher_script_export(client, test_csv_file):
+    """The script inlines every batch as literals."""
+    _upload(client, test_csv_file)
+    response = client.get("/export/neo4j/cypher/")
+    assert response.status_code == status.HTTP_200_OK
+
+    statements = [line for line in response.text.splitlines() if line]
+    assert all(statement.endswith(";") for statement in statements)
+    assert statements[2] == 'MATCH (n:BimNode {model: "default"}) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS;'
+    assert '"attribute_definition": "This is definition 1"' not in response.text
+    assert 'attribute_definition: "This is definition 1"' in response.text
+    assert "$" not in "".join(statements[3:])
+
+
+def test_cypher_literals():
+    assert cypher_literal({"a b": 'say "hi"\n', "n": 1.5, "flag": True, "none": None, "nan": float("nan")}) == (
+        '{`a b`: "say \\"hi\\"\\n", n: 1.5, flag: true, none: null, nan: null}'
+    )
+    assert render_statement("UNWIND $rows AS row SET n.model = $model", {"rows": [1, 2], "model": "m"}) == (
+        'UNWIND [1, 2] AS row SET n.model = "m"'
+    )
+
+
+def test_admin_import_export(client, test_csv_file):
+    """The bulk import files hold one row per node and unique relationships."""
+    _upload(client, test_csv_file)
+    response = client.get("/export/neo4j/admin-import/")
+    assert response.status_code == status.HTTP_200_OK
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        def rows(name):
+            return list(csv.reader(io.TextIOWrapper(archive.open(name), encoding="utf-8")))
+
+        assert "neo4j-admin database import full" in archive.read("import.sh").decode()
+        attributes = rows("attributes.csv")
+        assert attributes[0][:4] == ["key:ID", "model", "row:long", "attribute_name"]
+        assert [row[3] for row in attributes[1:]] == ["Attribute1", "Attribute2", "Attribute3"]
+        assert len(rows("clusters.csv")) == 3
+        assert len(rows("has_object.csv")) == 3
+        assert len(rows("has_attribute.csv")) == 4
+        assert rows("models.csv")[1][1].startswith("cluster_name|object_name")
@@ -0,0 +1,84 @@
+from fastapi import status
+
+
+def _upload(client, test_csv_file):
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+
+
+def test_cluster_overview(client, test_csv_file):
+    """The overview lists clusters with their object and attribute counts."""
+    _upload(client, test_csv_file)
+
+    data = client.get("/graph/clusters/?sort=attributeCount&descending=true").json()
+
+    assert data["total"] == 2
+    assert [node["label"] for node in data["nodeDataArray"]] == ["Cluster1", "Cluster2"]
+    assert data["nodeDataArray"][0]["objectCount"] == 1
+    assert data["nodeDataArray"][0]["attributeCount"] == 2
+
+    # Counts follow the edits made to the graph
+    first, second = data["nodeDataArray"]
+    obj = client.get(f"/graph/nodes/{first['key']}/children/").json()["nodeDataArray"][0]
+    client.post("/apply-drag-drop/", json={
+        "source": obj["key"], "target": second["key"], "sourceType": "object", "targetType": "system",
+    })
+    counts = {node["label"]: (node["objectCount"], node["attributeCount"])
+              for node in client.get("/graph/clusters/").json()["nodeDataArray"]}
+    assert counts == {"Cluster1": (0, 0), "Cluster2": (2, 3)}
+
+
+def test_header_only_model_is_built_once(client):
+    """A model without rows is built at upload and not rebuilt on every read."""
+    header = "cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition\n"
+    client.post("/upload/", files={"file": ("test.csv", header.encode(), "text/csv")})
+
+    response = client.get("/graph-data/")
+    assert response.json()["nodeDataArray"] == []
+    assert client.get("/graph/clusters/").json()["total"] == 0
+    revalidated = client.get("/graph-data/", headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_node_children_window(client, test_csv_file):
+    """Children of an object are paged, sorted and linked to their parent."""
+    _upload(client, test_csv_file)
+    cluster = client.get("/graph/clusters/?search=cluster1").json()["nodeDataArray"][0]
+    obj = client.get(f"/graph/nodes/{cluster['key']}/children/").json()["nodeDataArray"][0]
+
+    data = client.get(f"/graph/nodes/{obj['key']}/children/?sort=label&descending=true&limit=1").json()
+
+    assert data["total"] == 2
+    assert [node["label"] for node in data["nodeDataArray"]] == ["Attribute2"]
+    assert data["linkDataArray"] == [{"from": obj["key"], "to": data["nodeDataArray"][0]["key"]}]
+
+    filtered = client.get(f"/graph/nodes/{obj['key']}/children/?filter=label:ute1").json()
+    assert [node["label"] for node in filtered["nodeDataArray"]] == ["Attribute1"]
+
+
+def test_node_children_errors(client, test_csv_file):
+    """Unknown keys and malformed filters are rejected."""
+    _upload(client, test_csv_file)
+    cluster = client.get("/graph/clusters/").json()["nodeDataArray"][0]
+
+    assert client.get("/graph/nodes/missing/children/").status_code == status.HTTP_404_NOT_FOUND
+    response = client.get(f"/graph/nodes/{cluster['key']}/children/?filter=label")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_node_children_with_blank_harmonised_attribute(client):
+    """Blank harmonised_attribute cells fall back to Harmonised-<name> instead of NaN."""
+    csv = (
+        "cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition,harmonised_attribute\n"
+        "C1,O1,O1 Alt,Power,P,Rated power,Rating\n"
+        "C1,O1,O1 Alt,Voltage,V,Rated voltage,\n"
+    )
+    client.post("/upload/", files={"file": ("test.csv", csv.encode(), "text/csv")})
+    cluster = client.get("/graph/clusters/").json()["nodeDataArray"][0]
+    obj = client.get(f"/graph/nodes/{cluster['key']}/children/").json()["nodeDataArray"][0]
+
+    for query in ("", "?sort=harmonisedAttribute"):
+        response = client.get(f"/graph/nodes/{obj['key']}/children/{query}")
+        assert response.status_code == status.HTTP_200_OK
+        harmonised = {node["label"]: node["harmonisedAttribute"] for node in response.json()["nodeDataArray"]}
+        assert harmonised == {"Power": "Rating", "Voltage": "Harmonised-Voltage"}
@@ -0,0 +1,54 @@
+import pytest
+
+from app.graph_store import LinkIndex
+
+LINKS = [
+    {"from": "c1", "to": "o1"},
+    {"from": "o1", "to": "a1"},
+    {"from": "c1", "to": "o1"},
+    {"from": "o1", "to": "a2"},
+    {"from": "c2", "to": "o2"},
+    {"from": "o2", "to": "a3"},
+]
+
+
+def test_link_index_materializes_links_in_order():
+    """The materialized linkDataArray matches the links it was built from."""
+    index = LinkIndex(LINKS)
+
+    assert index.link_data_array() == LINKS
+    assert len(index) == len(LINKS)
+    assert index.children("c1") == ["o1"]
+    assert index.children("o1") == ["a1", "a2"]
+    assert index.parent("a3") == "o2"
+
+
+def test_link_index_reparent_matches_list_semantics():
+    """Removing and re-adding links gives the same list as filtering and appending."""
+    index = LinkIndex(LINKS)
+    index.link_data_array()
+
+    removed = index.remove_links_to("o1")
+    added = index.add("c2", "o1")
+
+    expected = [link for link in LINKS if link["to"] != "o1"] + [{"from": "c2", "to": "o1"}]
+    assert removed == [LINKS[0], LINKS[2]]
+    assert added == {"from": "c2", "to": "o1"}
+    assert index.link_data_array() == expected
+    assert index.children("c1") == []
+    assert index.children("c2") == ["o2", "o1"]
+    assert index.parent("o1") == "c2"
+
+
+def test_link_index_apply_is_all_or_nothing():
+    """A patch removing a link that does not exist leaves the index unchanged."""
+    index = LinkIndex(LINKS)
+    before = list(index.link_data_array())
+
+    with pytest.raises(KeyError):
+        index.apply(removed=[{"from": "o1", "to": "a1"}, {"from": "o2", "to": "a1"}], added=[])
+    assert index.link_data_array() == before
+
+    index.apply(removed=[{"from": "o1", "to": "a1"}], added=[{"from": "o2", "to": "a1"}])
+    assert index.parent("a1") == "o2"
+    assert len(index) == len(before)
@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+import pytest
+
+from app.ingest import MissingColumnsError, read_csv_chunked
+
+CSV = """cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition,new_object
+Cluster1,Object1,Object1 Alt,Attribute1,Alt1,Def1,
+Cluster1,Object1,Object1 Alt,Attribute2,Alt2,Def2,NewObj
+Cluster2,Object2,Object2 Alt,Attribute3,Alt3,Def3,
+Cluster3,Object3,Object3 Alt,Attribute4,Alt4,Def4,
+"""
+
+
+def test_read_csv_chunked_matches_full_parse():
+    """Chunked parsing yields the same rows as a single read_csv call."""
+    df = read_csv_chunked(io.BytesIO(CSV.encode("utf-8")), chunk_rows=2)
+    expected = pd.read_csv(io.StringIO(CSV))
+
+    assert df.columns.tolist() == expected.columns.tolist()
+    assert df.astype(object).equals(expected.astype(object))
+
+
+def test_read_csv_chunked_uses_categoricals():
+    """Cluster and object names are stored as categoricals spanning all chunks."""
+    df = read_csv_chunked(io.BytesIO(CSV.encode("utf-8")), chunk_rows=2)
+
+    assert isinstance(df["cluster_name"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["object_name"].dtype, pd.CategoricalDtype)
+    assert set(df["cluster_name"].cat.categories) == {"Cluster1", "Cluster2", "Cluster3"}
+
+
+def test_read_csv_chunked_rejects_missing_columns():
+    """The header is validated before the body is parsed."""
+    with pytest.raises(MissingColumnsError) as exc_info:
+        read_csv_chunked(io.BytesIO(b"col1,col2\n1,2\n"))
+
+    assert "cluster_name" in exc_info.value.missing
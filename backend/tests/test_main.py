@@ -43,4 +43,33 @@ def test_upload_invalid_file(client):
     finally:
         # Clean up
         if os.path.exists("invalid.csv"):
-            os.remove("invalid.csv")
\ No newline at end of file
+            os.remove("invalid.csv")
+
+
+def test_reupload_keeps_node_keys(client, test_csv_file):
+    """Uploading the same file again produces the same node keys."""
+    keys = []
+    for _ in range(2):
+        with open(test_csv_file, 'rb') as f:
+            client.post("/upload/?stable_keys=true", files={"file": ("test.csv", f, "text/csv")})
+        keys.append([node["key"] for node in client.get("/graph-data/").json()["nodeDataArray"]])
+
+    assert keys[0] == keys[1]
+
+
+def test_failed_upload_keeps_previous_model(client, test_csv_file):
+    """A model that fails to build leaves the previously uploaded one in place."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+    graph = client.get("/graph-data/")
+    summary = client.get("/graph-summary/").json()
+
+    broken = "cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition\n" \
+        "Cluster1,,Object1 Alt,Attribute1,Alt1,This is definition 1\n"
+    response = client.post("/upload/", files={"file": ("broken.csv", broken.encode(), "text/csv")})
+    assert response.status_code != status.HTTP_200_OK
+
+    assert client.get("/graph-data/", headers={"If-None-Match": graph.headers["ETag"]}).status_code == \
+        status.HTTP_304_NOT_MODIFIED
+    assert client.get("/graph-summary/").json() == summary
+    assert client.get("/graph/clusters/").status_code == status.HTTP_200_OK
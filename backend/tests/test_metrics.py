@@ -0,0 +1,62 @@
+import io
+
+from fastapi import status
+
+from app import serialization
+from app.dependencies import metrics
+from app.metrics import Metrics
+
+CSV = """cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition,new_object
+Plant,Transformer,Power transformer,Rated Power,Nennleistung,Continuous apparent power,Rating
+Grid,Cable,Power cable,Rated Voltage,Nennspannung,Voltage the insulation is rated for,
+"""
+
+
+def _count(text, series):
+    """Return the _count sample of a series in a Prometheus text body."""
+    name, labels = series.split("{", 1)
+    line = next(line for line in text.splitlines() if line.startswith(f"{name}_count{{{labels}"))
+    return int(line.rsplit(" ", 1)[1])
+
+
+def test_metrics_histograms_cover_stages_and_routes(client, monkeypatch):
+    """With metrics enabled, uploads and graph fetches are timed per stage and per route."""
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(serialization, "COMPRESS_MIN_BYTES", 0)
+    metrics.reset()
+
+    client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+    client.get("/graph-data/", headers={"Accept-Encoding": "gzip"})
+    client.get("/graph/nodes/missing/children/")
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert "# TYPE bim_stage_seconds histogram" in text
+    for stage in ("parse", "build", "serialize", "compress"):
+        assert _count(text, f'bim_stage_seconds{{stage="{stage}"') == 1
+    assert _count(text, 'bim_request_seconds{method="POST",route="/upload/"') == 1
+    assert _count(text, 'bim_request_seconds{method="GET",route="/graph/nodes/{key}/children/"') == 1
+    assert 'bim_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in text
+    assert 'stage="validate"' not in text
+
+
+def test_metrics_disabled_records_nothing(client, monkeypatch):
+    """Disabled metrics answer 404 and keep no histograms."""
+    monkeypatch.setattr(metrics, "enabled", False)
+    metrics.reset()
+    client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+
+    assert client.get("/metrics").status_code == status.HTTP_404_NOT_FOUND
+    assert metrics.render() == ""
+
+    local = Metrics(enabled=True)
+    for seconds in (0.0005, 0.003, 0.003, 120):
+        local.observe("latency", seconds, route='/a"b')
+    lines = local.render().splitlines()
+    assert 'latency_bucket{route="/a\\"b",le="0.001"} 1' in lines
+    assert 'latency_bucket{route="/a\\"b",le="0.005"} 3' in lines
+    assert 'latency_bucket{route="/a\\"b",le="60"} 3' in lines
+    assert 'latency_bucket{route="/a\\"b",le="+Inf"} 4' in lines
+    assert 'latency_count{route="/a\\"b"} 4' in lines
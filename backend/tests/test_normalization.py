@@ -0,0 +1,96 @@
+import io
+
+import numpy as np
+from fastapi import status
+
+from app.normalization import connected_components, minhash_signatures, normalize_name, similar_pairs
+
+CSV = """cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition,harmonised_attribute
+Plant,Pump,Pump,ID,ID,Unique identifier of the asset,
+Plant,Pump,Pump,Serial-No.,Serial,Serial number printed on the nameplate,
+Plant,Pump,Pump,Weight kg,Weight,Weight of the asset in kilograms without packaging,Weight
+Plant,Pump,Pump,Length,Length,Overall length of the housing,Size
+Grid,Motor,Motor,id,ID,Unique identifier of the asset,
+Grid,Motor,Motor,serial no,Serial,Serial number printed on the nameplate,
+Grid,Motor,Motor,Mass,Mass,Weight of the asset in kilograms without packaging,Weight
+Grid,Motor,Motor,Height,Height,Rated voltage of the winding,Size
+Grid,Cable,Cable,Voltage,Voltage,Rated voltage of the conductor insulation,
+Plant,Valve,Valve,ID,ID,Unique identifier of the asset,
+Plant,Valve,Valve,Serial-No.,Serial,Serial number printed on the nameplate,
+Plant,Valve,Valve,Weight kg,Weight,Weight of the asset in kilograms without packaging,Weight
+Plant,Valve,Valve,Length,Length,Overall length of the housing,Size
+"""
+
+
+def test_normalize_name():
+    assert normalize_name("  Serial-No. ") == "serial no"
+    assert normalize_name(None) == ""
+
+
+def test_connected_components():
+    labels = connected_components(6, np.array([4, 1, 3]), np.array([5, 3, 0]))
+    assert labels.tolist() == [0, 0, 2, 0, 4, 4]
+
+
+def test_minhash_similar_pairs():
+    """Near-identical token sets pair up, unrelated ones do not."""
+    base = list(range(100))
+    documents = [base, base[:95] + [1000, 1001, 1002, 1003, 1004], list(range(500, 600)), []]
+    doc_ids = np.repeat(np.arange(len(documents)), [len(tokens) for tokens in documents])
+    hashes = np.concatenate([np.array(tokens, dtype=np.uint64) for tokens in documents]) * np.uint64(0x9E3779B97F4A7C15)
+    signatures = minhash_signatures(doc_ids, hashes, len(documents))
+
+    left, right = similar_pairs(signatures, np.array([True, True, True, False]), threshold=0.8)
+    assert list(zip(left.tolist(), right.tolist())) == [(0, 1)]
+
+
+def test_normalization_endpoint(client):
+    client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+    response = client.get("/analysis/normalization/")
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    nodes = {node["key"]: node for node in client.get("/graph-data/").json()["nodeDataArray"]}
+
+    def labels(keys):
+        return sorted(nodes[key]["label"] for key in keys)
+
+    assert result["attributeCount"] == 13
+    repeated = {group["name"]: group for group in result["repeatedAttributes"]["groups"]}
+    assert set(repeated) == {"id", "serial no", "weight kg", "length"}
+    assert labels(repeated["serial no"]["objectKeys"]) == ["Motor", "Pump", "Valve"]
+    assert repeated["id"]["definitionVariants"] == 1
+
+    candidates = {group["harmonisedAttribute"]: group for group in result["harmonisedCandidates"]["groups"]}
+    assert candidates["Weight"]["verdict"] == "duplicate"
+    assert candidates["Size"]["verdict"] == "divergent"
+    assert len(candidates["Size"]["definitionGroups"]) == 2
+
+    synonyms = result["synonymCandidates"]["groups"]
+    assert [sorted(group["names"]) for group in synonyms] == [["mass", "weight kg"]]
+
+    # Motor shares only two of six attribute names with them
+    [overlap] = result["overlappingObjects"]["groups"]
+    assert labels(overlap["objectKeys"]) == ["Pump", "Valve"]
+    assert (overlap["jaccard"], overlap["sharedAttributes"]) == (1.0, 4)
+
+    pump = next(key for key, node in nodes.items() if node["label"] == "Pump")
+    assert "overlappingObjects/0" in result["byNode"][pump]
+
+
+def test_similar_pairs_without_documents():
+    left, right = similar_pairs(np.zeros((2, 64), dtype=np.uint32), np.array([False, False]))
+    assert (left.tolist(), right.tolist()) == ([], [])
+    left, right = similar_pairs(np.zeros((0, 64), dtype=np.uint32), np.zeros(0, dtype=bool))
+    assert (left.tolist(), right.tolist()) == ([], [])
+
+
+def test_normalization_endpoint_small_models(client):
+    """Models with nothing to compare answer with empty groups."""
+    header = CSV.splitlines()[0]
+    single = "\n".join([header, *CSV.splitlines()[1:2], *CSV.splitlines()[5:6]]) + "\n"
+    undefined = "\n".join([header, "Plant,Pump,Pump,ID,ID,,", "Grid,Motor,Motor,Mass,Mass,,"]) + "\n"
+    for body in (header + "\n", single, undefined):
+        client.post("/upload/", files={"file": ("model.csv", io.BytesIO(body.encode()), "text/csv")})
+        response = client.get("/analysis/normalization/")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["overlappingObjects"]["groups"] == []
@@ -0,0 +1,72 @@
+from app.revisions import REDO, UNDO, RevisionLog, combine_patches, combine_updates
+
+
+def test_revision_log_since():
+    """Patches after a revision are returned in order."""
+    log = RevisionLog()
+    base = log.reset()
+    first = log.record(removed=[{"from": "a", "to": "b"}], added=[{"from": "c", "to": "b"}])
+    second = log.record(removed=[], added=[{"from": "c", "to": "d"}])
+
+    assert log.since(base) == [first, second]
+    assert log.since(first["revision"]) == [second]
+    assert log.since(second["revision"]) == []
+    assert log.since(base - 1) is None
+
+
+def test_revision_log_drops_old_patches():
+    """Once the journal is full, revisions older than the kept patches need a full fetch."""
+    log = RevisionLog(max_patches=2)
+    base = log.reset()
+    patches = [log.record(removed=[], added=[]) for _ in range(3)]
+
+    assert log.since(base) is None
+    assert log.since(patches[0]["revision"]) == patches[1:]
+
+
+def test_combine_patches_cancels_links():
+    """A link added and later removed does not appear in the combined patch."""
+    first = {"removed": [{"from": "a", "to": "x"}], "added": [{"from": "b", "to": "x"}]}
+    second = {"removed": [{"from": "b", "to": "x"}], "added": [{"from": "c", "to": "x"}]}
+
+    assert combine_patches([first, second]) == ([{"from": "a", "to": "x"}], [{"from": "c", "to": "x"}])
+    assert combine_patches([first, second], invert=True) == ([{"from": "c", "to": "x"}], [{"from": "a", "to": "x"}])
+
+
+def test_revision_log_undo_redo():
+    """Undo reverts the last edit, redo reapplies it, and a new edit clears redo."""
+    log = RevisionLog()
+    base = log.reset()
+    assert log.undo_patch() is None
+
+    log.record(removed=[{"from": "a", "to": "x"}], added=[{"from": "b", "to": "x"}])
+    assert log.undo_patch() == ([{"from": "b", "to": "x"}], [{"from": "a", "to": "x"}], [])
+    log.record(*log.undo_patch(), action=UNDO)
+    assert log.undo_patch() is None
+    assert log.redo_patch() == ([{"from": "a", "to": "x"}], [{"from": "b", "to": "x"}], [])
+
+    log.record(*log.redo_patch(), action=REDO)
+    assert log.redo_patch() is None
+    assert log.can_undo
+
+    log.record(*log.undo_patch(), action=UNDO)
+    log.record(removed=[], added=[{"from": "c", "to": "y"}])
+    assert not log.can_redo
+
+    assert log.restore_patch(base) == ([{"from": "c", "to": "y"}], [], [])
+    assert [version["action"] for version in log.history()] == ["edit", "undo", "redo", "undo", "edit"]
+
+
+def test_node_updates_undo_and_combine():
+    """Field updates are undone to their previous value and combine to their net change."""
+    log = RevisionLog()
+    base = log.reset()
+    log.record([], [], [{"key": "a", "field": "label", "value": "B", "previous": "A"}])
+    log.record([], [], [{"key": "a", "field": "label", "value": "C", "previous": "B"}])
+
+    assert log.undo_patch() == ([], [], [{"key": "a", "field": "label", "value": "B", "previous": "C"}])
+    assert log.restore_patch(base) == ([], [], [{"key": "a", "field": "label", "value": "A", "previous": "C"}])
+    assert log.history()[-1]["updated"] == 1
+
+    log.record([], [], [{"key": "a", "field": "label", "value": "A", "previous": "C"}])
+    assert combine_updates(log.since(base)) == []
@@ -0,0 +1,102 @@
+import io
+
+import pandas as pd
+from fastapi import status
+
+from app import search
+from app.descriptions import DescriptionIndex
+from app.graph_builder import build_graph
+from app.graph_store import LinkIndex, NodeIndex
+from app.search import SearchIndex
+
+CSV = """cluster_name,object_name,object_name_alt,attribute_name,attribute_name_alt,attribute_definition
+Plant,Transformer,Power transformer,Rated Power,Nennleistung,Continuous apparent power the transformer is rated for
+Plant,Transformer,Power transformer,Cooling Method,Kuehlart,How the windings and core are cooled
+Plant,Transformer,Power transformer,Weight,Gewicht,Total mass including oil
+Grid,Cable,Power cable,Conductor Material,Leitermaterial,Metal of the conductor such as copper or aluminium
+Grid,Cable,Power cable,Rated Voltage,Nennspannung,Voltage the insulation is rated for
+"""
+
+
+def _upload(client):
+    response = client.post("/upload/", files={"file": ("model.csv", io.BytesIO(CSV.encode()), "text/csv")})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def _search(client, **params):
+    response = client.get("/search/", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_search_prefix_and_typos(client):
+    _upload(client)
+
+    results = _search(client, q="rat")["results"]
+    assert {result["label"] for result in results[:2]} == {"Rated Power", "Rated Voltage"}
+    assert results[0]["match"] == "name" and results[0]["category"] == "attribute"
+
+    assert _search(client, q="transfromer")["results"][0]["label"] == "Transformer"
+    top = _search(client, q="Nennspannung")["results"][0]
+    assert (top["label"], top["match"]) == ("Rated Voltage", "alt")
+
+
+def test_search_definitions_and_filters(client):
+    _upload(client)
+
+    result = _search(client, q="copper aluminium")
+    assert result["results"][0]["label"] == "Conductor Material"
+    assert result["results"][0]["match"] == "definition"
+
+    assert {r["category"] for r in _search(client, q="power", category="object")["results"]} == {"object"}
+    assert _search(client, q="zzzz")["total"] == 0
+
+
+def test_search_follows_reparenting(client):
+    """Moves update the parents used by the within filter."""
+    _upload(client)
+    nodes = {node["label"]: node["key"] for node in client.get("/graph-data/").json()["nodeDataArray"]}
+
+    within_cable = _search(client, q="rated", within=nodes["Cable"])["results"]
+    assert [r["label"] for r in within_cable] == ["Rated Voltage"]
+
+    client.post("/apply-drag-drop/", json={
+        "source": nodes["Rated Power"], "target": nodes["Cable"], "sourceType": "attribute", "targetType": "object",
+    })
+    within_cable = _search(client, q="rated", within=nodes["Cable"])["results"]
+    assert sorted(r["label"] for r in within_cable) == ["Rated Power", "Rated Voltage"]
+    assert {r["parent"] for r in within_cable} == {nodes["Cable"]}
+    within_grid = _search(client, q="rated", within=nodes["Grid"])["results"]
+    assert sorted(r["label"] for r in within_grid) == ["Rated Power", "Rated Voltage"]
+
+    client.post("/history/undo/")
+    assert [r["label"] for r in _search(client, q="rated", within=nodes["Cable"])["results"]] == ["Rated Voltage"]
+    assert [r["label"] for r in _search(client, q="rated", within=nodes["Plant"])["results"]] == ["Rated Power"]
+
+
+def test_search_stops_early_with_the_same_results(monkeypatch):
+    """Stopping at the candidates of the rare terms keeps the top results."""
+    n_rows = 3000
+    df = pd.DataFrame({
+        "cluster_name": [f"Cluster{i % 3}" for i in range(n_rows)],
+        "object_name": [f"Object{i // 20}" for i in range(n_rows)],
+        "object_name_alt": [f"Object {i // 20} alt" for i in range(n_rows)],
+        "attribute_name": [f"Attribute{i}" for i in range(n_rows)],
+        "attribute_name_alt": [f"Attr {i}" for i in range(n_rows)],
+        "attribute_definition": [f"Definition of attribute {i}" for i in range(n_rows)],
+    })
+    node_data_array, link_data_array = build_graph(df)
+    nodes = NodeIndex(node_data_array)
+    index = SearchIndex(df, nodes, DescriptionIndex(df, nodes).source_rows(), LinkIndex(link_data_array))
+
+    queries = ["attribute12", "atrtibute123", "attr 77", "object 12 alt"]
+    early = [index.search(query, limit=10) for query in queries]
+    monkeypatch.setattr(search, "CANDIDATE_BUDGET", 10 ** 9)
+    full = [index.search(query, limit=10) for query in queries]
+
+    assert any(not exact for _, exact, _ in early)
+    for (early_total, _, early_results), (full_total, exact, full_results) in zip(early, full):
+        assert exact and early_total <= full_total
+        assert [(position, round(score, 9)) for position, score, _ in early_results] == [
+            (position, round(score, 9)) for position, score, _ in full_results
+        ]
@@ -0,0 +1,28 @@
+import gzip
+import json
+
+from app.serialization import SerializedPayload
+
+
+def test_serialized_payload_gzip():
+    """Large payloads are gzip-compressed once and reused."""
+    payload = SerializedPayload({"nodeDataArray": [{"key": str(i)} for i in range(200)]}, 'W/"x-1"')
+
+    coding, body = payload.encode("gzip, deflate")
+    assert coding == "gzip"
+    assert json.loads(gzip.decompress(body)) == json.loads(payload.body)
+    assert payload.encode("gzip")[1] is body
+
+    assert payload.encode("identity") == (None, payload.body)
+    assert payload.encode("gzip;q=0") == (None, payload.body)
+
+
+def test_serialized_payload_matches_etag():
+    """If-None-Match matches the exact tag, a tag list or a wildcard."""
+    payload = SerializedPayload({}, 'W/"x-1"')
+
+    assert payload.matches('W/"x-1"')
+    assert payload.matches('W/"x-0", W/"x-1"')
+    assert payload.matches("*")
+    assert not payload.matches('W/"x-2"')
+    assert not payload.matches(None)
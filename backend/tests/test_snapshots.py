@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.dependencies import workspaces
+from app.graph_builder import build_graph
+from app.graph_store import LinkIndex, NodeIndex
+from app import main
+from app.main import app
+from app.snapshots import SnapshotStore
+from app.workspaces import Workspace
+
+
+def make_workspace():
+    df = pd.DataFrame({
+        "cluster_name": pd.Categorical(["C1", "C1", "C2"]),
+        "object_name": pd.Categorical(["O1", "O1", "O2"]),
+        "object_name_alt": pd.Categorical(["O1 Alt", "O1 Alt", "O2 Alt"]),
+        "attribute_name": ["A1", "A2", "A3"],
+        "attribute_name_alt": ["Alt1", None, "Alt3"],
+        "attribute_definition": ["Line 1\r\nLine 2", "Définition", ""],
+        "new_object ": [np.nan, "NewObject", np.nan],
+        "precision": [1.5, np.nan, 3.0],
+    })
+    workspace = Workspace("model")
+    node_data_array, link_data_array = build_graph(df)
+    workspace.update(df=df, nodes=NodeIndex(node_data_array), links=LinkIndex(link_data_array), stableKeys=True)
+    workspace["revisions"].reset()
+    return workspace
+
+
+def test_snapshot_round_trip(tmp_path):
+    """A saved workspace restores to the same model, graph and revision."""
+    store = SnapshotStore(tmp_path)
+    workspace = make_workspace()
+    workspace["links"].add("C2", "O1_C1")
+    workspace["revisions"].record(removed=[], added=[{"from": "C2", "to": "O1_C1"}])
+    store.save(workspace)
+    assert not workspace.has_unsaved_changes()
+    assert store.workspace_ids() == ["model"]
+
+    restored = Workspace("model")
+    assert store.restore(restored)
+    assert restored["stableKeys"] is True
+    assert restored["revisions"].revision == workspace["revisions"].revision
+    assert b'"revision":2' in restored["graphPayload"].body
+
+    df, nodes, links = SnapshotStore.load(restored["pendingSnapshot"])
+    pd.testing.assert_frame_equal(df, workspace["df"])
+    assert nodes.node_data_array() == workspace["nodes"].node_data_array()
+    assert links.link_data_array() == workspace["links"].link_data_array()
+
+
+def test_restore_without_snapshot(tmp_path):
+    """Workspaces without a snapshot are not restored."""
+    assert not SnapshotStore(tmp_path).restore(Workspace("missing"))
+
+
+@pytest.fixture
+def snapshot_store(tmp_path, monkeypatch):
+    store = SnapshotStore(tmp_path)
+    monkeypatch.setattr(workspaces, "snapshots", store)
+    workspaces.clear()
+    yield store
+    workspaces.clear()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_model_survives_restart(snapshot_store, test_csv_file):
+    """After a restart, the model is served from its snapshot without re-uploading."""
+    with TestClient(app) as client:
+        with open(test_csv_file, 'rb') as f:
+            client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+        wait_for(lambda: snapshot_store.workspace_ids() == ["default"])
+        before = client.get("/graph-data/").json()
+        clusters = client.get("/graph/clusters/").json()
+        summary = client.get("/graph-summary/").json()
+
+    # Simulate a new process: nothing in memory, only the snapshot on disk
+    workspaces.clear()
+    with TestClient(app) as client:
+        # Snapshots are only restored when their workspace is requested
+        assert "default" not in workspaces
+        assert client.get("/graph-summary/").json() == summary
+        assert client.get("/graph-data/").json() == before
+        assert client.get("/graph/clusters/").json() == clusters
+
+        cluster_keys = [node["key"] for node in clusters["nodeDataArray"]]
+        object_key = client.get(f"/graph/nodes/{cluster_keys[0]}/children/").json()["nodeDataArray"][0]["key"]
+        response = client.post("/apply-drag-drop/", json={
+            "source": object_key, "target": cluster_keys[1], "sourceType": "object", "targetType": "system",
+        })
+        assert response.json()["revision"] == before["revision"] + 1
+
+    # Unsaved edits are written on shutdown
+    restored = Workspace("default")
+    snapshot_store.restore(restored)
+    assert restored["revisions"].revision == before["revision"] + 1
+
+
+def test_edits_go_on_while_a_snapshot_is_written(snapshot_store, monkeypatch):
+    """The workspace lock is only held to capture the snapshot, not while it is written."""
+    started, release = threading.Event(), threading.Event()
+    write = snapshot_store.write
+
+    def slow_write(state):
+        started.set()
+        release.wait(5)
+        return write(state)
+
+    monkeypatch.setattr(snapshot_store, "write", slow_write)
+    workspace = make_workspace()
+
+    async def scenario():
+        save = asyncio.ensure_future(main._save_snapshot(workspace, 0))
+        assert await asyncio.to_thread(started.wait, 5)
+        await asyncio.wait_for(workspace.lock.acquire(), timeout=1)
+        workspace["links"].add("C2", "O1_C1")
+        workspace["revisions"].record(removed=[], added=[{"from": "C2", "to": "O1_C1"}])
+        workspace.lock.release()
+        release.set()
+        await save
+
+    asyncio.run(scenario())
+    assert not workspace.has_unsaved_changes()
+    restored = Workspace("model")
+    snapshot_store.restore(restored)
+    assert restored["revisions"].revision == workspace["revisions"].revision
+
+
+def test_sweep_deletes_unused_snapshots(tmp_path):
+    """Snapshots unused for longer than the TTL are deleted, unless kept or restored."""
+    store = SnapshotStore(tmp_path, ttl=60)
+    for workspace_id in ("old", "kept", "restored", "fresh"):
+        workspace = make_workspace()
+        workspace.id = workspace_id
+        store.save(workspace)
+        if workspace_id != "fresh":
+            stale = time.time() - 120
+            os.utime(store.path(workspace_id) / "manifest.json", (stale, stale))
+    assert store.restore(Workspace("restored"))
+
+    assert store.sweep(keep={"kept"}) == ["old"]
+    assert store.workspace_ids() == ["fresh", "kept", "restored"]
+
+
+def test_reset_workspace_deletes_its_snapshot(snapshot_store, test_csv_file):
+    """DELETE /workspace/ drops the model and its snapshot."""
+    with TestClient(app) as client:
+        with open(test_csv_file, 'rb') as f:
+            client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+        wait_for(lambda: snapshot_store.workspace_ids() == ["default"])
+
+        assert client.delete("/workspace/").status_code == 200
+        assert snapshot_store.workspace_ids() == []
+        assert client.get("/graph-data/").status_code == 400
+    assert snapshot_store.workspace_ids() == []
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pandas as pd
+
+import app.main
+from app.dependencies import workspaces
+from app.graph_builder import build_graph
+from app.workers import SingleFlight, run_in_pool
+
+
+def test_single_flight_shares_concurrent_calls():
+    """Concurrent calls for one key run once and all get its result."""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+        assert "key" not in flights
+        # Once the call finished, the next one computes again
+        await flights.do("key", compute)
+        return results
+
+    assert asyncio.run(scenario()) == ["result"] * 5
+    assert len(calls) == 2
+
+
+def test_single_flight_survives_cancelled_waiter():
+    """Cancelling one waiter does not cancel the shared call."""
+    async def scenario():
+        flights = SingleFlight()
+        first = asyncio.ensure_future(flights.do("key", lambda: asyncio.sleep(0.01, result=42)))
+        second = asyncio.ensure_future(flights.do("key", lambda: asyncio.sleep(0, result=0)))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 42
+
+
+def test_run_in_pool_keeps_event_loop_responsive():
+    """Work in the pool leaves the event loop free for other coroutines."""
+    async def scenario():
+        ticks = []
+
+        async def ticker():
+            while len(ticks) < 5:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        result, _ = await asyncio.gather(run_in_pool(time.sleep, 0.1), ticker())
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.1
+
+
+def test_concurrent_graph_data_share_one_rebuild(test_csv_file, monkeypatch):
+    """N simultaneous /graph-data/ calls during a rebuild wait on one build."""
+    workspaces.clear()
+    builds = []
+
+    def slow_build_graph(*args, **kwargs):
+        builds.append(threading.get_ident())
+        time.sleep(0.05)
+        return build_graph(*args, **kwargs)
+
+    monkeypatch.setattr(app.main, "build_graph", slow_build_graph)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with open(test_csv_file, "rb") as f:
+                await client.post("/upload/", files={"file": ("test.csv", f, "text/csv")})
+            # Drop the graph built at upload, so the next reads rebuild it
+            (await workspaces.get()).update(nodes=app.main.NodeIndex(), graphBuilt=False)
+            return await asyncio.gather(*(client.get("/graph-data/") for _ in range(5)))
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.content for response in responses}) == 1
+    assert len(builds) == 2
+    assert threading.get_ident() not in builds
+
+
+def test_build_graph_runs_in_process_pool():
+    """The graph build is picklable, so it can run in the process pool."""
+    df = pd.DataFrame({
+        "cluster_name": ["C1", "C1"],
+        "object_name": ["O1", "O1"],
+        "object_name_alt": ["O1 Alt", "O1 Alt"],
+        "attribute_name": ["A1", "A2"],
+        "attribute_name_alt": ["Alt1", "Alt2"],
+        "attribute_definition": ["D1", "D2"],
+    })
+    result = asyncio.run(run_in_pool(build_graph, df, kind="process", stable_keys=True))
+    assert result == build_graph(df, stable_keys=True)
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pandas as pd
+from fastapi import status
+
+from app.workspaces import WorkspaceManager
+
+
+def test_workspaces_are_isolated(client, test_csv_file):
+    """A model uploaded in one workspace is not visible from another."""
+    with open(test_csv_file, 'rb') as f:
+        client.post("/upload/", files={"file": ("test.csv", f, "text/csv")}, headers={"X-Workspace-Id": "alice"})
+
+    assert client.get("/graph-data/", headers={"X-Workspace-Id": "alice"}).status_code == status.HTTP_200_OK
+    assert client.get("/graph-data/", headers={"X-Workspace-Id": "bob"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/graph-data/").status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/graph-data/", headers={"X-Workspace-Id": "../x"}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_manager_evicts_least_recently_used_over_budget():
+    """Once over the memory budget, the least recently used workspaces go first."""
+    manager = WorkspaceManager(memory_budget=250, ttl=3600)
+
+    async def scenario():
+        for workspace_id in ("a", "b", "c"):
+            (await manager.get(workspace_id)).size_bytes = 100
+        await manager.get("a")
+        return await manager.evict(keep="a")
+
+    assert asyncio.run(scenario()) == ["b"]
+    assert "a" in manager and "c" in manager and "b" not in manager
+
+
+def test_manager_evicts_expired_and_spills(tmp_path):
+    """Idle workspaces past the TTL are spilled to disk and restored on use."""
+    manager = WorkspaceManager(memory_budget=2**30, ttl=0.01, spill_dir=tmp_path)
+
+    async def scenario():
+        workspace = await manager.get("a")
+        workspace["df"] = pd.DataFrame({"cluster_name": ["C1"]})
+        workspace.size_bytes = 10
+        await asyncio.sleep(0.02)
+
+        await manager.get("b")
+        await manager.evict(keep="b")
+        assert "a" not in manager
+        assert (tmp_path / "a.pkl").exists()
+
+        restored = await manager.get("a")
+        assert restored["df"].equals(workspace["df"])
+        assert restored.size_bytes == 10
+        assert not (tmp_path / "a.pkl").exists()
+
+    asyncio.run(scenario())
+
+
+def test_manager_shares_first_get_and_keeps_workspaces_used_while_spilling(tmp_path, monkeypatch):
+    """Concurrent first requests get one workspace; a spill never blocks the loop nor drops a workspace in use."""
+    manager = WorkspaceManager(memory_budget=2**30, ttl=0.01, spill_dir=tmp_path)
+    spill = manager._spill
+
+    def slow_spill(workspace):
+        time.sleep(0.05)
+        spill(workspace)
+
+    monkeypatch.setattr(manager, "_spill", slow_spill)
+
+    async def scenario():
+        first, second = await asyncio.gather(manager.get("a"), manager.get("a"))
+        assert first is second
+        first["df"] = pd.DataFrame({"cluster_name": ["C1"]})
+        await asyncio.sleep(0.02)
+
+        # The workspace is used again while it is being written out
+        eviction = asyncio.ensure_future(manager.evict())
+        await asyncio.sleep(0.01)
+        assert manager.peek("a") is first
+        first.last_access = time.monotonic()
+        return await eviction
+
+    assert asyncio.run(scenario()) == []
+    assert "a" in manager
+    assert not (tmp_path / "a.pkl").exists()
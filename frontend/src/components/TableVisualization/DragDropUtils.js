@@ -30,6 +30,22 @@ export const handleDragLeave = (event) => {
     }
 };
 
+const linkId = (link) => `${link.from}->${link.to}`;
+
+// Apply a patch returned by the backend ({ revision, removed, added }) to the local graph.
+// Links already added optimistically are not duplicated.
+export const applyGraphPatch = (graphData, patch) => {
+    const dropped = new Set([...patch.removed, ...patch.added].map(linkId));
+    return {
+        ...graphData,
+        linkDataArray: [
+            ...graphData.linkDataArray.filter(link => !dropped.has(linkId(link))),
+            ...patch.added
+        ],
+        revision: patch.revision
+    };
+};
+
 export const processDragDrop = async (
     event, 
     targetKey, 
@@ -117,7 +133,8 @@ export const processDragDrop = async (
             });
             
             if (response.data.message === "Drag-and-drop operation completed successfully") {
-                await fetchGraphData();
+                // Reconcile with the server's patch instead of refetching the whole graph
+                setGraphData((prev) => applyGraphPatch(prev, response.data));
             }
         } catch (error) {
             console.error("Error applying drag and drop:", error);
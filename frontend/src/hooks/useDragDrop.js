@@ -1,6 +1,7 @@
 import { useState } from "react";
 import axios from "axios";
 import useAppState from './useAppState';
+import { applyGraphPatch } from '../components/TableVisualization/DragDropUtils';
 
 const useDragDrop = (graphData, setGraphData, showNotification) => {
     const [draggedItem, setDraggedItem] = useState(null);
@@ -112,6 +113,8 @@ const useDragDrop = (graphData, setGraphData, showNotification) => {
                 console.log("Backend response:", response.data);
                 
                 if (response.data && response.data.message === "Drag-and-drop operation completed successfully") {
+                    // Reconcile the optimistic update with the server's patch
+                    setGraphData((prev) => applyGraphPatch(prev, response.data));
                     if (showNotification) {
                         showNotification("Item moved successfully", "success");
                     }
@@ -1,7 +1,15 @@
 import React from "react";
 import { createRoot } from "react-dom/client";
+import axios from "axios";
 import App from "./App";
 
+// Each browser tab works in its own backend workspace, so concurrent users
+// do not overwrite each other's uploads
+const workspaceId = sessionStorage.getItem("workspaceId")
+  || `ws-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+sessionStorage.setItem("workspaceId", workspaceId);
+axios.defaults.headers.common["X-Workspace-Id"] = workspaceId;
+
 const root = createRoot(document.getElementById("root"));
 root.render(
   <React.StrictMode>